@@ -0,0 +1,91 @@
+import argparse
+import csv
+import os
+import random
+
+headers = ["county", "precinct", "office", "district", "party", "candidate", "votes", "absentee", "early_voting",
+           "election_day", "provisional"]
+counties = ["Adams", "Baker", "Clay", "Dade", "Elbert", "Fulton", "Glynn", "Hall", "Irwin", "Jones"]
+offices = [("President", "", [("DEM", "Joseph R. Biden"), ("REP", "Donald J. Trump"), ("LIB", "Jo Jorgensen")]),
+           ("U.S. Senate", "", [("DEM", "Raphael Warnock"), ("REP", "Kelly Loeffler")]),
+           ("U.S. House", "7", [("DEM", "Carolyn Bourdeaux"), ("REP", "Rich McCormick")]),
+           ("State Senate", "45", [("DEM", "Matielyn Jones"), ("REP", "Clint Dixon")]),
+           ("Registered Voters", "", [("", "")]),
+           ("Ballots Cast", "", [("", "")])]
+
+
+def _inject_defect(row: list[str], generator: random.Random) -> list[str]:
+    row = list(row)
+    defect = generator.randrange(8)
+    column = generator.randrange(len(row))
+    if defect == 0:
+        row[column] = f"{row[column]} "
+    elif defect == 1:
+        row[column] = f" {row[column]}"
+    elif defect == 2:
+        row[column] = f"{row[column]}  x"
+    elif defect == 3:
+        row[column] = f"{row[column]}\tx"
+    elif defect == 4:
+        row[column] = f"{row[column]}\nx"
+    elif defect == 5:
+        row[headers.index("votes")] = f"{row[headers.index('votes')]}.5"
+    elif defect == 6:
+        row.append("")
+    else:
+        row = [""] * len(row)
+    return row
+
+
+def generate_rows(row_count: int, defect_rate: float = 0.0, seed: int = 0):
+    generator = random.Random(seed)
+    count = 0
+    while True:
+        for county in counties:
+            for precinct in range(1, 1000):
+                for office, district, candidates in offices:
+                    for party, candidate in candidates:
+                        if count >= row_count:
+                            return
+
+                        votes = [generator.randrange(0, 400) for _ in range(4)]
+                        row = [county, f"{county} {precinct:03}", office, district, party, candidate, str(sum(votes)),
+                               *(str(x) for x in votes)]
+                        if generator.random() < defect_rate:
+                            row = _inject_defect(row, generator)
+
+                        yield row
+                        count += 1
+
+
+def generate_file(path: str, row_count: int, defect_rate: float = 0.0, seed: int = 0):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(headers)
+        writer.writerows(generate_rows(row_count, defect_rate, seed))
+
+
+def generate_repository(root_path: str, years: int, files_per_year: int, rows_per_file: int,
+                        defect_rate: float = 0.0, seed: int = 0) -> list[str]:
+    paths = []
+    for year in range(2020 - years + 1, 2021):
+        for index in range(files_per_year):
+            path = os.path.join(root_path, str(year), "counties", f"{year}1103__ga__general__{index:03}__precinct.csv")
+            generate_file(path, rows_per_file, defect_rate, seed + len(paths))
+            paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="generate a repository of synthetic precinct-level results")
+    parser.add_argument("root_path", type=str, help="the path to the directory that the files will be written to")
+    parser.add_argument("--defect-rate", type=float, default=0.0, metavar="RATE",
+                        help="the fraction of rows that will contain a formatting error")
+    parser.add_argument("--files-per-year", type=int, default=1, metavar="N", help="the number of files per year")
+    parser.add_argument("--rows", type=int, default=10000, metavar="N", help="the number of rows in each file")
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the random number generator")
+    parser.add_argument("--years", type=int, default=1, metavar="N", help="the number of year directories")
+    args = parser.parse_args()
+
+    generate_repository(args.root_path, args.years, args.files_per_year, args.rows, args.defect_rate, args.seed)
@@ -0,0 +1,240 @@
+import argparse
+import csv
+import inspect
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, root_path)
+
+# noinspection PyPep8
+from benchmarks import generate_data
+# noinspection PyPep8
+from format_tests import columnar, format_tests, prefilter, row_plans, validation
+
+startup_benchmark_name = "startup[check_files.py]"
+
+
+def get_row_test_classes() -> dict:
+    classes = {}
+    for name, member in inspect.getmembers(format_tests, inspect.isclass):
+        if issubclass(member, format_tests.RowTest) and not inspect.isabstract(member):
+            classes[name] = member
+    return classes
+
+
+def get_benchmark_names() -> list[str]:
+    names = ["csv.reader", "prefilter"]
+    names.extend(get_row_test_classes().keys())
+    names.append("RowPlan[value tests]")
+    names.extend(f"validate_file[{x}]" for x in validation.ValidationOptions.engines)
+    names.extend(f"run_tests.py[{x}]" for x in validation.ValidationOptions.engines)
+    return names
+
+
+def is_available(name: str) -> bool:
+    return "columnar" not in name or columnar.is_available()
+
+
+def run_benchmark(name: str, csv_file: str) -> float:
+    # Returns the number of seconds taken by the benchmark.  The file is parsed before the timer is started, except
+    # for the benchmarks that include the parsing.
+    if name == "csv.reader":
+        start_time = time.perf_counter()
+        with open(csv_file, "r") as csv_data:
+            for _ in csv.reader(csv_data):
+                pass
+        return time.perf_counter() - start_time
+    elif name == "prefilter":
+        # The scan stops at the first defect, so this measures the cost of scanning a clean file when the defect rate
+        # is 0.
+        with open(csv_file, "r") as csv_data:
+            headers = next(csv.reader(csv_data))
+        tests = [format_tests.ConsecutiveSpaces(), format_tests.EmptyRows(),
+                 format_tests.InconsistentNumberOfColumns(headers), format_tests.LeadingAndTrailingSpaces(),
+                 format_tests.NonIntegerVotes(headers), format_tests.PrematureLineBreaks(),
+                 format_tests.TabCharacters()]
+        start_time = time.perf_counter()
+        prefilter.is_clean(csv_file, headers, tests)
+        return time.perf_counter() - start_time
+    elif name.startswith("validate_file"):
+        options = validation.ValidationOptions(max_examples=10, full_messages=False, engine=name[14:-1])
+        start_time = time.perf_counter()
+        validation.validate_file(csv_file, os.path.dirname(os.path.dirname(csv_file)), options)
+        return time.perf_counter() - start_time
+
+    with open(csv_file, "r") as csv_data:
+        rows = list(csv.reader(csv_data))
+    headers = rows[0]
+
+    if name == "RowPlan[value tests]":
+        # The value tests that have a row pattern, screened together with one search per row.
+        value_tests = [format_tests.ConsecutiveSpaces(), format_tests.LeadingAndTrailingSpaces(),
+                       format_tests.PrematureLineBreaks(), format_tests.TabCharacters()]
+        row_plan = row_plans.get_row_plan(headers, value_tests)
+        start_time = time.perf_counter()
+        row_plan.run(iter(rows), value_tests)
+        return time.perf_counter() - start_time
+
+    test_classes = get_row_test_classes()
+    if len(inspect.signature(test_classes[name]).parameters) == 1:
+        test = test_classes[name](headers)
+    else:
+        test = test_classes[name]()
+
+    start_time = time.perf_counter()
+    for row in rows:
+        test.test(row)
+    return time.perf_counter() - start_time
+
+
+def measure(name: str, csv_file: str) -> dict:
+    # Each benchmark is run in its own process, so that its peak memory usage can be measured.
+    if name.startswith("run_tests.py"):
+        command = [sys.executable, os.path.join(root_path, "run_tests.py"), f"--engine={name[13:-1]}",
+                   os.path.dirname(os.path.dirname(os.path.dirname(csv_file)))]
+    else:
+        command = [sys.executable, __file__, "--benchmark", name, csv_file]
+
+    start_time = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    output = process.stdout.read()
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed_time = time.perf_counter() - start_time
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    if name.startswith("run_tests.py"):
+        seconds = elapsed_time
+    else:
+        if process.returncode != 0:
+            raise RuntimeError(f"The {name} benchmark failed.")
+        seconds = json.loads(output)["seconds"]
+
+    # ru_maxrss is in kilobytes on Linux, but bytes on macOS.
+    peak_rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+    with open(csv_file, "r") as csv_data:
+        row_count = sum(1 for _ in csv.reader(csv_data))
+    size = os.path.getsize(csv_file)
+
+    return {
+        "name": name,
+        "rows": row_count,
+        "bytes": size,
+        "seconds": seconds,
+        "rows_per_second": row_count / seconds,
+        "mb_per_second": size / seconds / 1e6,
+        "peak_rss_mb": peak_rss / 1e6,
+    }
+
+
+def measure_startup(repeat: int = 5) -> dict:
+    # The time taken by check_files.py to start and exit without any files, which is the latency that it adds to each
+    # commit when it runs as a pre-commit hook.  The fastest of several runs is kept, since the slower ones are slowed
+    # down by the rest of the machine.  A hook only compiles the modules on its first run, so the bytecode is written
+    # by a first run that isn't timed.
+    command = [sys.executable, os.path.join(root_path, "check_files.py")]
+    env = {x: y for x, y in os.environ.items() if x != "PYTHONDONTWRITEBYTECODE"}
+    subprocess.run(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    seconds = float("inf")
+    peak_rss = 0
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        _, status, usage = os.wait4(process.pid, 0)
+        seconds = min(seconds, time.perf_counter() - start_time)
+        if os.waitstatus_to_exitcode(status) != 0:
+            raise RuntimeError(f"The {startup_benchmark_name} benchmark failed.")
+        peak_rss = max(peak_rss, usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024)
+
+    # The number of starts per second stands in for the throughput, so that it is compared against the baseline in the
+    # same way as the other benchmarks.
+    return {
+        "name": startup_benchmark_name,
+        "rows": 0,
+        "bytes": 0,
+        "seconds": seconds,
+        "rows_per_second": 1 / seconds,
+        "mb_per_second": 0,
+        "peak_rss_mb": peak_rss / 1e6,
+    }
+
+
+def print_results(results: list[dict], baseline: dict):
+    print(f"{'Benchmark':<40} {'Rows':>10} {'Seconds':>9} {'Rows/sec':>12} {'MB/sec':>8} {'Peak RSS (MB)':>14} "
+          f"{'Change':>8}")
+    for result in results:
+        key = (result["name"], result["rows"])
+        change = ""
+        if key in baseline:
+            change = f"{result['rows_per_second'] / baseline[key]['rows_per_second'] - 1:+.1%}"
+        print(f"{result['name']:<40} {result['rows']:>10} {result['seconds']:>9.3f} "
+              f"{result['rows_per_second']:>12.0f} {result['mb_per_second']:>8.2f} {result['peak_rss_mb']:>14.1f} "
+              f"{change:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="measure the throughput of the format tests on synthetic data")
+    parser.add_argument("--benchmark", nargs=2, metavar=("NAME", "CSV_FILE"), help=argparse.SUPPRESS)
+    parser.add_argument("--compare", type=str, metavar="BASELINE",
+                        help="the path to a baseline to compare against. If the throughput of a benchmark has "
+                             "dropped by more than the tolerance, the exit status will be 1.")
+    parser.add_argument("--defect-rate", type=float, default=0.01, metavar="RATE",
+                        help="the fraction of rows that will contain a formatting error")
+    parser.add_argument("--filter", type=str, default="",
+                        help="only run the benchmarks whose names contain the given text")
+    parser.add_argument("--max-startup", type=float, default=100, metavar="MS",
+                        help="the number of milliseconds that check_files.py may take to start before it is "
+                             "considered a regression, regardless of the baseline")
+    parser.add_argument("--save-baseline", type=str, metavar="BASELINE",
+                        help="the path to a file that the results will be written to as JSON")
+    parser.add_argument("--sizes", type=lambda x: [int(y) for y in x.split(",")], default=[10000, 100000],
+                        metavar="N[,N...]", help="the numbers of rows in the generated files")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="the fraction by which the throughput may drop before it is considered a regression")
+    args = parser.parse_args()
+
+    if args.benchmark is not None:
+        print(json.dumps({"seconds": run_benchmark(*args.benchmark)}))
+        exit(0)
+
+    baseline = {}
+    if args.compare is not None:
+        with open(args.compare, "r") as baseline_file:
+            baseline = {(x["name"], x["rows"]): x for x in json.load(baseline_file)["results"]}
+
+    results = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        for size in args.sizes:
+            csv_file = os.path.join(data_dir, str(size), "2020", "counties", "precinct.csv")
+            generate_data.generate_file(csv_file, size, args.defect_rate)
+            for name in get_benchmark_names():
+                if args.filter in name and is_available(name):
+                    results.append(measure(name, csv_file))
+
+    if args.filter in startup_benchmark_name:
+        results.append(measure_startup())
+
+    print_results(results, baseline)
+
+    if args.save_baseline is not None:
+        with open(args.save_baseline, "w") as baseline_file:
+            json.dump({"defect_rate": args.defect_rate, "python": sys.version, "results": results}, baseline_file,
+                      indent=2)
+
+    regressions = []
+    for result in results:
+        key = (result["name"], result["rows"])
+        if key in baseline and result["rows_per_second"] < baseline[key]["rows_per_second"] * (1 - args.tolerance):
+            regressions.append(result["name"])
+        elif result["name"] == startup_benchmark_name and result["seconds"] * 1000 > args.max_startup:
+            regressions.append(result["name"])
+
+    if regressions:
+        print(f"\nThe throughput of these benchmarks has regressed: {', '.join(regressions)}")
+        exit(1)
@@ -0,0 +1,64 @@
+import argparse
+import sys
+
+from format_tests import registry, validation
+
+if __name__ == "__main__":
+    # Only the modules needed to validate the files are imported, so that a pre-commit hook that runs this on each
+    # commit starts quickly.
+    parser = argparse.ArgumentParser(description="test the format of the given files, as a pre-commit hook does")
+    parser.add_argument("files", type=str, nargs="*", metavar="FILE",
+                        help="the paths to the files to test. Paths that aren't CSV files under a year directory of "
+                             "--root are skipped.")
+    parser.add_argument("--engine", choices=validation.ValidationOptions.engines, default="python",
+                        help="the engine used to run the row tests. The columnar engine runs them on large chunks of "
+                             "rows at once, and requires NumPy.")
+    parser.add_argument("--ignore", action="append", default=[], metavar="PATTERN",
+                        help="skip the directories and files whose names or paths relative to --root match the given "
+                             "shell-style pattern. This option can be given more than once.")
+    parser.add_argument("--max-examples", type=int, default=10, metavar="N",
+                        help="the maximum number of failing rows to print for each test. If a negative value is "
+                             "provided, all failures will be printed.")
+    parser.add_argument("--no-prefilter", action="store_true",
+                        help="parse and test every row of every file. By default, the raw bytes of each file are "
+                             "scanned first, and the rows of files that can't fail any row test are skipped.")
+    parser.add_argument("--only", action="append", metavar="TEST",
+                        help="only run the given test, or the tests in the given scope: header, row or value. If only "
+                             "header tests are run, only the first line of each file is read. NonAlphanumericEntries "
+                             "and DuplicateRows are only run if they are named. This option can be given more than "
+                             "once.")
+    parser.add_argument("--root", type=str, default=".",
+                        help="the path to the repository containing the files, which is the current directory by "
+                             "default")
+    parser.add_argument("--skip", action="append", default=[], metavar="TEST",
+                        help="don't run the given test, or the tests in the given scope. This option can be given more "
+                             "than once.")
+    args = parser.parse_args()
+
+    if args.engine == "columnar":
+        from format_tests import columnar
+        if not columnar.is_available():
+            parser.error("the columnar engine requires NumPy")
+
+    try:
+        tests = registry.select(args.only, args.skip)
+    except ValueError as error:
+        parser.error(str(error))
+    if not tests:
+        parser.error("no tests are selected")
+
+    options = validation.ValidationOptions(max_examples=args.max_examples, full_messages=False, engine=args.engine,
+                                           prefilter=not args.no_prefilter, tests=tests)
+
+    csv_files = validation.get_listed_csv_files(args.root, args.files, args.ignore)
+    failed_count = 0
+    for result in validation.validate_files(csv_files, args.root, options):
+        if result.error is not None:
+            sys.stdout.write(f"{result.short_path}: error\n\t{type(result.error).__name__}: {result.error}\n")
+        elif not result.passed:
+            sys.stdout.write(f"{result.short_path}: failed{result.short_message}\n")
+        failed_count += not result.passed
+
+    if failed_count > 0:
+        sys.stdout.write(f"\n{failed_count} of {len(csv_files)} files failed\n")
+        exit(1)
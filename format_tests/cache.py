@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from format_tests import compressed, validation
+
+
+class ResultCache:
+    def __init__(self, cache_dir: str, root_path: str, fingerprint: str):
+        os.makedirs(cache_dir, exist_ok=True)
+        root_digest = hashlib.sha256(os.path.abspath(root_path).encode()).hexdigest()[:16]
+
+        self.__root_path = root_path
+        # The full messages that were too long to keep in memory are kept in files, rather than in the database.
+        self.__message_dir = os.path.join(cache_dir, f"format-tests-{root_digest}.messages")
+        self.__connection = sqlite3.connect(os.path.join(cache_dir, f"format-tests-{root_digest}.sqlite"))
+        self.__connection.execute("CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT)")
+
+        # Results recorded by a different version of the tests, or with different settings, can't be replayed.  The
+        # table is recreated, since a different version may also store them differently.
+        row = self.__connection.execute("SELECT value FROM metadata WHERE key = 'fingerprint'").fetchone()
+        if row is None or row[0] != fingerprint:
+            self.__connection.execute("DROP TABLE IF EXISTS results")
+            shutil.rmtree(self.__message_dir, ignore_errors=True)
+            self.__connection.execute("INSERT OR REPLACE INTO metadata VALUES ('fingerprint', ?)", (fingerprint,))
+
+        self.__connection.execute("CREATE TABLE IF NOT EXISTS results (path TEXT PRIMARY KEY, size INTEGER, "
+                                  "mtime INTEGER, digest TEXT, passed INTEGER, short_message TEXT, "
+                                  "full_message TEXT, message_file TEXT, tests TEXT)")
+        self.__connection.commit()
+        os.makedirs(self.__message_dir, exist_ok=True)
+
+    def close(self):
+        self.__connection.commit()
+        self.__connection.close()
+
+    def evict(self):
+        paths = [row[0] for row in self.__connection.execute("SELECT path FROM results")]
+        deleted_paths = []
+        for path in paths:
+            if not os.path.isfile(compressed.get_file_path(os.path.join(self.__root_path, path))):
+                deleted_paths.append((path,))
+                self.__remove_message_file(path)
+        self.__connection.executemany("DELETE FROM results WHERE path = ?", deleted_paths)
+        self.__connection.commit()
+
+    def get(self, csv_file: str) -> tuple[validation.FileResult, str]:
+        # The members of an archive are cached by the size, modification time and digest of the archive.  A file that
+        # can't be read is a cache miss, so that validating it reports the error.
+        short_path, year = validation.get_short_path_and_year(csv_file, self.__root_path)
+        try:
+            stat = os.stat(compressed.get_file_path(csv_file))
+        except OSError:
+            return None, None
+
+        row = self.__connection.execute("SELECT size, mtime, digest, passed, short_message, full_message, "
+                                        "message_file, tests FROM results WHERE path = ?", (short_path,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return self.__get_result(short_path, year, row), row[2]
+
+        # The modification time isn't preserved by a fresh checkout, so fall back to comparing the contents.
+        try:
+            digest = ResultCache.__get_digest(csv_file)
+        except OSError:
+            return None, None
+        if row is not None and row[0] == stat.st_size and row[2] == digest:
+            self.__connection.execute("UPDATE results SET mtime = ? WHERE path = ?", (stat.st_mtime_ns, short_path))
+            return self.__get_result(short_path, year, row), digest
+
+        return None, digest
+
+    def put(self, csv_file: str, digest: str, result: validation.FileResult):
+        # Errors aren't cached, so that they are raised again on the next run.  Neither are the results of files that
+        # have been removed since they were validated.
+        if result.error is not None:
+            return
+        try:
+            stat = os.stat(compressed.get_file_path(csv_file))
+        except OSError:
+            return
+
+        # A full message that was written to a file is copied to the cache without reading it into memory.
+        if result.full_message_path is None:
+            full_message, message_file = result.full_message, None
+            self.__remove_message_file(result.short_path)
+        else:
+            full_message, message_file = None, ResultCache.__get_message_file(result.short_path)
+            shutil.copyfile(result.full_message_path, os.path.join(self.__message_dir, message_file))
+
+        self.__connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                  (result.short_path, stat.st_size, stat.st_mtime_ns, digest, int(result.passed),
+                                   result.short_message, full_message, message_file, json.dumps(result.tests)))
+
+    def __get_result(self, short_path: str, year: str, row: tuple) -> validation.FileResult:
+        # The result is given a copy of the message file, since it removes the file once it has been reported.  If the
+        # message file has been removed, the result can't be replayed.
+        full_message_path = None
+        if row[6] is not None:
+            try:
+                with open(os.path.join(self.__message_dir, row[6]), "rb") as message_file, \
+                        tempfile.NamedTemporaryFile(suffix=".txt", delete=False) as copy:
+                    shutil.copyfileobj(message_file, copy)
+            except OSError:
+                return None
+            full_message_path = copy.name
+        return validation.FileResult(short_path, year, bool(row[3]), row[4], row[5] or "", tests=json.loads(row[7]),
+                                     full_message_path=full_message_path)
+
+    def __remove_message_file(self, short_path: str):
+        try:
+            os.remove(os.path.join(self.__message_dir, ResultCache.__get_message_file(short_path)))
+        except OSError:
+            pass
+
+    @staticmethod
+    def __get_message_file(short_path: str) -> str:
+        return f"{hashlib.sha256(short_path.encode()).hexdigest()[:32]}.txt"
+
+    @staticmethod
+    def __get_digest(csv_file: str) -> str:
+        digest = hashlib.sha256()
+        with open(compressed.get_file_path(csv_file), "rb") as csv_data:
+            for block in iter(lambda: csv_data.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+
+def get_fingerprint(*settings) -> str:
+    # Every module of the package is included, since the outcome of the tests can depend on any of those that read,
+    # decode, plan or run them.
+    digest = hashlib.sha256()
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(x for x in os.listdir(package_dir) if x.endswith(".py")):
+        with open(os.path.join(package_dir, name), "rb") as source:
+            digest.update(name.encode())
+            digest.update(source.read())
+    digest.update(repr(settings).encode())
+    return digest.hexdigest()
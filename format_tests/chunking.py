@@ -0,0 +1,85 @@
+import mmap
+import os
+
+# The number of bytes whose quotes are counted at a time when looking for the end of a chunk.
+block_size = 1 << 18
+
+_separators = (b',"', b'\r"', b'\n"')
+
+
+def get_chunks(csv_file: str, chunk_size: int) -> list[tuple[int, int]]:
+    # Splits the file into byte ranges of about chunk_size bytes each, which end at line breaks that aren't inside
+    # quoted entries, so that each range holds whole rows.  Returns the start and end of each range.
+    with open(csv_file, "rb") as csv_data:
+        size = os.fstat(csv_data.fileno()).st_size
+        if size <= chunk_size:
+            return [(0, size)]
+
+        with mmap.mmap(csv_data.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            boundaries = [0]
+            in_quotes = False
+            position = 0
+            target = chunk_size
+            while target < size:
+                line_break = data.find(b"\n", target)
+                if line_break == -1:
+                    break
+
+                in_quotes = _skip_quotes(data, position, line_break, in_quotes)
+                position = line_break
+                if in_quotes:
+                    target = line_break + 1
+                else:
+                    boundaries.append(line_break + 1)
+                    target = line_break + 1 + chunk_size
+
+    if boundaries[-1] < size:
+        boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def _skip_quotes(data, start: int, end: int, in_quotes: bool) -> bool:
+    # Returns whether end is inside a quoted entry, given whether start is.  The data are read in blocks that end at
+    # line breaks, so that each block but the first starts with one.
+    while start < end:
+        stop = data.find(b"\n", start + block_size, end)
+        if stop == -1:
+            stop = end
+        in_quotes = _count_quotes(data, start, stop, in_quotes)
+        start = stop
+    return in_quotes
+
+
+def _count_quotes(data, start: int, end: int, in_quotes: bool) -> bool:
+    # When each quote outside a quoted entry starts an entry, every quote either opens an entry, closes it, or is the
+    # first or second of a doubled quote inside it, and whether end is inside an entry only depends on the number of
+    # quotes before it.  That is the case when the text between the quotes outside the entries is empty or ends with a
+    # separator, which is checked by counting.  Otherwise, the quotes are followed one by one.
+    pieces = data[start:end].split(b'"')
+    if len(pieces) == 1:
+        return in_quotes
+
+    outside = pieces[in_quotes:-1:2]
+    text = b'"'.join(outside) + b'"'
+    if outside.count(b"") + sum(text.count(x) for x in _separators) == len(outside):
+        return in_quotes != (len(pieces) % 2 == 0)
+    return _scan_quotes(data, start, end, in_quotes)
+
+
+def _scan_quotes(data, start: int, end: int, in_quotes: bool) -> bool:
+    # Follows the quotes between start and end in the same way as csv.reader: a quote only opens an entry at the start
+    # of the entry, a doubled quote inside an entry stands for a quote, and any other quote is part of the entry.
+    position = start
+    while True:
+        quote = data.find(b'"', position, end)
+        if quote == -1:
+            return in_quotes
+
+        if in_quotes:
+            if data[quote + 1:quote + 2] == b'"':
+                position = quote + 2
+                continue
+            in_quotes = False
+        elif quote == 0 or data[quote - 1:quote] in (b",", b"\r", b"\n"):
+            in_quotes = True
+        position = quote + 1
@@ -0,0 +1,251 @@
+import functools
+import importlib.util
+import itertools
+import re
+import sys
+import time
+
+from format_tests import format_tests
+
+# numpy takes longer to import than the rest of the package together, so it is only imported once the columnar engine
+# is used, and the commands that don't use it start quickly.
+numpy = None
+
+chunk_size = 1 << 16
+
+
+def is_available() -> bool:
+    return numpy is not None or importlib.util.find_spec("numpy") is not None
+
+
+class _Chunk:
+    def __init__(self, rows: list[list[str]]):
+        separator = format_tests.row_separator
+
+        # The rows are joined into a single string, in the same way as for the row plans, and converted to an array
+        # of code points so that the checks can be run on the whole chunk at once.
+        joined_rows = [f"{separator}{separator.join(row)}{separator}" for row in rows]
+        self.text = "".join(joined_rows)
+        self.code_points = numpy.frombuffer(self.text.encode("utf-32-le", "surrogatepass"), dtype=numpy.uint32)
+        self.separators = self.code_points == ord(separator)
+        whitespace = _get_whitespace_table()
+        self.whitespace = whitespace[numpy.minimum(self.code_points, len(whitespace) - 1)]
+
+        lengths = numpy.fromiter(map(len, joined_rows), dtype=numpy.intp, count=len(rows))
+        self.row_starts = numpy.cumsum(lengths) - lengths
+        self.field_counts = numpy.fromiter(map(len, rows), dtype=numpy.intp, count=len(rows))
+        self.rows = rows
+
+        # An entry that contains the separator blurs the boundaries between the entries, so those rows are checked
+        # entry by entry instead.
+        separator_counts = numpy.add.reduceat(self.separators, self.row_starts, dtype=numpy.intp)
+        self.ambiguous_rows = numpy.flatnonzero(separator_counts != self.field_counts + 1)
+        self.is_ambiguous = numpy.zeros(len(rows), dtype=bool)
+        self.is_ambiguous[self.ambiguous_rows] = True
+
+    def get_rows(self, mask):
+        # The indices of the unambiguous rows that contain a position that is set in the mask.
+        return numpy.flatnonzero(numpy.logical_or.reduceat(mask, self.row_starts) & ~self.is_ambiguous)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_whitespace_table():
+    # The table covers every whitespace code point, followed by a False entry that the larger code points map to.
+    whitespace = [x for x in range(sys.maxunicode + 1) if chr(x).isspace()]
+    table = numpy.zeros(max(whitespace) + 2, dtype=bool)
+    table[whitespace] = True
+    return table
+
+
+def _consecutive_spaces(chunk: _Chunk):
+    mask = numpy.zeros(len(chunk.code_points), dtype=bool)
+    mask[:-1] = chunk.whitespace[:-1] & chunk.whitespace[1:]
+    return mask
+
+
+def _leading_and_trailing_spaces(chunk: _Chunk):
+    mask = numpy.zeros(len(chunk.code_points), dtype=bool)
+    mask[1:] = chunk.whitespace[1:] & chunk.separators[:-1]
+    mask[:-1] |= chunk.whitespace[:-1] & chunk.separators[1:]
+    return mask
+
+
+def _premature_line_breaks(chunk: _Chunk):
+    return chunk.code_points == ord("\n")
+
+
+def _tab_characters(chunk: _Chunk):
+    return chunk.code_points == ord("\t")
+
+
+def _row_pattern(regex: re.Pattern):
+    def kernel(chunk: _Chunk):
+        mask = numpy.zeros(len(chunk.code_points), dtype=bool)
+        mask[[x.start() for x in regex.finditer(chunk.text)]] = True
+        return mask
+
+    return kernel
+
+
+_value_kernels = {
+    format_tests.ConsecutiveSpaces: _consecutive_spaces,
+    format_tests.LeadingAndTrailingSpaces: _leading_and_trailing_spaces,
+    format_tests.PrematureLineBreaks: _premature_line_breaks,
+    format_tests.TabCharacters: _tab_characters,
+}
+
+
+def _test_value_test(chunk: _Chunk, test: format_tests.ValueTest, kernel):
+    ambiguous_rows = [x for x in chunk.ambiguous_rows if any(test.is_bad_value(y) for y in chunk.rows[x])]
+    return numpy.union1d(chunk.get_rows(kernel(chunk)), ambiguous_rows).astype(numpy.intp)
+
+
+def _test_empty_rows(chunk: _Chunk):
+    content = ~(chunk.whitespace | chunk.separators)
+    empty_rows = numpy.flatnonzero(~numpy.logical_or.reduceat(content, chunk.row_starts) & ~chunk.is_ambiguous)
+    ambiguous_rows = [x for x in chunk.ambiguous_rows if format_tests.EmptyRows.is_empty_row(chunk.rows[x])]
+    return numpy.union1d(empty_rows, ambiguous_rows).astype(numpy.intp)
+
+
+def _test_inconsistent_number_of_columns(chunk: _Chunk, header_count: int):
+    return numpy.flatnonzero(chunk.field_counts != header_count)
+
+
+def _test_non_integer_votes(chunk: _Chunk, test: format_tests.NonIntegerVotes, header_count: int):
+    rows = numpy.flatnonzero(chunk.field_counts == header_count)
+    if len(rows) == 0 or len(test.vote_indices) == 0:
+        return rows[:0]
+
+    consistent_rows = chunk.rows if len(rows) == len(chunk.rows) else [chunk.rows[x] for x in rows]
+    columns = list(zip(*consistent_rows))
+
+    is_bad_row = numpy.zeros(len(rows), dtype=bool)
+    for index in test.vote_indices:
+        column = columns[index]
+        values = numpy.array(column, dtype=str)
+
+        # Whole numbers are by far the most common values, and always pass.  Everything else is parsed exactly as
+        # NonIntegerVotes does.  Values that are too long could overflow to infinity, which isn't an integer.
+        unsigned_values = numpy.char.lstrip(values, "+-")
+        is_whole_number = numpy.char.isdigit(unsigned_values) & (numpy.char.str_len(unsigned_values) < 300)
+        for position in numpy.flatnonzero(~is_whole_number):
+            if format_tests.NonIntegerVotes.is_non_integer(column[position]):
+                is_bad_row[position] = True
+
+    if test.candidate_index is not None and is_bad_row.any():
+        candidates = columns[test.candidate_index]
+        percentages = {x: format_tests.NonIntegerVotes.is_percentage(x) for x in set(candidates)}
+        is_bad_row &= ~numpy.fromiter(map(percentages.__getitem__, candidates), dtype=bool, count=len(rows))
+
+    return rows[is_bad_row]
+
+
+def _get_kernel(test: format_tests.RowTest, headers: list[str]):
+    if isinstance(test, format_tests.ValueTest):
+        if type(test) in _value_kernels:
+            return functools.partial(_test_value_test, test=test, kernel=_value_kernels[type(test)])
+        elif test.row_pattern is not None:
+            kernel = _row_pattern(re.compile(test.row_pattern))
+            return functools.partial(_test_value_test, test=test, kernel=kernel)
+    elif isinstance(test, format_tests.EmptyRows):
+        return _test_empty_rows
+    elif isinstance(test, format_tests.InconsistentNumberOfColumns):
+        return functools.partial(_test_inconsistent_number_of_columns, header_count=len(headers))
+    elif isinstance(test, format_tests.NonIntegerVotes):
+        return functools.partial(_test_non_integer_votes, test=test, header_count=len(headers))
+
+    return None
+
+
+def scan(rows, tests: list[format_tests.RowTest], headers: list[str], profile=None, should_stop=None,
+         max_failures: int = None):
+    # The rows include the header, since the row tests are run on it too.  If should_stop is provided, it is called
+    # after each chunk, and the remaining rows are left unread once it returns True.  If max_failures is provided, the
+    # scan stops right after the row that brings the number of failing rows of the tests to max_failures, as a row plan
+    # does.  The rest of its chunk has already been read by then, so the tests are marked as partial.
+    _import_numpy()
+    kernels = {test: _get_kernel(test, headers) for test in tests}
+    other_tests = [test for test, kernel in kernels.items() if kernel is None]
+    timer = _Timer(profile)
+
+    first_row_number = 1
+    rows = iter(rows)
+    while chunk_rows := list(itertools.islice(rows, chunk_size)):
+        timer.add("parse")
+        chunk = _Chunk(chunk_rows)
+        timer.add("columnar chunk")
+
+        failing_rows = {}
+        for test, kernel in kernels.items():
+            if kernel is not None:
+                failing_rows[test] = kernel(chunk)
+                timer.add(type(test).__name__)
+
+        # Tests without a columnar implementation are run row by row.
+        if max_failures is None:
+            row_count = len(chunk_rows)
+            for test in other_tests:
+                for row in chunk_rows:
+                    test.test(row)
+                timer.add(type(test).__name__)
+        else:
+            remaining_failures = max_failures - sum(x.failure_count for x in tests)
+            row_count = _run_to_limit(chunk_rows, failing_rows, other_tests, remaining_failures, timer)
+
+        for test, indices in failing_rows.items():
+            for index in indices[indices < row_count]:
+                test._add_failure(first_row_number + int(index), chunk_rows[index])
+            timer.add(type(test).__name__)
+
+        first_row_number += row_count
+        if max_failures is not None and sum(x.failure_count for x in tests) >= max_failures:
+            if row_count < len(chunk_rows):
+                for test in tests:
+                    test.set_partial()
+            break
+        if should_stop is not None and should_stop():
+            break
+
+    timer.add("parse")
+    if profile is not None:
+        profile.rows += first_row_number - 1
+
+
+def _import_numpy():
+    global numpy
+    if numpy is None:
+        import numpy
+
+
+def _run_to_limit(rows: list[list[str]], failing_rows: dict, other_tests: list[format_tests.RowTest],
+                  remaining_failures: int, timer) -> int:
+    # Returns the number of rows of the chunk up to the one that brings the number of failing rows to
+    # remaining_failures, given the failing rows that the kernels found, and runs the other tests on those rows only.
+    counts = numpy.zeros(len(rows), dtype=numpy.intp)
+    for indices in failing_rows.values():
+        counts[indices] += 1
+    cumulative_counts = numpy.cumsum(counts)
+    if not other_tests:
+        return min(int(numpy.searchsorted(cumulative_counts, remaining_failures)) + 1, len(rows))
+
+    start_count = sum(x.failure_count for x in other_tests)
+    for index, row in enumerate(rows):
+        for test in other_tests:
+            test.test(row)
+            timer.add(type(test).__name__)
+        if cumulative_counts[index] + sum(x.failure_count for x in other_tests) - start_count >= remaining_failures:
+            return index + 1
+    return len(rows)
+
+
+class _Timer:
+    # Attributes the time since the previous call to the given name, if the scan is being profiled.
+    def __init__(self, profile):
+        self.__profile = profile
+        self.__time = time.perf_counter()
+
+    def add(self, name: str):
+        if self.__profile is not None:
+            current_time = time.perf_counter()
+            self.__profile.add(name, current_time - self.__time)
+            self.__time = current_time
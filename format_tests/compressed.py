@@ -0,0 +1,88 @@
+import os
+
+# The suffixes of CSV files that are compressed on their own, and the modules whose open() streams them.  The modules
+# that decompress the files, and zipfile, are only imported when they are used, so that validating plain CSV files, as a
+# pre-commit hook does, starts quickly.
+_openers = {
+    ".csv.bz2": "bz2",
+    ".csv.gz": "gzip",
+    ".csv.xz": "lzma",
+}
+
+archive_suffix = ".zip"
+
+
+def get_archive_members(archive_path: str) -> list[str]:
+    # Returns the CSV members of a ZIP archive, with "/" separators, sorted.  Hidden members, and those in hidden
+    # directories, are skipped.  Returns None if the file isn't a valid archive.
+    import zipfile
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            names = archive.namelist()
+    except (OSError, zipfile.BadZipFile):
+        return None
+
+    members = []
+    for name in names:
+        if name.lower().endswith(".csv") and not any(x.startswith(".") for x in name.split("/")):
+            members.append(name)
+    return sorted(members)
+
+
+def get_file_path(csv_file: str) -> str:
+    # The path of the file on disk that holds the CSV file, which is the archive for a member of one.
+    return split_member(csv_file)[0]
+
+
+def get_size(csv_file: str) -> int:
+    # The number of bytes that are read from the disk to validate the CSV file, which is its compressed size.
+    archive_path, member = split_member(csv_file)
+    if member is None:
+        return os.path.getsize(csv_file)
+
+    import zipfile
+    with zipfile.ZipFile(archive_path) as archive:
+        return archive.getinfo(member).compress_size
+
+
+def is_compressed(csv_file: str) -> bool:
+    return not csv_file.lower().endswith(".csv") or split_member(csv_file)[1] is not None
+
+
+def is_csv_name(name: str) -> bool:
+    # Whether a file with the given name holds CSV files, compressed or not.
+    name = name.lower()
+    return name.endswith(".csv") or name.endswith(archive_suffix) or any(name.endswith(x) for x in _openers)
+
+
+def open_binary(csv_file: str):
+    # Opens the CSV file for reading its decompressed bytes, which are decompressed as they are read.
+    archive_path, member = split_member(csv_file)
+    if member is not None or archive_path.lower().endswith(archive_suffix):
+        # The member keeps the archive open until it is closed.  A path to the archive itself is only given if it
+        # couldn't be listed, so opening it reports the error.
+        import zipfile
+        with zipfile.ZipFile(archive_path) as archive:
+            if member is None:
+                raise zipfile.BadZipFile(f"{archive_path} doesn't contain any CSV files.")
+            return archive.open(member)
+
+    module = next((y for x, y in _openers.items() if csv_file.lower().endswith(x)), None)
+    opener = open if module is None else __import__(module).open
+    return opener(csv_file, "rb")
+
+
+def split_member(csv_file: str) -> tuple[str, str]:
+    # A member of a ZIP archive is given by the path of the archive followed by its name in the archive, as if the
+    # archive were a directory.  Returns the path of the archive and the name of the member with "/" separators, or the
+    # path and None if it isn't a member of an archive.
+    if archive_suffix not in csv_file.lower():
+        return csv_file, None
+
+    parts = csv_file.split(os.sep)
+    for index in range(len(parts) - 1):
+        if parts[index].lower().endswith(archive_suffix):
+            archive_path = os.sep.join(parts[:index + 1])
+            if os.path.isfile(archive_path):
+                return archive_path, "/".join(parts[index + 1:])
+    return csv_file, None
@@ -0,0 +1,93 @@
+import codecs
+import io
+
+buffer_size = 1 << 20
+
+# The number of characters decoded at a time, which is larger than the default of io.TextIOWrapper.
+chunk_size = 1 << 16
+
+# The first block of a file is enough to tell its encoding, or that it isn't text at all.
+sniff_size = 1 << 12
+
+# The byte order marks of the encodings that are recognized by them.  UTF-32 is checked first, since its little-endian
+# mark starts with that of UTF-16.
+_boms = [
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+# The signatures of the files that most often end up with a .csv name by mistake.
+_magic_numbers = [
+    (b"PK\x03\x04", "a ZIP archive, such as an XLSX workbook"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "an OLE2 document, such as an XLS workbook"),
+    (b"%PDF-", "a PDF document"),
+    (b"\x1f\x8b", "gzip-compressed data"),
+    (b"\xfd7zXZ\x00", "xz-compressed data"),
+    (b"\x89PNG\r\n\x1a\n", "a PNG image"),
+    (b"\xff\xd8\xff", "a JPEG image"),
+    (b"<!doctype html", "an HTML page"),
+    (b"<html", "an HTML page"),
+]
+
+# Text has few control characters other than these.  A block with more than max_control_fraction of other control
+# characters is taken to be binary, as long as it has at least min_control_bytes of them, so that a stray one doesn't
+# reject a short file.
+_text_control_bytes = b"\t\n\x0c\r\x1a\x1b"
+_control_bytes = bytes(x for x in range(0x20) if x not in _text_control_bytes) + b"\x7f"
+_other_bytes = bytes(x for x in range(256) if x not in _control_bytes)
+max_control_fraction = 0.05
+min_control_bytes = 16
+
+
+class BinaryFileError(ValueError):
+    pass
+
+
+def open_text(binary_file, name: str, encoding: str = None, header_only: bool = False) -> io.TextIOWrapper:
+    # Wraps a file opened for reading bytes.  Unless the encoding is given, the first block is used to pick it, or to
+    # reject the file if it isn't text.  Text without a byte order mark is decoded as UTF-8, unless it looks like
+    # UTF-16.  Bytes that aren't valid in the encoding are replaced with U+FFFD, which EncodingErrors reports row by
+    # row.  The line breaks are handled in the same way as open() would.  If only the header will be read, the file is
+    # read in small blocks, so that little more than the first line is read.
+    if encoding is None:
+        if not hasattr(binary_file, "peek"):
+            binary_file = io.BufferedReader(binary_file, sniff_size if header_only else buffer_size)
+        try:
+            encoding = sniff(binary_file.peek(sniff_size)[:sniff_size])
+        except BinaryFileError as error:
+            binary_file.close()
+            raise BinaryFileError(f"{name} is {error}, not a CSV file.") from None
+
+    text_file = io.TextIOWrapper(binary_file, encoding=encoding, errors="replace")
+    if not header_only:
+        text_file._CHUNK_SIZE = chunk_size
+    return text_file
+
+
+def sniff(block: bytes) -> str:
+    # Returns the encoding of the text that starts with the given block, or raises BinaryFileError if it isn't text.
+    for bom, encoding in _boms:
+        if block.startswith(bom):
+            return encoding
+
+    # The signatures of HTML pages aren't case-sensitive.
+    for magic_number, description in _magic_numbers:
+        if block[:len(magic_number)].lower() == magic_number.lower():
+            raise BinaryFileError(description)
+
+    # Without a byte order mark, UTF-16 text is mostly ASCII characters, every other byte of which is 0.
+    even_nulls = block[0::2].count(b"\x00")
+    odd_nulls = block[1::2].count(b"\x00")
+    if odd_nulls > len(block) // 4 and even_nulls == 0:
+        return "utf-16-le"
+    if even_nulls > len(block) // 4 and odd_nulls == 0:
+        return "utf-16-be"
+
+    control_bytes = len(block.translate(None, _other_bytes))
+    if control_bytes >= min_control_bytes and control_bytes > len(block) * max_control_fraction:
+        raise BinaryFileError("binary data")
+
+    return "utf-8"
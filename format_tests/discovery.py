@@ -0,0 +1,136 @@
+import fnmatch
+import os
+import re
+
+from format_tests import compressed
+
+
+class Manifest:
+    # Records what each directory contained when it was last listed, keyed by its path relative to the root.  Adding,
+    # removing or renaming an entry changes the modification time of its directory, so a directory whose modification
+    # time hasn't changed can be reused from the manifest without being listed again.
+    version = 2
+
+    def __init__(self, path: str, root_path: str, ignore_patterns: list[str]):
+        self.__directories = {}
+        self.__path = path
+        self.__previous_directories = {}
+        self.__settings = {"version": Manifest.version, "root_path": os.path.abspath(root_path),
+                           "ignore_patterns": list(ignore_patterns)}
+
+        # json and tempfile are only imported with a manifest, so that validating a few files starts quickly.
+        import json
+
+        try:
+            with open(path, "r") as manifest_file:
+                contents = json.load(manifest_file)
+        except (OSError, ValueError):
+            contents = None
+
+        # A manifest written for another root, or with other ignore patterns, can't be reused.
+        if isinstance(contents, dict) and all(contents.get(x) == y for x, y in self.__settings.items()):
+            self.__previous_directories = contents.get("directories", {})
+
+    def get(self, short_path: str, mtime: int) -> tuple[list[str], list[str]]:
+        directory = self.__previous_directories.get(short_path)
+        if directory is None or directory["mtime"] != mtime:
+            return None
+
+        self.__directories[short_path] = directory
+        return directory["directories"], directory["files"]
+
+    def set(self, short_path: str, mtime: int, directories: list[str], files: list[str]):
+        self.__directories[short_path] = {"mtime": mtime, "directories": directories, "files": files}
+
+    def write(self):
+        # The manifest is replaced atomically, so that an interrupted run can't leave a partial one behind.  It is left
+        # alone if every directory was reused from it.
+        if self.__directories == self.__previous_directories:
+            return
+
+        import json
+        import tempfile
+
+        directory = os.path.dirname(os.path.abspath(self.__path))
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp", delete=False) as manifest_file:
+            manifest_file.write(json.dumps({**self.__settings, "directories": self.__directories}))
+        os.replace(manifest_file.name, self.__path)
+
+
+def expand_archive(path: str, short_path: str, ignore_patterns: list[str]) -> list[str]:
+    # Returns the CSV files that a file holds, which are the members of an archive.  An archive that can't be read is
+    # returned itself, so that the error is reported against it.
+    if not short_path.lower().endswith(compressed.archive_suffix):
+        return [path]
+
+    members = compressed.get_archive_members(path)
+    if members is None:
+        return [path]
+    return [os.path.join(path, *x.split("/")) for x in members if not is_ignored(f"{short_path}/{x}", ignore_patterns)]
+
+
+def iter_csv_files(root_path: str, ignore_patterns: list[str] = (), manifest_path: str = None):
+    # Yields the CSV files under the directories named by a year, sorted by their paths relative to root_path, as they
+    # are found.  Directories and files are skipped if their name or relative path matches one of the ignore patterns,
+    # as are hidden ones.  The members of ZIP archives are yielded as if the archives were directories.  The manifest
+    # is only written once every file has been yielded.
+    manifest = None if manifest_path is None else Manifest(manifest_path, root_path, ignore_patterns)
+    yield from _walk(root_path, "", ignore_patterns, manifest)
+    if manifest is not None:
+        manifest.write()
+
+
+def is_ignored(short_path: str, ignore_patterns: list[str]) -> bool:
+    # Checks the path and each of its parent directories, which are given relative to the root with "/" separators.
+    parts = short_path.split("/")
+    for index in range(len(parts)):
+        if _matches(parts[index], "/".join(parts[:index + 1]), ignore_patterns):
+            return True
+    return False
+
+
+def _matches(name: str, short_path: str, ignore_patterns: list[str]) -> bool:
+    return any(fnmatch.fnmatchcase(name, x) or fnmatch.fnmatchcase(short_path, x) for x in ignore_patterns)
+
+
+def _walk(root_path: str, short_path: str, ignore_patterns: list[str], manifest: Manifest):
+    directory = os.path.join(root_path, *short_path.split("/")) if short_path else root_path
+
+    listing = None
+    if manifest is not None:
+        mtime = os.stat(directory).st_mtime_ns
+        listing = manifest.get(short_path, mtime)
+
+    if listing is None:
+        directories = []
+        files = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir():
+                    directories.append(entry.name)
+                elif short_path and compressed.is_csv_name(entry.name):
+                    files.append(entry.name)
+
+        if manifest is not None:
+            manifest.set(short_path, mtime, directories, files)
+    else:
+        directories, files = listing
+
+    # A separator is appended to the names of the directories and archives, so that the files are yielded in the order
+    # of their relative paths.
+    entries = [(f"{x}{os.sep}", x, True) for x in directories]
+    for name in files:
+        entries.append((f"{name}{os.sep}" if name.lower().endswith(compressed.archive_suffix) else name, name, False))
+
+    for _, name, is_directory in sorted(entries):
+        child_path = f"{short_path}/{name}" if short_path else name
+        if _matches(name, child_path, ignore_patterns):
+            continue
+
+        if not is_directory:
+            yield from expand_archive(os.path.join(directory, name), child_path, ignore_patterns)
+        elif short_path or re.fullmatch(r"[0-9]{4}", name):
+            yield from _walk(root_path, child_path, ignore_patterns, manifest)
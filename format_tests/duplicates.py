@@ -0,0 +1,108 @@
+import sqlite3
+
+bloom_size = 16 << 20
+
+
+class BloomFilter:
+    # A set of 64-bit digests in a fixed amount of memory.  It may report that a digest has been added when it hasn't,
+    # but never the other way around.  The digests are already uniformly distributed, so the three bits of a digest are
+    # taken from different parts of it rather than hashed again.  With the default size of 16 MiB, about 1% of the
+    # lookups are false positives after 10 million digests, and the rate grows slowly after that.
+    def __init__(self, size: int = bloom_size):
+        # The size is rounded down to a power of two, so that the positions of the bits can be masked out.
+        self.__bits = bytearray(1 << (size.bit_length() - 1))
+        self.__mask = len(self.__bits) * 8 - 1
+        self.__shift = self.__mask.bit_length()
+
+    def add(self, digest: int) -> bool:
+        # Adds the digest, and returns whether it may have been added before.
+        bits = self.__bits
+        mask = self.__mask
+        shift = self.__shift
+        digest &= 0xffffffffffffffff
+        first = digest & mask
+        second = (digest >> shift) & mask
+        third = ((digest >> (2 * shift)) ^ (digest << (64 - 2 * shift))) & mask
+
+        first_byte, first_bit = bits[first >> 3], 1 << (first & 7)
+        second_byte, second_bit = bits[second >> 3], 1 << (second & 7)
+        third_byte, third_bit = bits[third >> 3], 1 << (third & 7)
+        if first_byte & first_bit and second_byte & second_bit and third_byte & third_bit:
+            return True
+
+        bits[first >> 3] |= first_bit
+        bits[second >> 3] |= second_bit
+        bits[third >> 3] |= third_bit
+        return False
+
+    def clear(self):
+        self.__bits = bytearray(len(self.__bits))
+
+
+class DuplicateIndex:
+    # Remembers where each row digest was first seen, so that the rows that repeat it can be reported.  The digests are
+    # 128 bits long, given as pairs of 64-bit integers, and kept in a temporary SQLite database on disk, so the memory
+    # used doesn't grow with the number of rows.  Most digests are new, and the Bloom filter in front of the database
+    # answers those from the first half of their digest, without a lookup.  New digests are written in batches.
+    batch_size = 1 << 16
+
+    def __init__(self, path: str = "", size: int = bloom_size):
+        # An empty path gives a database in a temporary file that is removed when it is closed.
+        self.__bloom_filter = BloomFilter(size)
+        self.__connection = sqlite3.connect(path)
+        self.__connection.execute("PRAGMA journal_mode = OFF")
+        self.__connection.execute("PRAGMA synchronous = OFF")
+        self.__connection.execute(f"PRAGMA cache_size = -{size >> 10}")
+        self.__connection.execute("CREATE TABLE IF NOT EXISTS paths (id INTEGER PRIMARY KEY, path TEXT)")
+        self.__connection.execute("CREATE TABLE IF NOT EXISTS digests (low INTEGER, high INTEGER, path_id INTEGER, "
+                                  "row_number INTEGER, PRIMARY KEY (low, high)) WITHOUT ROWID")
+        self.__pending = {}
+        self.__year = None
+
+    def add(self, year: str, short_path: str, rows):
+        # Adds the row numbers and digests of a file, and yields the number of each row whose digest has already been
+        # seen in the same year, along with the path and row number of its first occurrence.  Only the digests of one
+        # year are kept at a time, so the files of each year must be added together, as they are when they are added
+        # in the order of their paths.
+        if year != self.__year:
+            self.__clear()
+            self.__year = year
+
+        path_id = self.__connection.execute("INSERT INTO paths (path) VALUES (?)", (short_path,)).lastrowid
+        for row_number, digest in rows:
+            if self.__bloom_filter.add(digest[0]):
+                first_occurrence = self.__find(digest)
+                if first_occurrence is not None:
+                    first_path_id, first_row_number = first_occurrence
+                    first_path = short_path
+                    if first_path_id != path_id:
+                        first_path = self.__connection.execute("SELECT path FROM paths WHERE id = ?",
+                                                               (first_path_id,)).fetchone()[0]
+                    yield row_number, first_path, first_row_number
+                    continue
+
+            self.__pending[digest] = (path_id, row_number)
+            if len(self.__pending) >= DuplicateIndex.batch_size:
+                self.__flush()
+
+    def close(self):
+        self.__connection.close()
+
+    def __clear(self):
+        self.__bloom_filter.clear()
+        self.__pending = {}
+        self.__connection.execute("DELETE FROM digests")
+        self.__connection.execute("DELETE FROM paths")
+
+    def __find(self, digest: tuple[int, int]) -> tuple[int, int]:
+        if digest in self.__pending:
+            return self.__pending[digest]
+        return self.__connection.execute("SELECT path_id, row_number FROM digests WHERE low = ? AND high = ?",
+                                         digest).fetchone()
+
+    def __flush(self):
+        # Inserting the digests in order touches each page of the index once per batch.
+        with self.__connection:
+            self.__connection.executemany("INSERT INTO digests VALUES (?, ?, ?, ?)",
+                                          ((*x, *self.__pending[x]) for x in sorted(self.__pending)))
+        self.__pending = {}
@@ -0,0 +1,44 @@
+import gzip
+import io
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+buffer_size = 1 << 20
+
+
+class FailureLog:
+    # Appends the full failure messages to the log file as they are produced, through a large buffer, so that writing
+    # a long message takes a single pass and doesn't need the whole message in memory.  The log is compressed with gzip
+    # if its path ends with ".gz", or with Zstandard if it ends with ".zst".
+    def __init__(self, path: str):
+        if path.endswith(".gz"):
+            self.__file = gzip.open(path, "at", encoding="utf-8")
+        elif path.endswith(".zst"):
+            if zstandard is None:
+                raise RuntimeError("Compressing the log with Zstandard requires the zstandard package.")
+            raw_file = open(path, "ab")
+            self.__file = io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(raw_file), encoding="utf-8")
+        else:
+            self.__file = open(path, "a", encoding="utf-8", buffering=buffer_size)
+
+    def close(self):
+        self.__file.close()
+
+    def write_failure(self, description: str, message_parts):
+        # The message can be given as a string, or as an iterable of its parts.
+        self.__file.write("======================================================================\n")
+        self.__file.write(f"FAIL: {description}\n")
+        self.__file.write("----------------------------------------------------------------------\n")
+        if isinstance(message_parts, str):
+            self.__file.write(message_parts)
+        else:
+            for part in message_parts:
+                self.__file.write(part)
+        self.__file.write("\n\n")
+
+
+def is_available(path: str) -> bool:
+    return zstandard is not None or not path.endswith(".zst")
@@ -1,6 +1,97 @@
+import array
+import itertools
+import os
 import re
+import weakref
 from abc import ABC, abstractmethod
 
+from format_tests import memory
+
+
+class FailureStore:
+    # Only the first failures are kept in memory, since those are the ones printed to the console.  The rest are
+    # written to a temporary file, so a badly formatted file doesn't exhaust the memory.  In low-memory mode, every
+    # failure is written to the file.  Once a failure has been written to it, the later ones are too, so that they stay
+    # in order.  The file is named, so that a worker process can hand it over instead of sending the failures in it,
+    # and it is removed once the store that holds it is no longer used.
+    max_examples_in_memory = 100
+
+    # The size of the failures that are written to the file at a time.
+    write_size = 1 << 16
+
+    def __init__(self):
+        self.__count = 0
+        self.__examples = []
+        self.__last_row_number = None
+        self.__spill_path = None
+        self.__spill_lines = []
+        self.__spill_size = 0
+        self.__remover = None
+
+    def __len__(self):
+        return self.__count
+
+    def __getstate__(self):
+        # The file is handed over to the copy in the other process, which removes it.
+        self.__flush()
+        if self.__remover is not None:
+            self.__remover.detach()
+        return self.__count, self.__examples, self.__last_row_number, self.__spill_path
+
+    def __iter__(self):
+        yield from self.__examples
+
+        if self.__spill_path is not None:
+            import json
+
+            self.__flush()
+            with open(self.__spill_path, "r", encoding="utf-8") as spill_file:
+                for line in spill_file:
+                    row_number, row = json.loads(line)
+                    yield row_number, row
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.__count, self.__examples, self.__last_row_number, self.__spill_path = state
+        if self.__spill_path is not None:
+            self.__remover = weakref.finalize(self, _remove_file, self.__spill_path)
+
+    def add(self, row_number: int, row: list[str]):
+        # A row is only recorded once, even if several of its entries fail.
+        if row_number == self.__last_row_number:
+            return
+
+        self.__count += 1
+        self.__last_row_number = row_number
+        if self.__spill_path is None and len(self.__examples) < FailureStore.max_examples_in_memory \
+                and not memory.is_low():
+            self.__examples.append((row_number, row))
+            return
+
+        # json and tempfile are only imported once failures are written to the file, which most runs never do, so that
+        # validating a few files starts quickly.
+        import json
+        if self.__spill_path is None:
+            import tempfile
+            with tempfile.NamedTemporaryFile(suffix=".failures", delete=False) as spill_file:
+                self.__spill_path = spill_file.name
+            self.__remover = weakref.finalize(self, _remove_file, self.__spill_path)
+        line = f"{json.dumps([row_number, row])}\n"
+        self.__spill_lines.append(line)
+        self.__spill_size += len(line)
+        if self.__spill_size >= FailureStore.write_size:
+            self.__flush()
+
+    def get_examples(self, max_examples: int = -1) -> list[tuple[int, list[str]]]:
+        return list(itertools.islice(self, None if max_examples < 0 else max_examples))
+
+    def __flush(self):
+        if self.__spill_lines:
+            with open(self.__spill_path, "a", encoding="utf-8") as spill_file:
+                spill_file.writelines(self.__spill_lines)
+            self.__spill_lines = []
+            self.__spill_size = 0
+
 
 class FormatTest(ABC):
     @property
@@ -12,6 +103,10 @@ class FormatTest(ABC):
     def get_failure_message(self, max_examples: int) -> str:
         pass
 
+    def iter_failure_message(self, max_examples: int = -1):
+        # Yields the failure message in parts, so that a long one can be written out without building it in memory.
+        yield self.get_failure_message(max_examples)
+
     @abstractmethod
     def test(self, value):
         pass
@@ -22,58 +117,130 @@ class RowTest(FormatTest):
     def __init__(self):
         super().__init__()
         self.__current_row = 0
+        self.__partial = False
 
     @property
     def current_row(self) -> int:
         return self.__current_row
 
+    @property
+    @abstractmethod
+    def failure_count(self) -> int:
+        pass
+
+    @property
+    def partial(self) -> bool:
+        return self.__partial
+
+    def get_examples(self, max_examples: int = -1) -> list[tuple[int, list[str]]]:
+        # The numbers and entries of the first failing rows.  Tests that don't record their failing rows have none.
+        return []
+
+    def has_enough_failures(self, max_examples: int) -> bool:
+        # Whether enough failures have been found to fill the failure message, if the rest of the rows are skipped.
+        return max_examples >= 0 and self.failure_count >= max(max_examples, 1)
+
+    def iter_failures(self):
+        # The numbers and entries of all the failing rows.  Tests that don't record their failing rows have none.
+        return iter(())
+
+    def merge(self, other: "RowTest", row_offset: int):
+        # Adds the failures that the same test found in a later part of the same file, which starts after row_offset
+        # rows, so that the test ends up as if it had seen the whole file.
+        for row_number, row in other.iter_failures():
+            self._add_failure(row_offset + row_number, row)
+
+    def set_partial(self):
+        # Marks the test as having only seen some of the rows, so the failure count is a lower bound.
+        self.__partial = True
+
     def test(self, value):
         self.__current_row += 1
         self._test_row(value)
 
+    def _format_count(self, count: int) -> str:
+        return f"at least {count}" if self.__partial else f"{count}"
+
     @abstractmethod
     def _test_row(self, row: list[str]):
         pass
 
 
 class ValueTest(RowTest):
+    # A pattern that matches a bad value in a row whose entries have been joined, and surrounded, by row_separator,
+    # along with a single character pattern that every match starts with.  These let the row plans screen a row for all
+    # of its value tests with one search.  Subclasses that don't provide them are always checked entry by entry.
+    row_pattern = None
+    row_trigger = None
+
     def __init__(self):
         super().__init__()
-        self.__failures = {}
+        self.__failures = FailureStore()
 
     @property
     @abstractmethod
     def description(self) -> str:
         pass
 
+    @property
+    def failure_count(self):
+        return len(self.__failures)
+
     @property
     def passed(self):
         return len(self.__failures) == 0
 
+    def get_examples(self, max_examples=-1):
+        return self.__failures.get_examples(max_examples)
+
+    def iter_failures(self):
+        return iter(self.__failures)
+
     def get_failure_message(self, max_examples=-1):
-        message = f"There are {len(self.__failures)} rows that have entries with {self.description}:\n"
+        return "".join(self.iter_failure_message(max_examples))
+
+    def iter_failure_message(self, max_examples=-1):
+        yield f"There are {self._format_count(len(self.__failures))} rows that have entries with {self.description}:\n"
         count = 0
-        for key, value in self.__failures.items():
+        for key, value in self.__failures:
             if (max_examples >= 0) and (count >= max_examples):
-                message += f"\n\t[Truncated to {max_examples} examples]"
-                return message
+                yield f"\n\t[Truncated to {max_examples} examples]"
+                return
             else:
-                message += f"\n\tRow {key}: {value}"
+                yield f"\n\tRow {key}: {value}"
                 count += 1
 
-        return message
-
     @abstractmethod
     def is_bad_value(self, value) -> bool:
         pass
 
+    def _add_failure(self, row_number: int, row: list[str]):
+        self.__failures.add(row_number, row)
+
     def _test_row(self, row: list[str]):
         for entry in row:
             if self.is_bad_value(entry):
-                self.__failures[self.current_row] = row
+                self._add_failure(self.current_row, row)
                 break
 
 
+# The character that the entries of a row are joined, and surrounded, by before the row is searched for bad values.
+row_separator = "\x00"
+
+
+def compile_row_regex(test_classes) -> re.Pattern:
+    # Returns a pattern that matches the bad values of all the tests (or test classes) in a joined row, or None if any
+    # of them doesn't have a row pattern.  Patterns that share a trigger are placed behind a lookahead on it, so the
+    # search can skip straight to the characters that could start a match.
+    if not all(test.row_pattern is not None for test in test_classes):
+        return None
+
+    patterns = {}
+    for test in test_classes:
+        patterns.setdefault(test.row_trigger, []).append(test.row_pattern)
+    return re.compile("|".join(f"(?={trigger})(?:{'|'.join(group)})" for trigger, group in patterns.items()))
+
+
 class EmptyHeaders(FormatTest):
     def __init__(self):
         super().__init__()
@@ -169,6 +336,8 @@ class WhitespaceInHeaders(FormatTest):
 
 class ConsecutiveSpaces(ValueTest):
     regex = re.compile(r"\s{2,}")
+    row_pattern = r"\s\s"
+    row_trigger = r"\s"
 
     @property
     def description(self):
@@ -178,6 +347,118 @@ class ConsecutiveSpaces(ValueTest):
         return bool(ConsecutiveSpaces.regex.search(value))
 
 
+class DuplicateRows(RowTest):
+    # Records a digest of each row, from which validate_files() finds the rows that duplicate an earlier row of the same
+    # file, or of an earlier file of the same year.  The entries are compared without the whitespace at either end, and
+    # column by column under the same header, so files with the same columns in a different order are compared too.
+    # The header, rows that repeat it and empty rows are skipped.  The digests are 128 bits long, and taken as proof
+    # that two rows are equal, without reading the rows again: the chance that two different rows among a billion share
+    # a digest is about one in 10^20.  Past max_digests_in_memory rows, the digests are moved to a temporary file,
+    # which is named so that a worker process can hand it over.
+    max_digests_in_memory = 1 << 16
+
+    def __init__(self, headers):
+        # hashlib is only imported when the test is run, since it isn't by default.
+        import hashlib
+
+        super().__init__()
+        keys = [x.strip().lower() for x in headers]
+        self.__blake2b = hashlib.blake2b
+        self.__digests = array.array("q")
+        self.__duplicates = FailureStore()
+        self.__order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.__prefix = "\x1f".join(keys[x] for x in self.__order) + "\x1e"
+        self.__spill_path = None
+        self.__header_digest = self.__get_digest(headers)
+
+    @property
+    def failure_count(self):
+        return len(self.__duplicates)
+
+    @property
+    def passed(self):
+        return len(self.__duplicates) == 0
+
+    def add_duplicate(self, row_number: int, first_path: str, first_row_number: int):
+        self._add_failure(row_number, [first_path, first_row_number])
+
+    def discard_digests(self):
+        if self.__spill_path is not None:
+            _remove_file(self.__spill_path)
+        self.__digests = array.array("q")
+        self.__spill_path = None
+
+    def get_examples(self, max_examples=-1):
+        return self.__duplicates.get_examples(max_examples)
+
+    def get_failure_message(self, max_examples=-1):
+        return "".join(self.iter_failure_message(max_examples))
+
+    def iter_digests(self):
+        # Yields the number and the digest of each row, in order.  Each digest is given as a pair of 64-bit integers.
+        if self.__spill_path is not None:
+            with open(self.__spill_path, "rb") as spill_file:
+                for block in iter(lambda: spill_file.read(DuplicateRows.max_digests_in_memory * 24), b""):
+                    digests = array.array("q", block)
+                    yield from zip(digests[::3], zip(digests[1::3], digests[2::3]))
+        yield from zip(self.__digests[::3], zip(self.__digests[1::3], self.__digests[2::3]))
+
+    def iter_failure_message(self, max_examples=-1):
+        yield f"There are {self._format_count(len(self.__duplicates))} rows that duplicate an earlier row:\n"
+        count = 0
+        for key, (first_path, first_row_number) in self.__duplicates:
+            if (max_examples >= 0) and (count >= max_examples):
+                yield f"\n\t[Truncated to {max_examples} examples]"
+                return
+            else:
+                yield f"\n\tRow {key}: duplicates row {first_row_number} of {first_path}"
+                count += 1
+
+    def iter_failures(self):
+        return iter(self.__duplicates)
+
+    def merge(self, other: "DuplicateRows", row_offset: int):
+        for row_number, digest in other.iter_digests():
+            self.__digests.append(row_offset + row_number)
+            self.__digests.extend(digest)
+            self.__check_digest_count()
+        other.discard_digests()
+
+    def __check_digest_count(self):
+        # Each row takes three integers: its number and the two halves of its digest.
+        if len(self.__digests) >= 3 * DuplicateRows.max_digests_in_memory:
+            if self.__spill_path is None:
+                import tempfile
+                with tempfile.NamedTemporaryFile(suffix=".digests", delete=False) as spill_file:
+                    self.__spill_path = spill_file.name
+            with open(self.__spill_path, "ab") as spill_file:
+                self.__digests.tofile(spill_file)
+            self.__digests = array.array("q")
+
+    def __get_digest(self, row: list[str]) -> bytes:
+        # Returns None for an empty row.
+        if len(row) == len(self.__order):
+            entries = [row[x].strip() for x in self.__order]
+        else:
+            entries = [x.strip() for x in row]
+        if not any(entries):
+            return None
+
+        data = (self.__prefix + "\x1f".join(entries)).encode("utf-8", "surrogatepass")
+        return self.__blake2b(data, digest_size=16).digest()
+
+    def _add_failure(self, row_number: int, row: list):
+        self.__duplicates.add(row_number, row)
+
+    def _test_row(self, row: list[str]):
+        digest = self.__get_digest(row)
+        if digest is not None and digest != self.__header_digest:
+            # The digest is stored as two 64-bit integers, without converting it.
+            self.__digests.append(self.current_row)
+            self.__digests.frombytes(digest)
+            self.__check_digest_count()
+
+
 class EmptyRows(RowTest):
     regex = re.compile(r"\S")
 
@@ -185,57 +466,90 @@ class EmptyRows(RowTest):
         super().__init__()
         self.__empty_row_count = 0
 
+    @property
+    def failure_count(self):
+        return self.__empty_row_count
+
     @property
     def passed(self):
         return self.__empty_row_count == 0
 
+    def has_enough_failures(self, max_examples: int) -> bool:
+        # The empty rows aren't listed, so a single one is enough.
+        return self.__empty_row_count > 0
+
     def get_failure_message(self, max_examples=0):
-        return f"Has {self.__empty_row_count} empty rows."
+        return f"Has {self._format_count(self.__empty_row_count)} empty rows."
 
-    def _test_row(self, row: list[str]):
+    def merge(self, other: "EmptyRows", row_offset: int):
+        self.__empty_row_count += other.failure_count
+
+    @staticmethod
+    def is_empty_row(row: list[str]) -> bool:
         has_content = False
         for entry in row:
             has_content |= bool(EmptyRows.regex.search(entry))
 
-        if not has_content:
-            self.__empty_row_count += 1
+        return not has_content
+
+    def _add_failure(self, row_number: int, row: list[str]):
+        self.__empty_row_count += 1
+
+    def _test_row(self, row: list[str]):
+        if EmptyRows.is_empty_row(row):
+            self._add_failure(self.current_row, row)
 
 
 class InconsistentNumberOfColumns(RowTest):
     def __init__(self, headers):
         super().__init__()
-        self.__failures = {}
+        self.__failures = FailureStore()
         self.__headers = headers
 
+    @property
+    def failure_count(self):
+        return len(self.__failures)
+
     @property
     def passed(self):
         return len(self.__failures) == 0
 
+    def get_examples(self, max_examples=-1):
+        return self.__failures.get_examples(max_examples)
+
+    def iter_failures(self):
+        return iter(self.__failures)
+
     def get_failure_message(self, max_examples=-1):
-        message = f"Header has {len(self.__headers)} entries, but there are {len(self.__failures)} " \
-                  f"rows with an inconsistent number of columns:\n\n" \
-                  f"\tHeaders ({len(self.__headers)} entries): {self.__headers}:"
+        return "".join(self.iter_failure_message(max_examples))
+
+    def iter_failure_message(self, max_examples=-1):
+        yield f"Header has {len(self.__headers)} entries, but there are " \
+              f"{self._format_count(len(self.__failures))} " \
+              f"rows with an inconsistent number of columns:\n\n" \
+              f"\tHeaders ({len(self.__headers)} entries): {self.__headers}:"
 
         count = 0
-        for key, value in self.__failures.items():
+        for key, value in self.__failures:
             if (max_examples >= 0) and (count >= max_examples):
-                message += f"\n\t[Truncated to {max_examples} examples]"
-                return message
+                yield f"\n\t[Truncated to {max_examples} examples]"
+                return
             else:
-                message += f"\n\tRow {key} ({len(value)} entries): {value}"
+                yield f"\n\tRow {key} ({len(value)} entries): {value}"
                 count += 1
 
-        return message
+    def _add_failure(self, row_number: int, row: list[str]):
+        self.__failures.add(row_number, row)
 
     def _test_row(self, row: list[str]):
         if len(row) != len(self.__headers):
-            self.__failures[self.current_row] = row
+            self._add_failure(self.current_row, row)
 
 
 class NonIntegerVotes(RowTest):
     def __init__(self, headers: list[str]):
         super().__init__()
-        self.__failures = {}
+        self.__failures = FailureStore()
         self.__headers = headers
 
         columns_to_check = {"absentee", "early_voting", "election_day", "mail", "provisional", "votes"}
@@ -251,49 +565,95 @@ class NonIntegerVotes(RowTest):
         else:
             self.__candidate_index = None
 
+    @property
+    def failure_count(self):
+        return len(self.__failures)
+
     @property
     def passed(self):
         return len(self.__failures) == 0
 
+    def get_examples(self, max_examples=-1):
+        return self.__failures.get_examples(max_examples)
+
+    def iter_failures(self):
+        return iter(self.__failures)
+
     def get_failure_message(self, max_examples=-1):
-        message = f"There are {len(self.__failures)} rows with votes that aren't integers:\n\n" \
-                  f"\tHeaders: {self.__headers}:"
+        return "".join(self.iter_failure_message(max_examples))
+
+    def iter_failure_message(self, max_examples=-1):
+        yield f"There are {self._format_count(len(self.__failures))} rows with votes that aren't integers:\n\n" \
+              f"\tHeaders: {self.__headers}:"
 
         count = 0
-        for key, value in self.__failures.items():
+        for key, value in self.__failures:
             if (max_examples >= 0) and (count >= max_examples):
-                message += f"\n\t[Truncated to {max_examples} examples]"
-                return message
+                yield f"\n\t[Truncated to {max_examples} examples]"
+                return
             else:
-                message += f"\n\tRow {key}: {value}"
+                yield f"\n\tRow {key}: {value}"
                 count += 1
 
-        return message
+    @property
+    def candidate_index(self) -> int:
+        return self.__candidate_index
+
+    @property
+    def vote_indices(self) -> list[int]:
+        return self.__indices_to_check
+
+    @staticmethod
+    def is_non_integer(value) -> bool:
+        # If the value isn't numeric, skip the test.  This can be due to the row having an inconsistent number of
+        # columns (hence the index of the "votes" column is invalid), or the value has been redacted and is
+        # represented by a non-numeric character.
+        try:
+            float_value = float(value)
+        except ValueError:
+            return False
+
+        # This allows for "3" and "3.0", but not "3.1".
+        return not float_value.is_integer()
+
+    @staticmethod
+    def is_percentage(candidate) -> bool:
+        # There are some rare cases where the value represents a turnout percentage.  We will try and avoid these rows.
+        percentages = {"%", "pct", "percent"}
+        return any(x in candidate.lower() for x in percentages)
+
+    def _add_failure(self, row_number: int, row: list[str]):
+        self.__failures.add(row_number, row)
 
     def _test_row(self, row: list[str]):
         if len(row) == len(self.__headers):
+            if self.__candidate_index is not None and NonIntegerVotes.is_percentage(row[self.__candidate_index]):
+                return
+
             for value in (row[i] for i in self.__indices_to_check):
-                # There are some rare cases where the value represents a turnout percentage.  We will try and avoid
-                # these rows.
-                percentages = {"%", "pct", "percent"}
-                if self.__candidate_index is not None \
-                        and any(x in row[self.__candidate_index].lower() for x in percentages):
-                    continue
-
-                # If the value isn't numeric, skip the test.  This can be due to the row having an inconsistent
-                # number of columns (hence the index of the "votes" column is invalid), or the value has been
-                # redacted and is represented by a non-numeric character.
-                try:
-                    float_value = float(value)
-                except ValueError:
-                    continue
-
-                # This allows for "3" and "3.0", but not "3.1".
-                if not float(float_value).is_integer():
-                    self.__failures[self.current_row] = row
+                if NonIntegerVotes.is_non_integer(value):
+                    self._add_failure(self.current_row, row)
+                    break
+
+
+class EncodingErrors(ValueTest):
+    # The files are decoded with errors replaced by U+FFFD, so that a file in the wrong encoding is reported row by row
+    # rather than aborting the run.
+    row_pattern = "\ufffd"
+    row_trigger = "\ufffd"
+
+    @property
+    def description(self):
+        return "bytes that aren't valid in the encoding of the file, shown as \ufffd"
+
+    def is_bad_value(self, value):
+        return "\ufffd" in value
 
 
 class LeadingAndTrailingSpaces(ValueTest):
+    row_pattern = r"(?<=\x00)\s|\s\x00"
+    row_trigger = r"\s"
+
     @property
     def description(self):
         return "leading or trailing whitespace characters"
@@ -304,6 +664,8 @@ class LeadingAndTrailingSpaces(ValueTest):
 
 class NonAlphanumericEntries(ValueTest):
     regex = re.compile(r"\w")
+    row_pattern = r"\x00[^\w\x00]+(?=\x00)"
+    row_trigger = r"\x00"
 
     @property
     def description(self):
@@ -314,6 +676,9 @@ class NonAlphanumericEntries(ValueTest):
 
 
 class PrematureLineBreaks(ValueTest):
+    row_pattern = r"\n"
+    row_trigger = r"\s"
+
     @property
     def description(self):
         return "newline characters"
@@ -323,9 +688,19 @@ class PrematureLineBreaks(ValueTest):
 
 
 class TabCharacters(ValueTest):
+    row_pattern = r"\t"
+    row_trigger = r"\s"
+
     @property
     def description(self):
         return "tab characters"
 
     def is_bad_value(self, value):
         return "\t" in value
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
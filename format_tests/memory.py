@@ -0,0 +1,77 @@
+import os
+import sys
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# The fraction of the memory limit past which the files are validated in low-memory mode.
+low_memory_threshold = 0.8
+
+_low_memory = False
+
+
+class Monitor:
+    # Follows the memory used while a file is validated.  If max_bytes is provided, check() switches the process to
+    # low-memory mode when it nears that limit, and the monitor records whether it did.  If track_peak is True, the peak
+    # memory allocated by Python, above what was allocated before, is measured with tracemalloc.  Tracing every
+    # allocation makes validation several times slower, so it is only done on request.
+    def __init__(self, max_bytes: int = None, track_peak: bool = False):
+        self.low_memory = False
+        self.__max_bytes = max_bytes
+        self.__start = None
+        if track_peak:
+            # tracemalloc is only imported when it is used, since the low-memory mode is checked by every process.
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            self.__start = tracemalloc.get_traced_memory()[0]
+        self.check()
+
+    @property
+    def peak(self) -> int:
+        if self.__start is None:
+            return None
+        import tracemalloc
+        return max(tracemalloc.get_traced_memory()[1] - self.__start, 0)
+
+    def check(self):
+        if self.__max_bytes is not None:
+            self.low_memory = check(self.__max_bytes) or self.low_memory
+
+
+def check(max_bytes: int) -> bool:
+    # Switches this process to low-memory mode once its resident set size nears max_bytes, and back once it has
+    # dropped.  In low-memory mode, the failing rows and the messages are written to temporary files as they are
+    # found, and only their counts are kept in memory.  Returns whether the process is in low-memory mode.
+    global _low_memory
+    _low_memory = max_bytes is not None and get_rss() >= max_bytes * low_memory_threshold
+    return _low_memory
+
+
+def get_process_limit(max_bytes: int, jobs: int) -> int:
+    # The memory limit of each process, when the files are validated by jobs worker processes and the results are
+    # collected by the main one.
+    if max_bytes is None or jobs == 1:
+        return max_bytes
+    return max_bytes // ((jobs if jobs > 0 else os.cpu_count() or 1) + 1)
+
+
+def get_rss() -> int:
+    # The resident set size of this process, in bytes.  Only its peak is available on systems without /proc.
+    try:
+        with open("/proc/self/statm", "rb") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, OSError, ValueError):
+        pass
+
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak << 10
+
+
+def is_low() -> bool:
+    return _low_memory
@@ -0,0 +1,61 @@
+import collections
+import concurrent.futures
+import os
+
+from format_tests import compressed
+
+reader_threads = 4
+
+
+class ReadAhead:
+    # Reads the contents of the files on a pool of threads, up to depth files and max_bytes ahead of the consumer, and
+    # yields them in the order of the files.  Files larger than max_bytes aren't read ahead, and are yielded with None,
+    # as are files that couldn't be read, so that the consumer opens them itself and reports any error.  Compressed
+    # files aren't read ahead either, since their decompressed size isn't known in advance.
+    def __init__(self, files: list[str], depth: int, max_bytes: int):
+        self.__depth = depth
+        self.__files = files
+        self.__max_bytes = max_bytes
+
+    def __iter__(self):
+        pending = collections.deque()
+        pending_bytes = 0
+        files = iter(self.__files)
+        next_file = next(files, None)
+
+        with concurrent.futures.ThreadPoolExecutor(max(1, min(self.__depth, reader_threads))) as executor:
+            try:
+                while pending or next_file is not None:
+                    # The file that was yielded last still counts towards the memory used until the next one is
+                    # requested, since the consumer may still be using it.  The first pending file always fits.
+                    while next_file is not None and len(pending) < self.__depth:
+                        size = _get_size(next_file)
+                        if size > self.__max_bytes or compressed.is_compressed(next_file):
+                            pending.append((next_file, None, 0))
+                        elif pending_bytes + size <= self.__max_bytes:
+                            pending.append((next_file, executor.submit(_read, next_file), size))
+                            pending_bytes += size
+                        else:
+                            break
+                        next_file = next(files, None)
+
+                    file, future, size = pending.popleft()
+                    data = None if future is None or future.exception() is not None else future.result()
+                    yield file, data
+                    pending_bytes -= size
+            finally:
+                for _, future, _ in pending:
+                    if future is not None:
+                        future.cancel()
+
+
+def _get_size(file: str) -> int:
+    try:
+        return os.path.getsize(file)
+    except OSError:
+        return 0
+
+
+def _read(file: str) -> bytes:
+    with open(file, "rb") as data:
+        return data.read()
@@ -0,0 +1,147 @@
+import functools
+import itertools
+import mmap
+import os
+import re
+import sys
+import time
+
+from format_tests import compressed, format_tests
+
+buffer_size = 1 << 20
+
+# The row tests that a clean file is guaranteed to pass.  Files are only skipped if every row test is one of these.
+_covered_tests = {
+    format_tests.ConsecutiveSpaces,
+    format_tests.EmptyRows,
+    format_tests.EncodingErrors,
+    format_tests.InconsistentNumberOfColumns,
+    format_tests.LeadingAndTrailingSpaces,
+    format_tests.NonIntegerVotes,
+    format_tests.PrematureLineBreaks,
+    format_tests.TabCharacters,
+}
+
+# Any of these bytes means that the file isn't clean.  Control characters include the tab and the other ASCII
+# whitespace characters, and quotes could hide delimiters and line breaks inside entries.
+_defect_bytes = bytes([*range(0x00, 0x0a), 0x0b, 0x0c, *range(0x0e, 0x20), ord('"')])
+_other_bytes = bytes(x for x in range(256) if x not in _defect_bytes)
+
+# Maps the delimiter and carriage returns to line breaks, so that the spaces at either end of an entry can be found in
+# a single pass.
+_boundary_table = bytes.maketrans(b",\r", b"\n\n")
+
+# Maps the bytes that a number is made of to a few classes, so that anything that float() might parse as something
+# other than a whole number can be found in a few passes.  The signs are mapped to line breaks, since they may only
+# precede "inf" or "nan" at the start of an entry.  Whole numbers with 300 or more digits could overflow to infinity.
+_number_table = bytes.maketrans(b"0123456789.eE_,+-iInNfFaA", b"0000000000DDDD\n\n\niinnffaa")
+_number_signatures = [b"0D", b"D0", b"\ninf", b"\nnan"]
+
+
+def is_clean(csv_file: str, headers: list[str], tests: list[format_tests.RowTest], profile=None,
+             data: bytes = None) -> bool:
+    # Scans the raw bytes of the file for anything that could fail one of the row tests, without parsing it.  If it
+    # returns True, every row test would pass, so the rows don't need to be parsed.  If it returns False, the file may
+    # still be fine: the scan only accepts the simplest form of each row, and leaves everything else to the tests.  The
+    # contents of the file can be provided if they have already been read, otherwise the file is memory-mapped.
+    # Compressed files would have to be decompressed twice, so they are always parsed instead.
+    if not headers or any(type(x) not in _covered_tests for x in tests):
+        return False
+    if data is None and compressed.is_compressed(csv_file):
+        return False
+
+    start_time = time.perf_counter()
+    vote_indices = tuple(next((x.vote_indices for x in tests if type(x) is format_tests.NonIntegerVotes), []))
+
+    if data is not None:
+        clean, row_count = _scan(data, len(headers), vote_indices)
+    else:
+        with open(csv_file, "rb") as csv_data:
+            if os.fstat(csv_data.fileno()).st_size == 0:
+                return False
+            with mmap.mmap(csv_data.fileno(), 0, access=mmap.ACCESS_READ) as mapped_data:
+                clean, row_count = _scan(mapped_data, len(headers), vote_indices)
+
+    if profile is not None:
+        profile.add("prefilter", time.perf_counter() - start_time)
+        if clean:
+            profile.rows += row_count
+
+    return clean
+
+
+def _scan(data, column_count: int, vote_indices: tuple[int]) -> tuple[bool, int]:
+    # The file is scanned a buffer at a time, split after a line break, so that every buffer holds whole rows.
+    clean = len(data) > 0
+    row_count = 0
+    position = 0
+    while clean and position < len(data):
+        end = data.rfind(b"\n", position, position + buffer_size) + 1 or data.find(b"\n", position) + 1 or len(data)
+        buffer = data[position:end]
+        clean = _is_clean_buffer(buffer, column_count, vote_indices)
+        row_count += buffer.count(b"\n") + (not buffer.endswith(b"\n"))
+        position = end
+
+    return clean, row_count
+
+
+def _is_clean_buffer(buffer: bytes, column_count: int, vote_indices: tuple[int]) -> bool:
+    if buffer.translate(None, _other_bytes):
+        return False
+    if b"\r" in buffer and buffer.count(b"\r") != buffer.count(b"\r\n"):
+        return False
+
+    # Rows can't span lines in a clean file, so every line must have as many entries as the header, and at least one
+    # that isn't empty.  With no spaces at either end of an entry, an empty entry has no characters at all.
+    lines = buffer.split(b"\n")
+    if not lines[-1]:
+        lines.pop()
+    empty_row = b"," * (column_count - 1)
+    if set(map(bytes.count, lines, itertools.repeat(b","))) != {column_count - 1} or empty_row in lines \
+            or empty_row + b"\r" in lines:
+        return False
+
+    boundaries = buffer.translate(_boundary_table)
+    if b"  " in boundaries or b" \n" in boundaries or b"\n " in boundaries or boundaries.startswith(b" ") \
+            or boundaries.endswith(b" "):
+        return False
+
+    is_ascii = buffer.isascii()
+    if not is_ascii:
+        # Files without a byte order mark are decoded as UTF-8, and files in other encodings have null bytes or a byte
+        # order mark that the buffer would have failed on.  A buffer that can't be decoded, or that already holds the
+        # replacement character, is left to the tests to report.
+        try:
+            text = buffer.decode()
+        except UnicodeDecodeError:
+            return False
+        if "\ufffd" in text or _get_whitespace_regex().search(text):
+            return False
+
+    if not vote_indices:
+        return True
+
+    # If nothing in the buffer looks like part of a number other than a whole number, the votes must all pass.  The
+    # header is checked in the same way, and passes since its entries aren't numbers.
+    numbers = buffer.translate(_number_table)
+    if is_ascii and not numbers.startswith((b"inf", b"nan")) and not any(x in numbers for x in _number_signatures) \
+            and (max(map(len, lines)) < 300 or b"0" * 300 not in numbers):
+        return True
+
+    # Otherwise, the votes themselves are checked.  Only the percentages that NonIntegerVotes allows are left to it.
+    votes = _get_vote_regex(column_count, vote_indices).findall(buffer)
+    if len(vote_indices) > 1:
+        votes = itertools.chain.from_iterable(votes)
+    return not any(format_tests.NonIntegerVotes.is_non_integer(x.decode()) for x in votes
+                   if not (x.isdigit() and len(x) < 300))
+
+
+@functools.lru_cache(maxsize=None)
+def _get_whitespace_regex() -> re.Pattern:
+    return re.compile("[" + "".join(chr(x) for x in range(0x80, sys.maxunicode + 1) if chr(x).isspace()) + "]")
+
+
+@functools.lru_cache(maxsize=None)
+def _get_vote_regex(column_count: int, vote_indices: tuple[int]) -> re.Pattern:
+    entries = b",".join(rb"([^,\n]*)" if x in vote_indices else rb"[^,\n]*" for x in range(column_count))
+    return re.compile(rb"^" + entries + rb"$", re.MULTILINE)
@@ -0,0 +1,80 @@
+import json
+import time
+
+
+class FileProfile:
+    def __init__(self, short_path: str, size: int):
+        self.short_path = short_path
+        self.size = size
+        self.rows = 0
+        self.timings = {}
+
+    @property
+    def total(self) -> float:
+        return self.timings.get("total", 0.0)
+
+    def add(self, name: str, seconds: float):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def to_dict(self) -> dict:
+        return {"path": self.short_path, "bytes": self.size, "rows": self.rows, "timings": self.timings}
+
+
+class Profiler:
+    def __init__(self):
+        self.__cached_files = 0
+        self.__end_time = None
+        self.__files = []
+        self.__start_time = time.perf_counter()
+
+    def add(self, profile: FileProfile):
+        # Results replayed from the cache don't have a profile.
+        if profile is None:
+            self.__cached_files += 1
+        else:
+            self.__files.append(profile)
+
+    def get_report(self) -> dict:
+        if self.__end_time is None:
+            self.__end_time = time.perf_counter()
+
+        tests = {}
+        for profile in self.__files:
+            for name, seconds in profile.timings.items():
+                if name != "total":
+                    tests[name] = tests.get(name, 0.0) + seconds
+
+        elapsed_time = self.__end_time - self.__start_time
+        rows = sum(x.rows for x in self.__files)
+        size = sum(x.size for x in self.__files)
+        return {
+            "seconds": elapsed_time,
+            "files": len(self.__files),
+            "cached_files": self.__cached_files,
+            "rows": rows,
+            "bytes": size,
+            "rows_per_second": rows / elapsed_time if elapsed_time > 0 else 0.0,
+            "timings": dict(sorted(tests.items(), key=lambda x: x[1], reverse=True)),
+            "file_profiles": [x.to_dict() for x in sorted(self.__files, key=lambda x: x.total, reverse=True)],
+        }
+
+    def print_summary(self, stream, count: int = 10):
+        report = self.get_report()
+
+        stream.write("\nProfile\n")
+        stream.write(f"\t{report['files']} files ({report['cached_files']} cached), {report['rows']} rows and "
+                     f"{report['bytes'] / 1e6:.1f} MB in {report['seconds']:.3f}s "
+                     f"({report['rows_per_second']:.0f} rows/sec)\n")
+
+        # The timings of the files are summed, so they can exceed the elapsed time when there are several jobs.
+        stream.write(f"\nSlowest steps and tests:\n")
+        for name, seconds in list(report["timings"].items())[:count]:
+            stream.write(f"\t{seconds:>10.3f}s  {name}\n")
+
+        stream.write(f"\nSlowest files:\n")
+        for profile in report["file_profiles"][:count]:
+            stream.write(f"\t{profile['timings']['total']:>10.3f}s  {profile['path']} ({profile['rows']} rows)\n")
+
+    def write(self, path: str):
+        with open(path, "w") as profile_file:
+            json.dump(self.get_report(), profile_file, indent=2)
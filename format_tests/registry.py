@@ -0,0 +1,78 @@
+from format_tests import format_tests
+
+# Header tests only look at the first row of a file.  Row tests look at each row as a whole, and value tests at each
+# entry on its own.  Both of those need every row of the file to be read.
+scopes = ["header", "row", "value"]
+
+
+class RegisteredTest:
+    def __init__(self, test_class: type, scope: str, default: bool = True, takes_headers: bool = False):
+        self.default = default
+        self.scope = scope
+        self.takes_headers = takes_headers
+        self.test_class = test_class
+
+    @property
+    def name(self) -> str:
+        return self.test_class.__name__
+
+    def create(self, headers: list[str]) -> format_tests.FormatTest:
+        return self.test_class(headers) if self.takes_headers else self.test_class()
+
+
+# The tests are always created in this order, so that the row tests of the chunks of a file can be matched up.  Tests
+# that aren't run by default are only run if they are selected by name.
+_registered_tests = [
+    RegisteredTest(format_tests.EmptyHeaders, "header"),
+    RegisteredTest(format_tests.LowercaseHeaders, "header"),
+    RegisteredTest(format_tests.UnknownHeaders, "header"),
+    RegisteredTest(format_tests.WhitespaceInHeaders, "header"),
+    RegisteredTest(format_tests.ConsecutiveSpaces, "value"),
+    RegisteredTest(format_tests.EncodingErrors, "value"),
+    RegisteredTest(format_tests.LeadingAndTrailingSpaces, "value"),
+    RegisteredTest(format_tests.NonAlphanumericEntries, "value", default=False),
+    RegisteredTest(format_tests.PrematureLineBreaks, "value"),
+    RegisteredTest(format_tests.TabCharacters, "value"),
+    RegisteredTest(format_tests.EmptyRows, "row"),
+    RegisteredTest(format_tests.InconsistentNumberOfColumns, "row", takes_headers=True),
+    RegisteredTest(format_tests.NonIntegerVotes, "row", takes_headers=True),
+    RegisteredTest(format_tests.DuplicateRows, "row", default=False, takes_headers=True),
+]
+
+
+def create_tests(names: list[str], test_scopes: list[str], headers: list[str] = None) -> list[format_tests.FormatTest]:
+    # Creates the named tests that belong to one of the given scopes.
+    return [x.create(headers) for x in _registered_tests if x.name in names and x.scope in test_scopes]
+
+
+def get_default_names() -> list[str]:
+    return [x.name for x in _registered_tests if x.default]
+
+
+def get_names() -> list[str]:
+    return [x.name for x in _registered_tests]
+
+
+def get_scope(name: str) -> str:
+    return next(x.scope for x in _registered_tests if x.name == name)
+
+
+def select(only: list[str] = None, skip: list[str] = ()) -> list[str]:
+    # Returns the names of the tests that are selected by only, or of the default tests if it isn't provided, minus
+    # those selected by skip.  A selector is either the name of a test or a scope, which selects the default tests in
+    # that scope.  Raises ValueError for an unknown selector.
+    def get_selected(selectors):
+        selected = set()
+        for selector in selectors:
+            if selector in scopes:
+                selected.update(x.name for x in _registered_tests if x.scope == selector and x.default)
+            elif selector in names:
+                selected.add(selector)
+            else:
+                raise ValueError(f"unknown test or scope: '{selector}'")
+        return selected
+
+    names = get_names()
+    selected = set(get_default_names()) if only is None else get_selected(only)
+    selected.difference_update(get_selected(skip))
+    return [x for x in names if x in selected]
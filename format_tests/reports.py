@@ -0,0 +1,109 @@
+import json
+import re
+import sys
+from abc import ABC, abstractmethod
+from xml.sax import saxutils
+
+from format_tests import validation
+
+formats = ["jsonl", "junit"]
+
+# Characters that can't appear in an XML 1.0 document, even escaped.
+_invalid_xml_regex = re.compile("[^\t\n\r\x20-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]")
+
+
+class Report(ABC):
+    # Writes a record for each file as soon as its result is available, so that the report can be followed while the
+    # tests are running.  The report is written to the standard output if no path is given.
+    def __init__(self, path: str = None):
+        self._file = sys.stdout if path is None else open(path, "w", encoding="utf-8")
+        self.__path = path
+
+    def close(self):
+        if self.__path is None:
+            self._file.flush()
+        else:
+            self._file.close()
+
+    def write(self, result: validation.FileResult):
+        self._write_result(result)
+        self._file.flush()
+
+    @abstractmethod
+    def _write_result(self, result: validation.FileResult):
+        pass
+
+
+class JsonLinesReport(Report):
+    # One JSON object per line and file, with the outcome of each test.
+    def _write_result(self, result: validation.FileResult):
+        record = {
+            "path": result.short_path,
+            "repository": result.repository,
+            "year": result.year,
+            "passed": result.passed,
+            "error": None if result.error is None else f"{type(result.error).__name__}: {result.error}",
+            "tests": result.tests,
+            "peak_memory": result.peak_memory,
+            "low_memory": result.low_memory,
+        }
+        self._file.write(json.dumps(record) + "\n")
+
+
+class JUnitReport(Report):
+    # A JUnit XML document with a test suite per file, and a test case per test, whose class is the group of the file.
+    # The closing tag is only written when the report is closed, so the document is incomplete until then.
+    def __init__(self, path: str = None):
+        super().__init__(path)
+        self._file.write('<?xml version="1.0" encoding="UTF-8"?>\n<testsuites name="format_tests">\n')
+
+    def close(self):
+        self._file.write("</testsuites>\n")
+        super().close()
+
+    def _write_result(self, result: validation.FileResult):
+        failures = sum(not x["passed"] for x in result.tests)
+        errors = 0 if result.error is None else 1
+        self._file.write(f'  <testsuite name={_quote(result.short_path)} tests="{max(len(result.tests), errors)}" '
+                         f'failures="{failures}" errors="{errors}">\n')
+
+        if result.peak_memory is not None or result.low_memory:
+            self._file.write("    <properties>\n")
+            if result.peak_memory is not None:
+                self._file.write(f'      <property name="peak_memory" value="{result.peak_memory}"/>\n')
+            if result.low_memory:
+                self._file.write('      <property name="low_memory" value="true"/>\n')
+            self._file.write("    </properties>\n")
+
+        if result.error is not None:
+            message = f"{type(result.error).__name__}: {result.error}"
+            self._file.write(f'    <testcase classname={_quote(result.group)} name={_quote(result.short_path)}>'
+                             f'<error message={_quote(message)}/></testcase>\n')
+
+        for test in result.tests:
+            name = _quote(test["name"])
+            if test["passed"]:
+                self._file.write(f"    <testcase classname={_quote(result.group)} name={name}/>\n")
+            else:
+                summary = "failed" if test["failures"] is None else f"{test['failures']} failing rows"
+                self._file.write(f"    <testcase classname={_quote(result.group)} name={name}>"
+                                 f"<failure message={_quote(summary)}>{_escape(test['message'])}</failure>"
+                                 f"</testcase>\n")
+
+        self._file.write("  </testsuite>\n")
+
+
+def get_report(report_format: str, path: str = None) -> Report:
+    if report_format == "jsonl":
+        return JsonLinesReport(path)
+    elif report_format == "junit":
+        return JUnitReport(path)
+    raise ValueError(f"Unknown report format: {report_format}")
+
+
+def _escape(text: str) -> str:
+    return saxutils.escape(_invalid_xml_regex.sub("\ufffd", text))
+
+
+def _quote(text: str) -> str:
+    return saxutils.quoteattr(_invalid_xml_regex.sub("\ufffd", text), {"\n": "&#10;", "\r": "&#13;", "\t": "&#9;"})
@@ -0,0 +1,141 @@
+import itertools
+import sys
+
+from format_tests import format_tests
+
+# The plans are cached for the lifetime of the process.  Worker processes started with fork inherit the plans that
+# the parent has already compiled, and compile the rest themselves.
+_plans = {}
+
+
+class RowPlan:
+    def __init__(self, headers: tuple[str], test_classes: tuple[type]):
+        self.__headers = headers
+        self.__run = None
+        self.__test_classes = test_classes
+
+    def __getstate__(self):
+        # The compiled function can't be pickled, so it is compiled again when it is first run after unpickling.
+        return self.__headers, self.__test_classes
+
+    def __setstate__(self, state):
+        self.__headers, self.__test_classes = state
+        self.__run = None
+
+    def run(self, rows, tests: list[format_tests.RowTest], should_stop=None, batch_size: int = 1 << 16,
+            max_failures: int = None):
+        # The rows include the header, since the row tests are run on it too.  If should_stop is provided, it is
+        # called after each batch of rows, and the remaining rows are left unread once it returns True.  If
+        # max_failures is provided, the remaining rows are also left unread right after the row that brings the number
+        # of failing rows of the tests to max_failures.
+        if self.__run is None:
+            self.__run = _compile(list(self.__headers), self.__test_classes)
+        self.__run(rows, tests, should_stop, batch_size, max_failures)
+
+
+def get_row_plan(headers: list[str], tests: list[format_tests.RowTest]) -> RowPlan:
+    test_classes = tuple(sorted({type(x) for x in tests}, key=lambda x: x.__name__))
+    key = (tuple(headers), test_classes)
+    if key not in _plans:
+        _plans[key] = RowPlan(*key)
+    return _plans[key]
+
+
+def _is_specialized(test_class: type) -> bool:
+    if issubclass(test_class, format_tests.ValueTest):
+        return test_class.row_pattern is not None
+    return test_class in {format_tests.EmptyRows, format_tests.InconsistentNumberOfColumns,
+                          format_tests.NonIntegerVotes}
+
+
+def _compile(headers: list[str], test_classes: tuple[type]):
+    # Everything that only depends on the header and the classes of the tests is worked out once, here, so that the
+    # loop over the rows only does the checks themselves.
+    header_count = len(headers)
+    value_test_classes = [x for x in test_classes if issubclass(x, format_tests.ValueTest) and _is_specialized(x)]
+    value_regex = format_tests.compile_row_regex(value_test_classes) if value_test_classes else None
+    separator = format_tests.row_separator
+
+    if format_tests.NonIntegerVotes in test_classes:
+        non_integer_votes = format_tests.NonIntegerVotes(headers)
+        vote_indices = tuple(non_integer_votes.vote_indices)
+        candidate_index = non_integer_votes.candidate_index
+    else:
+        vote_indices = ()
+        candidate_index = None
+
+    is_empty_row = format_tests.EmptyRows.is_empty_row
+    is_non_integer = format_tests.NonIntegerVotes.is_non_integer
+    is_percentage = format_tests.NonIntegerVotes.is_percentage
+
+    def run(rows, tests: list[format_tests.RowTest], should_stop, batch_size: int, max_failures: int):
+        value_tests = [x for x in tests if type(x) in value_test_classes]
+        empty_rows = next((x for x in tests if type(x) is format_tests.EmptyRows), None)
+        inconsistent_columns = next((x for x in tests if type(x) is format_tests.InconsistentNumberOfColumns), None)
+        non_integer_votes = next((x for x in tests if type(x) is format_tests.NonIntegerVotes), None)
+        other_tests = [x for x in tests if not _is_specialized(type(x))]
+        checks_votes = non_integer_votes is not None and len(vote_indices) > 0
+
+        # The failures of the specialized tests are counted as they are added.  Those of the other tests are only
+        # counted if there is a limit.
+        failure_limit = sys.maxsize if max_failures is None else max_failures
+        failure_count = sum(x.failure_count for x in tests)
+        counted_tests = other_tests if max_failures is not None else []
+        other_failure_count = sum(x.failure_count for x in counted_tests)
+
+        row_number = 0
+        rows = iter(rows)
+        while True:
+            batch_start = row_number
+            for row in rows if should_stop is None else itertools.islice(rows, batch_size):
+                row_number += 1
+
+                if len(row) != header_count:
+                    if inconsistent_columns is not None:
+                        inconsistent_columns._add_failure(row_number, row)
+                        failure_count += 1
+                elif checks_votes:
+                    for index in vote_indices:
+                        value = row[index]
+                        # Whole numbers are by far the most common values, and always pass.  Values that are too long
+                        # could overflow to infinity, which isn't an integer.
+                        if not (value.isdigit() and len(value) < 300) and is_non_integer(value):
+                            if candidate_index is None or not is_percentage(row[candidate_index]):
+                                non_integer_votes._add_failure(row_number, row)
+                                failure_count += 1
+                            break
+
+                if value_tests:
+                    # Most rows are clean, so the whole row is screened with a single search.  An entry that
+                    # contains the separator itself would blur the entry boundaries, so such rows are always checked
+                    # entry by entry.
+                    joined_row = f"{separator}{separator.join(row)}{separator}"
+                    if joined_row.count(separator) != len(row) + 1 or value_regex.search(joined_row):
+                        for test in value_tests:
+                            for entry in row:
+                                if test.is_bad_value(entry):
+                                    test._add_failure(row_number, row)
+                                    failure_count += 1
+                                    break
+
+                # A row that starts with a non-whitespace character can't be empty.
+                if empty_rows is not None and not (row and row[0] and not row[0][0].isspace()) \
+                        and is_empty_row(row):
+                    empty_rows._add_failure(row_number, row)
+                    failure_count += 1
+
+                for test in other_tests:
+                    test.test(row)
+                if counted_tests:
+                    counted_failures = sum(x.failure_count for x in counted_tests)
+                    failure_count += counted_failures - other_failure_count
+                    other_failure_count = counted_failures
+
+                if failure_count >= failure_limit:
+                    break
+
+            if should_stop is None or row_number - batch_start < batch_size or failure_count >= failure_limit \
+                    or should_stop():
+                break
+
+    return run
@@ -0,0 +1,103 @@
+import heapq
+import json
+
+from format_tests import validation
+
+version = 5
+
+
+class ShardError(Exception):
+    pass
+
+
+class ResultWriter:
+    # Writes the results of a run, or of one shard of it, as JSON lines that --merge can read back.  The first line
+    # records which shard the results are for, and the number of examples that their messages were limited to.  Each
+    # result is followed by the parts of its full message, as JSON strings, so that it is never held whole.
+    def __init__(self, path: str, shard: tuple[int, int] = None, max_examples: int = -1):
+        self.__file = open(path, "w")
+        self.__file.write(json.dumps({"version": version, "shard": shard, "max_examples": max_examples}) + "\n")
+
+    def close(self):
+        self.__file.close()
+
+    def write(self, result: validation.FileResult):
+        self.__file.write(json.dumps(result.to_dict()) + "\n")
+        for part in result.iter_full_message():
+            if part:
+                self.__file.write(json.dumps(part) + "\n")
+        self.__file.flush()
+
+
+def get_shard(csv_files: list[str], index: int, count: int) -> list[str]:
+    # Splits the files into count shards with about the same number of bytes each, and returns those of the shard with
+    # the given index, starting from 1.  Each file is assigned in turn, from the largest to the smallest, to the shard
+    # with the fewest bytes so far.  Ties are broken by the path and the index of the shard, so every machine splits
+    # the same files in the same way.
+    sizes = {x: validation.get_size(x) for x in csv_files}
+    shards = [(0, x) for x in range(count)]
+    selected_files = set()
+    for csv_file in sorted(csv_files, key=lambda x: (-sizes[x], x)):
+        size, shard_index = heapq.heappop(shards)
+        if shard_index == index - 1:
+            selected_files.add(csv_file)
+        heapq.heappush(shards, (size + sizes[csv_file], shard_index))
+
+    return [x for x in csv_files if x in selected_files]
+
+
+def read_results(paths: list[str], max_examples: int = -1) -> list[validation.FileResult]:
+    # Reads the results written by each shard, and returns them in the order of their paths, as a single run would.
+    # The messages were limited to the examples of the shards, so they must have been written with max_examples.
+    shards = set()
+    shard_count = None
+    results = {}
+    for path in paths:
+        with open(path, "r") as results_file:
+            try:
+                header = json.loads(results_file.readline())
+            except ValueError:
+                header = None
+            if not isinstance(header, dict) or header.get("version") != version:
+                raise ShardError(f"{path} isn't a results file written by this version of the tests.")
+            if header["max_examples"] != max_examples:
+                raise ShardError(f"{path} was written with --max-examples={header['max_examples']}, not "
+                                 f"{max_examples}.")
+
+            shard = header["shard"]
+            if shard is not None:
+                if (shard_count or shard[1]) != shard[1] or tuple(shard) in shards:
+                    raise ShardError(f"{path} is for shard {shard[0]}/{shard[1]}, which doesn't fit with the others.")
+                shard_count = shard[1]
+                shards.add(tuple(shard))
+
+            for result in _iter_results(results_file):
+                if result.short_path in results:
+                    raise ShardError(f"{result.short_path} has results in more than one file.")
+                results[result.short_path] = result
+
+    if shard_count is not None and len(shards) != shard_count:
+        missing_shards = sorted(set(range(1, shard_count + 1)) - {x[0] for x in shards})
+        raise ShardError(f"The results of shards {', '.join(f'{x}/{shard_count}' for x in missing_shards)} are "
+                         f"missing.")
+
+    return [results[x] for x in sorted(results)]
+
+
+def _iter_results(results_file):
+    # The parts of the full message of each result are collected as they are read, and written to a temporary file
+    # once they grow too long.
+    values = None
+    full_message = None
+    for line in results_file:
+        item = json.loads(line)
+        if isinstance(item, str):
+            full_message.write(item)
+            continue
+        if values is not None:
+            yield validation.FileResult.from_dict(values, *full_message.get())
+        values = item
+        full_message = validation.MessageBuffer()
+
+    if values is not None:
+        yield validation.FileResult.from_dict(values, *full_message.get())
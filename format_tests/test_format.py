@@ -1,11 +1,7 @@
-import csv
-import glob
-import logging
 import os
-import pathlib
 import unittest
 
-from format_tests import format_tests
+from format_tests import cache, failure_log, memory, reports, sharding, validation
 
 
 class TestResult(unittest.TextTestResult):
@@ -13,8 +9,9 @@ class TestResult(unittest.TextTestResult):
     def printErrorList(self, flavour, errors):
         group_map = {}
         ungrouped_errors = []
+        # An error raised outside of a subtest, such as one reading the results of the shards, isn't grouped.
         for test, error in errors:
-            if "group" in test.params:
+            if "group" in getattr(test, "params", {}):
                 group = test.params["group"]
                 if group in group_map:
                     group_map[group].append((test, error))
@@ -32,97 +29,127 @@ class TestResult(unittest.TextTestResult):
 
 
 class TestCase(unittest.TestCase):
+    cache_dir = None
+    changed_since = None
+    engine = "python"
+    ignore_patterns = []
+    jobs = 1
     log_file = None
+    manifest_file = None
     max_examples = -1
-    root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-        if TestCase.log_file is None:
-            self.__logger = None
-        else:
-            self.__logger = TestCase.__get_logger(type(self).__name__, TestCase.log_file)
-
-    def _assertTrue(self, result: bool, description: str, short_message: str, full_message: str):
+    max_failures = None
+    max_memory = None
+    merge_files = None
+    prefetch_depth = 0
+    prefetch_memory = 256 << 20
+    prefilter = True
+    profiler = None
+    report_file = None
+    report_format = None
+    results_file = None
+    root_paths = [os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))]
+    shard = None
+    split_size = None
+    stop_early = False
+    tests = None
+    track_memory = False
+
+    def setUp(self):
+        self.__failure_log = None if TestCase.log_file is None else failure_log.FailureLog(TestCase.log_file)
+
+    def tearDown(self):
+        if self.__failure_log is not None:
+            self.__failure_log.close()
+
+    def _assertTrue(self, result: bool, description: str, short_message: str, full_message):
+        # The full message can be given as a string, or as an iterable of its parts.
         if not result:
             self._log_failure(description, full_message)
         self.assertTrue(result, short_message)
 
-    def _log_failure(self, description: str, message: str):
-        if self.__logger is not None:
-            self.__logger.debug("======================================================================")
-            self.__logger.debug(f"FAIL: {description}")
-            self.__logger.debug("----------------------------------------------------------------------")
-            self.__logger.debug(f"{message}\n")
+    def _log_failure(self, description: str, message):
+        if self.__failure_log is not None:
+            self.__failure_log.write_failure(description, message)
 
-    @staticmethod
-    def __get_logger(name: str, log_file: str) -> logging.Logger:
-        handler = logging.FileHandler(log_file)
-        handler.setFormatter(logging.Formatter("%(message)s"))
 
-        logger = logging.getLogger(name)
-        logger.setLevel(logging.DEBUG)
-        logger.addHandler(handler)
+class FileFormatTests(TestCase):
+    def test_format(self):
+        options = validation.ValidationOptions(max_examples=TestCase.max_examples,
+                                               full_messages=TestCase.log_file is not None, engine=TestCase.engine,
+                                               profile=TestCase.profiler is not None,
+                                               stop_early=TestCase.stop_early, max_failures=TestCase.max_failures,
+                                               prefilter=TestCase.prefilter, tests=TestCase.tests,
+                                               max_memory=memory.get_process_limit(TestCase.max_memory, TestCase.jobs),
+                                               track_memory=TestCase.track_memory)
+
+        # Each repository has its own cache.
+        if TestCase.cache_dir is None or TestCase.merge_files is not None:
+            result_caches = None
+        else:
+            fingerprint = cache.get_fingerprint(*options.get_settings())
+            result_caches = [cache.ResultCache(TestCase.cache_dir, x, fingerprint) for x in TestCase.root_paths]
 
-        return logger
+        if TestCase.results_file is None:
+            result_writer = None
+        else:
+            result_writer = sharding.ResultWriter(TestCase.results_file, TestCase.shard, options.max_examples)
 
+        report = None if TestCase.report_format is None else reports.get_report(TestCase.report_format,
+                                                                                TestCase.report_file)
 
-class FileFormatTests(TestCase):
-    def test_format(self):
-        for csv_file in FileFormatTests.__get_csv_files():
-            short_path = os.path.relpath(csv_file, start=TestCase.root_path)
-            year = pathlib.Path(short_path).parts[0]
-
-            tests = set()
-
-            header_tests = {
-                format_tests.EmptyHeaders(),
-                format_tests.LowercaseHeaders(),
-                format_tests.UnknownHeaders(),
-                format_tests.WhitespaceInHeaders(),
-            }
-            tests.update(header_tests)
-
-            tests.add(format_tests.ConsecutiveSpaces())
-            tests.add(format_tests.EmptyRows())
-            tests.add(format_tests.LeadingAndTrailingSpaces())
-            tests.add(format_tests.PrematureLineBreaks())
-            tests.add(format_tests.TabCharacters())
-
-            with self.subTest(msg=f"{short_path}", group=year):
-                with open(csv_file, "r") as csv_data:
-                    reader = csv.reader(csv_data)
-                    headers = next(reader)
-
-                    tests.add(format_tests.InconsistentNumberOfColumns(headers))
-                    tests.add(format_tests.NonIntegerVotes(headers))
-
-                    for test in tests:
-                        test.test(headers)
-
-                    row_tests = tests - header_tests
-                    for row in reader:
-                        for test in row_tests:
-                            test.test(row)
-
-                passed = True
-                short_message = ""
-                full_message = ""
-                is_first_message = True
-                for test in sorted(tests, key=lambda x: type(x).__name__):
-                    if not test.passed:
-                        passed = False
-                        short_message += f"\n\n* {test.get_failure_message(max_examples=TestCase.max_examples)}"
-                        if not is_first_message:
-                            full_message += "\n\n"
-                        full_message += f"* {test.get_failure_message()}"
-                        is_first_message = False
-
-                self._assertTrue(passed, f"{self} [{short_path}]", short_message, full_message)
-
-    @staticmethod
-    def __get_csv_files():
-        for file in glob.glob(os.path.join(TestCase.root_path, "[0-9]" * 4, "**", "*"), recursive=True):
-            if file.lower().endswith(".csv"):
-                yield file
+        try:
+            if TestCase.merge_files is not None:
+                results = sharding.read_results(TestCase.merge_files, options.max_examples)
+            else:
+                repositories = []
+                for root_path in TestCase.root_paths:
+                    # A manifest only records the directories of one repository, so each has its own.
+                    manifest_file = TestCase.manifest_file
+                    if manifest_file is not None and len(TestCase.root_paths) > 1:
+                        base, extension = os.path.splitext(manifest_file)
+                        manifest_file = f"{base}.{validation.get_repository_name(root_path)}{extension}"
+
+                    if TestCase.changed_since is None:
+                        csv_files = validation.get_csv_files(root_path, TestCase.ignore_patterns, manifest_file)
+                    else:
+                        csv_files = validation.get_changed_csv_files(root_path, TestCase.changed_since[root_path],
+                                                                     TestCase.ignore_patterns)
+                    repositories.append((root_path, csv_files))
+
+                # The files of every repository are split into shards together, so all of them must be found first.
+                if TestCase.shard is not None:
+                    repositories = [(x, list(y)) for x, y in repositories]
+                    shard_files = set(sharding.get_shard([y for _, x in repositories for y in x], *TestCase.shard))
+                    repositories = [(x, [z for z in y if z in shard_files]) for x, y in repositories]
+                results = validation.validate_repositories(repositories, options, TestCase.jobs, result_caches,
+                                                           TestCase.prefetch_depth, TestCase.prefetch_memory,
+                                                           TestCase.split_size)
+
+            for result in results:
+                if TestCase.profiler is not None:
+                    TestCase.profiler.add(result.profile)
+                if result_writer is not None:
+                    result_writer.write(result)
+                if report is not None:
+                    report.write(result)
+
+                with self.subTest(msg=f"{result.short_path}", group=result.group):
+                    # The error is raised again with the traceback of the process that validated the file, so that
+                    # it reads the same whatever the number of jobs.
+                    if result.error is not None and result.traceback is not None:
+                        raise validation.RecordedError(result.traceback.rstrip("\n"))
+                    if result.error is not None:
+                        raise result.error
+
+                    self._assertTrue(result.passed, f"{self} [{result.short_path}]", result.short_message,
+                                     result.iter_full_message())
+                result.discard_full_message()
+        finally:
+            if result_caches is not None:
+                for result_cache in result_caches:
+                    result_cache.evict()
+                    result_cache.close()
+            if result_writer is not None:
+                result_writer.close()
+            if report is not None:
+                report.close()
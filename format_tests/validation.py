@@ -0,0 +1,762 @@
+import collections
+import csv
+import functools
+import io
+import itertools
+import os
+import re
+import time
+
+# The modules that are only needed to split files, to profile them, to run the columnar engine or to write long messages
+# are imported when they are used, so that validating a few files, as a pre-commit hook does, starts quickly.
+from format_tests import compressed, decoding, discovery, format_tests, memory, prefilter, registry, row_plans
+
+
+class RecordedError(Exception):
+    # An error that was raised while validating a file, possibly by another process or in another run, and is raised
+    # again with the traceback it was recorded with.
+    pass
+
+
+class FileResult:
+    def __init__(self, short_path: str, year: str, passed: bool, short_message: str = "", full_message: str = "",
+                 error: Exception = None, profile=None, tests: list[dict] = None, full_message_path: str = None,
+                 duplicate_rows: format_tests.DuplicateRows = None, repository: str = "", peak_memory: int = None,
+                 low_memory: bool = False, traceback: str = None):
+        # When several repositories are validated together, the short path starts with the name of the repository.
+        self.repository = repository
+        self.short_path = short_path
+        self.year = year
+        self.passed = passed
+        self.short_message = short_message
+        self.error = error
+        # The traceback of the error, formatted by the process that raised it, since a traceback can't be sent to
+        # another process.
+        self.traceback = traceback
+        self.profile = profile
+        # The outcome of each test, as returned by get_test_result().
+        self.tests = [] if tests is None else tests
+        # The DuplicateRows test, until validate_files() has compared its digests with those of the earlier files.
+        self.duplicate_rows = duplicate_rows
+        # The peak memory allocated while validating the file, if it was tracked, and whether any of it was validated
+        # in low-memory mode.
+        self.peak_memory = peak_memory
+        self.low_memory = low_memory
+        # A long full message is kept in a temporary file instead, until it is discarded.
+        self.__full_message = full_message
+        self.__full_message_path = full_message_path
+
+    @property
+    def group(self) -> str:
+        # The results are grouped by year, and by repository if there is more than one.
+        return f"{self.repository}/{self.year}" if self.repository else self.year
+
+    @property
+    def full_message_path(self) -> str:
+        # The temporary file that holds the full message, or None if it is kept in memory.
+        return self.__full_message_path
+
+    @property
+    def full_message(self) -> str:
+        if self.__full_message_path is None:
+            return self.__full_message
+        with open(self.__full_message_path, "r", encoding="utf-8") as message_file:
+            return message_file.read()
+
+    def add_test(self, test_result: dict, full_message_parts=None):
+        # Adds the outcome of a test that was finished after the others.  The short message is built again, so that
+        # the messages stay in the order of the tests.  The full message is added at the end.
+        self.tests = sorted(self.tests + [test_result], key=lambda x: x["name"])
+        if test_result["passed"]:
+            return
+
+        self.passed = False
+        self.short_message = "".join(f"\n\n* {x['message']}" for x in self.tests if not x["passed"])
+        if full_message_parts is None:
+            return
+
+        if self.__full_message_path is not None:
+            with open(self.__full_message_path, "a", encoding="utf-8") as message_file:
+                message_file.write("\n\n* ")
+                message_file.writelines(full_message_parts)
+        else:
+            full_message = MessageBuffer()
+            full_message.write(f"{self.__full_message}\n\n* " if self.__full_message else "* ")
+            for part in full_message_parts:
+                full_message.write(part)
+            self.__full_message, self.__full_message_path = full_message.get()
+
+    def discard_full_message(self):
+        # Removes the temporary file of the full message, once it is no longer needed.
+        if self.__full_message_path is not None:
+            try:
+                os.remove(self.__full_message_path)
+            except OSError:
+                pass
+        self.__full_message = ""
+        self.__full_message_path = None
+
+    def iter_full_message(self):
+        if self.__full_message_path is None:
+            yield self.__full_message
+        else:
+            with open(self.__full_message_path, "r", encoding="utf-8") as message_file:
+                yield from iter(lambda: message_file.read(1 << 20), "")
+
+    @staticmethod
+    def from_dict(values: dict, full_message: str = "", full_message_path: str = None):
+        error = None if values["error"] is None else RecordedError(values["error"])
+        return FileResult(values["path"], values["year"], values["passed"], values["short_message"], full_message,
+                          error, tests=values["tests"], full_message_path=full_message_path,
+                          repository=values["repository"], peak_memory=values["peak_memory"],
+                          low_memory=values["low_memory"], traceback=values["traceback"])
+
+    def to_dict(self) -> dict:
+        # The profile isn't included, and neither is the full message, which can be too large to hold in memory.  It
+        # can be read in parts with iter_full_message().
+        return {
+            "path": self.short_path,
+            "repository": self.repository,
+            "year": self.year,
+            "passed": self.passed,
+            "short_message": self.short_message,
+            "error": None if self.error is None else f"{type(self.error).__name__}: {self.error}",
+            "traceback": self.traceback,
+            "tests": self.tests,
+            "peak_memory": self.peak_memory,
+            "low_memory": self.low_memory,
+        }
+
+
+class MessageBuffer:
+    # Collects the parts of a message in memory, and moves them to a temporary file once they grow past max_size
+    # characters, or at once in low-memory mode, so that a file with millions of failing rows doesn't need its full
+    # message in memory.  The file is
+    # named, so that a result returned by a worker process can still refer to it.
+    max_size = 1 << 20
+
+    def __init__(self):
+        self.__file = None
+        self.__parts = []
+        self.__size = 0
+
+    def get(self) -> tuple[str, str]:
+        # Returns the message, or the path of the file that contains it.
+        if self.__file is None:
+            return "".join(self.__parts), None
+
+        self.__file.close()
+        return "", self.__file.name
+
+    def write(self, text: str):
+        if self.__file is not None:
+            self.__file.write(text)
+            return
+
+        self.__parts.append(text)
+        self.__size += len(text)
+        if self.__size > MessageBuffer.max_size or memory.is_low():
+            import tempfile
+            self.__file = tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".txt", delete=False)
+            self.__file.writelines(self.__parts)
+            self.__parts = []
+
+
+class ChunkResult:
+    # The row tests of a chunk of a file, as returned by validate_chunk().
+    def __init__(self, headers: list[str], row_count: int, row_tests: list[format_tests.RowTest],
+                 peak_memory: int = None, low_memory: bool = False):
+        self.headers = headers
+        self.low_memory = low_memory
+        self.peak_memory = peak_memory
+        self.row_count = row_count
+        self.row_tests = row_tests
+
+
+class ValidationOptions:
+    engines = ["python", "columnar"]
+
+    def __init__(self, max_examples: int = -1, full_messages: bool = True, engine: str = "python",
+                 profile: bool = False, stop_early: bool = False, max_failures: int = None, prefilter: bool = True,
+                 tests: list[str] = None, max_memory: int = None, track_memory: bool = False):
+        self.engine = engine
+        self.max_examples = max_examples
+        # Stopping once a file has max_failures failing rows is a way of stopping early.
+        self.max_failures = max_failures
+        # The memory limit of each process in bytes, as returned by memory.get_process_limit().
+        self.max_memory = max_memory
+        self.full_messages = full_messages
+        self.prefilter = prefilter
+        self.profile = profile
+        self.stop_early = stop_early or max_failures is not None
+        # The names of the tests to run, as returned by registry.select().
+        self.tests = registry.get_default_names() if tests is None else list(tests)
+        self.track_memory = track_memory
+
+    @property
+    def reads_rows(self) -> bool:
+        # Whether any of the tests needs the rows.  Otherwise, only the header of each file is read.
+        return any(registry.get_scope(x) != "header" for x in self.tests)
+
+    def get_settings(self) -> tuple:
+        # The engine, the prefilter, profiling and the memory settings aren't included, since they don't affect the
+        # results.
+        return self.max_examples, self.full_messages, self.stop_early, self.max_failures, tuple(self.tests)
+
+
+def get_csv_files(root_path: str, ignore_patterns: list[str] = (), manifest_path: str = None):
+    # Yields the files as they are found, so that validating them in this process can start before all of them are.
+    # They are sorted, so that the order of the results doesn't depend on the file system or the number of jobs.
+    return discovery.iter_csv_files(root_path, ignore_patterns, manifest_path)
+
+
+def get_merge_base(root_path: str, ref: str) -> str:
+    # The commit where HEAD branched off ref, which the files are compared with, as the changes of a pull request are,
+    # so that the changes made to ref since then aren't included.  Raises ValueError if git can't be run, root_path
+    # isn't in a git checkout or ref isn't a commit of it.
+    import subprocess
+    try:
+        output = subprocess.run(["git", "-C", root_path, "merge-base", ref, "HEAD"], capture_output=True,
+                                check=True).stdout
+    except OSError as error:
+        raise ValueError(f"can't run git: {error}")
+    except subprocess.CalledProcessError as error:
+        message = error.stderr.decode().strip() or f"{ref} has no common ancestor with HEAD"
+        raise ValueError(f"can't compare {root_path} with {ref}: {message}")
+    return output.decode().strip()
+
+
+def get_changed_csv_files(root_path: str, commit: str, ignore_patterns: list[str] = ()) -> list[str]:
+    # The files that were added or modified since the given commit, as returned by get_merge_base(), including the
+    # changes that aren't committed yet, and the untracked files.  subprocess is only imported when it is used, so that
+    # validating a few files, as a pre-commit hook does, starts quickly.
+    import subprocess
+
+    def git(*args):
+        output = subprocess.run(["git", "-C", root_path, *args], capture_output=True, check=True).stdout
+        return [x for x in output.decode().split("\0") if x]
+
+    # Paths are reported relative to root_path, which need not be the top level of the repository.
+    changed_files = git("diff", "--name-only", "--relative", "--diff-filter=AMR", "-z", commit, "--")
+    untracked_files = git("ls-files", "--others", "--exclude-standard", "-z")
+    return _get_csv_files(root_path, set(changed_files + untracked_files), ignore_patterns)
+
+
+def get_listed_csv_files(root_path: str, paths: list[str], ignore_patterns: list[str] = ()) -> list[str]:
+    # Keeps the given paths, relative to the current directory or absolute, that would have been found by listing
+    # root_path: CSV files under a directory named by a year, that aren't hidden or ignored.  The archives among them
+    # are expanded, and the other paths are skipped.
+    short_paths = {os.path.relpath(os.path.abspath(x), start=root_path).replace(os.sep, "/") for x in paths}
+    return _get_csv_files(root_path, short_paths, ignore_patterns)
+
+
+def get_short_path_and_year(csv_file: str, root_path: str) -> tuple[str, str]:
+    short_path = os.path.relpath(csv_file, start=root_path)
+    return short_path, short_path.split(os.sep, 1)[0]
+
+
+def _get_csv_files(root_path: str, short_paths: set[str], ignore_patterns: list[str]) -> list[str]:
+    files = []
+    for short_path in short_paths:
+        parts = short_path.split("/")
+        if len(parts) > 1 and re.fullmatch(r"[0-9]{4}", parts[0]) and compressed.is_csv_name(short_path) \
+                and not any(x.startswith(".") for x in parts) and not discovery.is_ignored(short_path, ignore_patterns):
+            files.extend(discovery.expand_archive(os.path.join(root_path, *parts), short_path, ignore_patterns))
+
+    return sorted(files, key=lambda x: os.path.relpath(x, start=root_path))
+
+
+def validate_chunk(csv_file: str, start: int, end: int, options: ValidationOptions) -> ChunkResult:
+    # Runs the row tests on the rows between the given byte offsets, which must start and end on row boundaries, as
+    # returned by chunking.get_chunks().  The rows are numbered from the start of the chunk.
+    monitor = memory.Monitor(options.max_memory, options.track_memory)
+    with open(csv_file, "rb") as csv_data:
+        if start > 0:
+            headers = next(csv.reader(decoding.open_text(io.BytesIO(csv_data.readline()), csv_file)), [])
+        csv_data.seek(start)
+        data = csv_data.read(end - start)
+
+    # Only UTF-8 files are split, and only their first chunk can start with a byte order mark.
+    rows = csv.reader(decoding.open_text(io.BytesIO(data), csv_file, None if start == 0 else "utf-8"))
+    if start == 0:
+        headers = next(rows)
+        rows = itertools.chain([headers], rows)
+    row_tests = _get_row_tests(headers, options)
+
+    if options.prefilter and prefilter.is_clean(csv_file, headers, row_tests, None, data):
+        # A clean chunk can't have quoted entries or lone carriage returns, so each line holds a row.
+        row_count = data.count(b"\n") + (not data.endswith(b"\n"))
+    else:
+        # The counter is only advanced once a row has been read, so it ends up at the number of rows.
+        row_counter = itertools.count()
+        should_stop = _get_stop_condition(row_tests, options, monitor)
+        _run_row_tests((x for x, _ in zip(rows, row_counter)), headers, row_tests, options, None, should_stop)
+        row_count = next(row_counter)
+
+    return ChunkResult(headers, row_count, row_tests, monitor.peak, monitor.low_memory)
+
+
+def validate_file(csv_file: str, root_path: str, options: ValidationOptions, data: bytes = None) -> FileResult:
+    # The contents of the file can be provided if they have already been read.
+    monitor = memory.Monitor(options.max_memory, options.track_memory)
+    header_tests = _get_header_tests(options)
+
+    if options.profile:
+        from format_tests import profiling
+        profile = profiling.FileProfile(get_short_path_and_year(csv_file, root_path)[0],
+                                        compressed.get_size(csv_file) if data is None else len(data))
+        start_time = time.perf_counter()
+    else:
+        profile = None
+
+    # The encoding of the contents is found from their first block, and files that aren't text are rejected before any
+    # test is run.  Compressed files are decompressed as they are read.  If there are no row tests, only the first
+    # blocks are read.
+    header_only = not options.reads_rows
+    if data is not None:
+        binary_data = io.BytesIO(data)
+    elif compressed.is_compressed(csv_file):
+        binary_data = compressed.open_binary(csv_file)
+    else:
+        binary_data = open(csv_file, "rb", buffering=decoding.sniff_size if header_only else decoding.buffer_size)
+    csv_data = decoding.open_text(binary_data, get_short_path_and_year(csv_file, root_path)[0], header_only=header_only)
+
+    with csv_data:
+        if profile is not None:
+            profile.add("open", time.perf_counter() - start_time)
+
+        reader = csv.reader(csv_data)
+        headers = next(reader)
+
+        # Each header test is timed on its own, as the row tests are.
+        for test in header_tests:
+            if profile is None:
+                test.test(headers)
+            else:
+                test_start_time = time.perf_counter()
+                test.test(headers)
+                profile.add(type(test).__name__, time.perf_counter() - test_start_time)
+
+        row_tests = _get_row_tests(headers, options)
+
+        # The prefilter scans the raw bytes of the file.  If it finds nothing that could fail a row test, the rows don't
+        # need to be parsed at all.  If there are no row tests, the rest of the file isn't read.
+        if row_tests and not (options.prefilter and prefilter.is_clean(csv_file, headers, row_tests, profile, data)):
+            should_stop = _get_stop_condition(row_tests, options, monitor)
+
+            # The engines check whether to stop after the same number of rows, so they produce the same results.
+            if profile is not None and options.engine != "columnar":
+                _profile_row_tests(reader, headers, row_tests, profile, should_stop, _get_batch_size(),
+                                   options.max_failures)
+            else:
+                _run_row_tests(itertools.chain([headers], reader), headers, row_tests, options, profile, should_stop)
+
+            if options.stop_early and next(reader, None) is not None:
+                for test in row_tests:
+                    test.set_partial()
+
+    if profile is not None:
+        profile.add("total", time.perf_counter() - start_time)
+
+    return _get_file_result(csv_file, root_path, header_tests + row_tests, options, profile, monitor)
+
+
+def get_test_result(test: format_tests.FormatTest, max_examples: int) -> dict:
+    # The failure count and the examples only apply to the row tests.  The message and the examples are limited to
+    # max_examples failing rows, as in the console output.
+    is_row_test = isinstance(test, format_tests.RowTest)
+    return {
+        "name": type(test).__name__,
+        "passed": test.passed,
+        "failures": test.failure_count if is_row_test else None,
+        "partial": is_row_test and test.partial,
+        "examples": [[x, y] for x, y in test.get_examples(max_examples)] if is_row_test else [],
+        "message": None if test.passed else test.get_failure_message(max_examples=max_examples),
+    }
+
+
+def _combine_chunks(csv_file: str, root_path: str, options: ValidationOptions, chunk_results: list) -> FileResult:
+    # Merges the results of the chunks of a file, in order, into the result that validating it whole would have given.
+    error_result = next((x for x in chunk_results if isinstance(x, FileResult)), None)
+    if error_result is not None:
+        return error_result
+
+    headers = chunk_results[0].headers
+    header_tests = _get_header_tests(options)
+    for test in header_tests:
+        test.test(headers)
+
+    row_tests = chunk_results[0].row_tests
+    row_offset = chunk_results[0].row_count
+    for chunk_result in chunk_results[1:]:
+        for test, chunk_test in zip(row_tests, chunk_result.row_tests):
+            test.merge(chunk_test, row_offset)
+        row_offset += chunk_result.row_count
+
+    result = _get_file_result(csv_file, root_path, header_tests + row_tests, options, None)
+    if options.track_memory:
+        result.peak_memory = max(x.peak_memory for x in chunk_results)
+    result.low_memory = any(x.low_memory for x in chunk_results)
+    return result
+
+
+def _get_file_result(csv_file: str, root_path: str, tests: list[format_tests.FormatTest], options: ValidationOptions,
+                     profile, monitor: memory.Monitor = None) -> FileResult:
+    short_path, year = get_short_path_and_year(csv_file, root_path)
+
+    # The outcome of DuplicateRows depends on the earlier files, so it is added by validate_files().
+    duplicate_rows = next((x for x in tests if isinstance(x, format_tests.DuplicateRows)), None)
+    tests = [x for x in tests if x is not duplicate_rows]
+
+    passed = True
+    short_message = ""
+    full_message = MessageBuffer()
+    is_first_message = True
+    test_results = []
+    for test in sorted(tests, key=lambda x: type(x).__name__):
+        test_result = get_test_result(test, options.max_examples)
+        test_results.append(test_result)
+        if not test.passed:
+            passed = False
+            short_message += f"\n\n* {test_result['message']}"
+
+            # The full messages are only needed for the log file, and can be very large.
+            if options.full_messages:
+                full_message.write("* " if is_first_message else "\n\n* ")
+                for part in test.iter_failure_message():
+                    full_message.write(part)
+                is_first_message = False
+
+    full_message, full_message_path = full_message.get()
+    result = FileResult(short_path, year, passed, short_message, full_message, profile=profile, tests=test_results,
+                        full_message_path=full_message_path, duplicate_rows=duplicate_rows)
+    if monitor is not None:
+        result.peak_memory = monitor.peak
+        result.low_memory = monitor.low_memory
+    return result
+
+
+def _get_header_tests(options: ValidationOptions) -> list[format_tests.FormatTest]:
+    return registry.create_tests(options.tests, ["header"])
+
+
+def _get_row_tests(headers: list[str], options: ValidationOptions) -> list[format_tests.RowTest]:
+    # The tests are always created in the same order, so that those of the chunks of a file can be matched up.
+    return registry.create_tests(options.tests, ["row", "value"], headers)
+
+
+def _get_stop_condition(row_tests: list[format_tests.RowTest], options: ValidationOptions, monitor: memory.Monitor):
+    # With a memory limit, the memory is also checked after each chunk of rows, so that the rest of a file that nears
+    # the limit is validated in low-memory mode.
+    if not options.stop_early:
+        if options.max_memory is None:
+            return None
+
+        def check_memory():
+            monitor.check()
+            return False
+
+        return check_memory
+
+    # The number of failing rows is checked by the engines as the failures are found, rather than after each chunk.
+    def should_stop():
+        monitor.check()
+        return all(x.has_enough_failures(options.max_examples) for x in row_tests)
+
+    return should_stop
+
+
+def _profile_row_tests(reader, headers: list[str], row_tests: list[format_tests.RowTest], profile, should_stop,
+                       batch_size: int, max_failures: int = None):
+    # Each test is run on its own, rather than with a row plan, so that it can be timed separately.  As with the
+    # engines, the rows stop right after the one that brings the number of failing rows to max_failures.
+    timings = {test: 0.0 for test in row_tests}
+    parse_time = 0.0
+
+    row = headers
+    while row is not None:
+        profile.rows += 1
+        for test in row_tests:
+            start_time = time.perf_counter()
+            test.test(row)
+            timings[test] += time.perf_counter() - start_time
+
+        if max_failures is not None and sum(x.failure_count for x in row_tests) >= max_failures:
+            break
+        if should_stop is not None and profile.rows % batch_size == 0 and should_stop():
+            break
+
+        start_time = time.perf_counter()
+        row = next(reader, None)
+        parse_time += time.perf_counter() - start_time
+
+    profile.add("parse", parse_time)
+    for test, seconds in timings.items():
+        profile.add(type(test).__name__, seconds)
+
+
+def _run_row_tests(rows, headers: list[str], row_tests: list[format_tests.RowTest], options: ValidationOptions, profile,
+                   should_stop):
+    if options.engine == "columnar":
+        from format_tests import columnar
+        columnar.scan(rows, row_tests, headers, profile, should_stop, options.max_failures)
+    else:
+        # All the row tests are run by a single loop that is specialized for the header, and shared by every file with
+        # the same header.
+        row_plan = row_plans.get_row_plan(headers, row_tests)
+        if should_stop is None:
+            row_plan.run(rows, row_tests)
+        else:
+            row_plan.run(rows, row_tests, should_stop, _get_batch_size(), options.max_failures)
+
+
+def _get_batch_size() -> int:
+    # The engines check whether to stop after the same number of rows, which is the size of the chunks of the columnar
+    # engine.
+    from format_tests import columnar
+    return columnar.chunk_size
+
+
+def _validate_file_safely(csv_file: str, root_path: str, options: ValidationOptions, data: bytes = None) -> FileResult:
+    # An unreadable file shouldn't abort the whole run (or a worker process), so the error is returned to be reported
+    # against that file.
+    try:
+        return validate_file(csv_file, root_path, options, data)
+    except Exception as error:
+        return _get_error_result(csv_file, root_path, error)
+
+
+def _get_error_result(csv_file: str, root_path: str, error: Exception) -> FileResult:
+    # Must be called while the error is handled.  traceback is only imported when a file can't be validated.
+    import traceback
+
+    short_path, year = get_short_path_and_year(csv_file, root_path)
+    return FileResult(short_path, year, False, error=error, traceback=traceback.format_exc())
+
+
+def _run_task(task: tuple[str, str, tuple[int, int]], options: ValidationOptions):
+    # A task is a file, along with its root and the byte range of one of its chunks, if it is split.  A chunk that
+    # can't be validated returns the result of the error, which is reported against its file.
+    csv_file, root_path, chunk = task
+    if chunk is None:
+        return _validate_file_safely(csv_file, root_path, options)
+
+    try:
+        return validate_chunk(csv_file, *chunk, options)
+    except Exception as error:
+        return _get_error_result(csv_file, root_path, error)
+
+
+def validate_files(csv_files: list[str], root_path: str, options: ValidationOptions, jobs: int = 1, cache=None,
+                   prefetch_depth: int = 0, prefetch_memory: int = 256 << 20, split_size: int = None):
+    # Validates the files of a single repository, as validate_repositories() does.
+    return validate_repositories([(root_path, csv_files)], options, jobs, [cache], prefetch_depth, prefetch_memory,
+                                 split_size)
+
+
+def validate_repositories(repositories: list[tuple[str, list[str]]], options: ValidationOptions, jobs: int = 1,
+                          caches: list = None, prefetch_depth: int = 0, prefetch_memory: int = 256 << 20,
+                          split_size: int = None):
+    # Validates the files of each repository, given as its root path and the files under it, with the cache of that
+    # repository, if any.  The files of every repository are validated as a single batch, so they share the same
+    # worker processes.  The results are yielded in the order of the repositories, and of the files in each.  If there
+    # is more than one repository, the short path of each result starts with the name of its repository.
+    #
+    # If prefetch_depth is positive and the files are validated in this process, up to that many files, and up to
+    # prefetch_memory bytes, are read on other threads while the current file is being validated.  If split_size is
+    # provided and the files are validated by several processes, uncompressed files larger than split_size bytes are
+    # split into chunks of about that size, which are validated in parallel.  Otherwise, the workers are given the
+    # largest files first, so that a large file doesn't keep one of them busy after the others are done.  Files aren't
+    # split when stopping early or profiling, since both depend on reading the rows in order.  If only the headers are
+    # read, files are neither read ahead nor split.
+    can_split = split_size is not None and not options.stop_early and not options.profile and options.reads_rows
+    if caches is None or "DuplicateRows" in options.tests:
+        # The cached results don't have the digests of their rows, which are needed to compare the later files with.
+        caches = [None] * len(repositories)
+    root_caches = {x: y for (x, _), y in zip(repositories, caches)}
+    names = {x: get_repository_name(x) for x, _ in repositories} if len(repositories) > 1 else None
+
+    # The files, which may be given as iterators, are looked up in the caches and validated as they are found, unless
+    # they are given to workers, which need all of them to be found first.
+    files = ((csv_file, root_path) for root_path, csv_files in repositories for csv_file in csv_files)
+    entries = _look_up_results(files, root_caches)
+    if jobs != 1:
+        entries = list(entries)
+        files_to_validate = [(csv_file, root_path) for csv_file, root_path, result, _ in entries if result is None]
+
+    if jobs == 1 or len(files_to_validate) == 0 or (len(files_to_validate) == 1 and not can_split):
+        results = _validate_serially(entries, options, prefetch_depth, prefetch_memory)
+        yield from _find_duplicate_rows(_merge_results(results, root_caches, names, options.max_memory), options)
+    else:
+        import multiprocessing
+        with multiprocessing.Pool(jobs if jobs > 0 else None) as pool:
+            run_task = functools.partial(_run_task, options=options)
+            if can_split:
+                # imap returns the results in the order of the tasks, regardless of which worker finishes first.
+                chunk_counts = collections.deque()
+                tasks = _get_tasks(files_to_validate, split_size, chunk_counts)
+                results = _combine_task_results(files_to_validate, chunk_counts, pool.imap(run_task, tasks), options)
+            else:
+                sizes = [get_size(x) for x, _ in files_to_validate]
+                order = sorted(range(len(files_to_validate)), key=lambda x: -sizes[x])
+                task_results = pool.imap(run_task, ((*files_to_validate[x], None) for x in order))
+                results = _restore_order(zip(order, task_results))
+            results = _fill_in_results(entries, results)
+            yield from _find_duplicate_rows(_merge_results(results, root_caches, names, options.max_memory), options)
+
+
+def get_repository_name(root_path: str) -> str:
+    return os.path.basename(os.path.abspath(root_path))
+
+
+def get_size(csv_file: str) -> int:
+    # The size of the file, as returned by compressed.get_size(), or 0 if it can't be read.  Such a file fails quickly
+    # once it is validated, so it can wait until the end.
+    try:
+        return compressed.get_size(csv_file)
+    except Exception:
+        return 0
+
+
+def _restore_order(indexed_results):
+    # Yields the results in the order of their indices, holding on to those that arrive before their turn.
+    pending_results = {}
+    next_index = 0
+    for index, result in indexed_results:
+        pending_results[index] = result
+        while next_index in pending_results:
+            yield pending_results.pop(next_index)
+            next_index += 1
+
+
+def _combine_task_results(files: list[tuple[str, str]], chunk_counts: collections.deque, task_results,
+                          options: ValidationOptions):
+    # The number of chunks of each file is known by the time the result of its first task is available.
+    for csv_file, root_path in files:
+        result = next(task_results)
+        chunk_count = chunk_counts.popleft()
+        if chunk_count is None:
+            yield result
+        else:
+            chunk_results = [result] + [next(task_results) for _ in range(chunk_count - 1)]
+            yield _combine_chunks(csv_file, root_path, options, chunk_results)
+
+
+def _get_tasks(files: list[tuple[str, str]], split_size: int, chunk_counts: collections.deque):
+    # Yields a task for each file that isn't split, and one for each chunk of a file that is.  The chunks of a file are
+    # only found once the pool asks for its tasks, so that the first ones can be validated in the meantime.
+    for csv_file, root_path in files:
+        chunks = None
+        if not compressed.is_compressed(csv_file):
+            try:
+                # The chunks of a file are found by looking for line breaks in its bytes, which only works for UTF-8.
+                if os.path.getsize(csv_file) > split_size and _get_encoding(csv_file) in ("utf-8", "utf-8-sig"):
+                    from format_tests import chunking
+                    chunks = chunking.get_chunks(csv_file, split_size)
+            except (OSError, ValueError):
+                pass
+
+        if chunks is None or len(chunks) == 1:
+            chunk_counts.append(None)
+            yield csv_file, root_path, None
+        else:
+            chunk_counts.append(len(chunks))
+            for chunk in chunks:
+                yield csv_file, root_path, chunk
+
+
+def _get_encoding(csv_file: str) -> str:
+    with open(csv_file, "rb") as csv_data:
+        return decoding.sniff(csv_data.read(decoding.sniff_size))
+
+
+def _find_duplicate_rows(results, options: ValidationOptions):
+    # The results arrive in the order of their paths, so the files of each year of a repository are compared with each
+    # other as they arrive, and each duplicate row is reported against the later of the two files.
+    if "DuplicateRows" not in options.tests:
+        yield from results
+        return
+
+    # The index is kept in SQLite, which is only imported when it is used, so that the other runs start quickly.
+    from format_tests import duplicates
+    duplicate_index = duplicates.DuplicateIndex()
+    try:
+        for result in results:
+            test = result.duplicate_rows
+            if test is not None:
+                for row_number, first_path, first_row_number in duplicate_index.add(result.group, result.short_path,
+                                                                                    test.iter_digests()):
+                    test.add_duplicate(row_number, first_path, first_row_number)
+                test.discard_digests()
+                result.duplicate_rows = None
+                result.add_test(get_test_result(test, options.max_examples),
+                                test.iter_failure_message() if options.full_messages else None)
+            yield result
+    finally:
+        duplicate_index.close()
+
+
+def _look_up_results(files, caches: dict):
+    # Yields each file with its root path, its cached result, or None if it must be validated, and the digest to cache
+    # its result with.
+    for csv_file, root_path in files:
+        result, digest = (None, None) if caches[root_path] is None else caches[root_path].get(csv_file)
+        yield csv_file, root_path, result, digest
+
+
+def _validate_serially(entries, options: ValidationOptions, prefetch_depth: int, prefetch_memory: int):
+    # Validates the files that weren't found in a cache in this process, and yields every entry with its result.  The
+    # module that reads ahead is only imported when it is used, so that validating a few files, as a pre-commit hook
+    # does, starts quickly.
+    if prefetch_depth <= 0 or not options.reads_rows:
+        for csv_file, root_path, result, digest in entries:
+            if result is None:
+                yield csv_file, root_path, _validate_file_safely(csv_file, root_path, options), digest
+            else:
+                yield csv_file, root_path, result, None
+        return
+
+    # The files found in a cache while looking for the next ones to read ahead wait for their turn.
+    pending_entries = collections.deque()
+
+    def get_files_to_read():
+        for entry in entries:
+            pending_entries.append(entry)
+            if entry[2] is None:
+                yield entry[0]
+
+    from format_tests import prefetch
+    for csv_file, data in prefetch.ReadAhead(get_files_to_read(), prefetch_depth, prefetch_memory):
+        while pending_entries[0][2] is not None:
+            cached_file, root_path, result, _ = pending_entries.popleft()
+            yield cached_file, root_path, result, None
+        _, root_path, _, digest = pending_entries.popleft()
+        yield csv_file, root_path, _validate_file_safely(csv_file, root_path, options, data), digest
+    for csv_file, root_path, result, _ in pending_entries:
+        yield csv_file, root_path, result, None
+
+
+def _fill_in_results(entries: list, results):
+    # Gives the entries that weren't found in a cache the results of the workers, which are in the same order.
+    for csv_file, root_path, result, digest in entries:
+        if result is None:
+            yield csv_file, root_path, next(results), digest
+        else:
+            yield csv_file, root_path, result, None
+
+
+def _merge_results(results, caches: dict, names: dict, max_memory: int):
+    # The results are given with their files, their root paths, and the digests to cache them with, which are None for
+    # the results that came from a cache.  They are cached by the path relative to their root, before the name of the
+    # repository is added to it.  The results that wait for their turn are held by this process, so its memory is
+    # checked as each one arrives.
+    for csv_file, root_path, result, digest in results:
+        memory.check(max_memory)
+        if digest is not None and caches[root_path] is not None:
+            caches[root_path].put(csv_file, digest, result)
+        if names is not None:
+            result.repository = names[root_path]
+            result.short_path = f"{result.repository}/{result.short_path}"
+            if result.profile is not None:
+                result.profile.short_path = result.short_path
+        yield result
@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+
+from format_tests import compressed, discovery, validation
+
+try:
+    from watchdog import observers
+except ImportError:
+    observers = None
+
+
+class Watcher:
+    # Keeps the size and modification time of every CSV file under the root, and reports the files that have been
+    # added, modified or removed since the last check.
+    def __init__(self, root_path: str, ignore_patterns: list[str] = ()):
+        self.__ignore_patterns = ignore_patterns
+        self.__root_path = root_path
+        self.__stats = self.__scan()
+
+    @property
+    def file_count(self) -> int:
+        return len(self.__stats)
+
+    def check(self, csv_files: list[str]) -> tuple[list[str], list[str]]:
+        # Only checks the given files, which are typically those that the file system reported as changed.  Returns the
+        # files that have changed and those that have been removed.
+        changed_files = []
+        removed_files = []
+        for csv_file in sorted(set(csv_files)):
+            stat = _get_stat(csv_file)
+            if stat is None and csv_file in self.__stats:
+                del self.__stats[csv_file]
+                removed_files.append(csv_file)
+            elif stat is not None and self.__stats.get(csv_file) != stat:
+                self.__stats[csv_file] = stat
+                changed_files.append(csv_file)
+        return changed_files, removed_files
+
+    def poll(self) -> tuple[list[str], list[str]]:
+        # Lists the whole tree again, which also finds new directories and archives.
+        stats = self.__scan()
+        changed_files = [x for x, y in stats.items() if self.__stats.get(x) != y]
+        removed_files = [x for x in self.__stats if x not in stats]
+        self.__stats = stats
+        return changed_files, removed_files
+
+    def __scan(self) -> dict:
+        stats = {}
+        for csv_file in discovery.iter_csv_files(self.__root_path, self.__ignore_patterns):
+            stat = _get_stat(csv_file)
+            if stat is not None:
+                stats[csv_file] = stat
+        return stats
+
+
+class _EventQueue:
+    # Collects the paths reported by watchdog, which uses inotify on Linux, and wakes up the watch loop.
+    def __init__(self):
+        self.__event = threading.Event()
+        self.__lock = threading.Lock()
+        self.__paths = set()
+
+    def dispatch(self, event):
+        # Saving a file also modifies its directory, which doesn't need to be listed again.
+        if event.is_directory and event.event_type == "modified":
+            return
+
+        with self.__lock:
+            self.__paths.add(event.src_path)
+            if getattr(event, "dest_path", None):
+                self.__paths.add(event.dest_path)
+        self.__event.set()
+
+    def get(self, timeout: float) -> set[str]:
+        self.__event.wait(timeout)
+        with self.__lock:
+            self.__event.clear()
+            paths = self.__paths
+            self.__paths = set()
+        return paths
+
+
+def is_available() -> bool:
+    return observers is not None
+
+
+def print_result(result: validation.FileResult, seconds: float, stream):
+    if result.error is not None:
+        stream.write(f"{result.short_path}: error ({seconds * 1000:.0f} ms)\n\t{type(result.error).__name__}: "
+                     f"{result.error}\n")
+    elif result.passed:
+        stream.write(f"{result.short_path}: passed ({seconds * 1000:.0f} ms)\n")
+    else:
+        stream.write(f"{result.short_path}: failed ({seconds * 1000:.0f} ms){result.short_message}\n")
+    stream.flush()
+
+
+def watch(root_path: str, options: validation.ValidationOptions, ignore_patterns: list[str], interval: float,
+          stream):
+    # Validates the files that change under the root, as they change, until interrupted.  The files are validated in
+    # this process, so the row plans and the other caches stay warm between checks.  If watchdog is installed, the
+    # file system reports the changes as they happen, otherwise the tree is polled every interval seconds.
+    watcher = Watcher(root_path, ignore_patterns)
+    stream.write(f"Watching {watcher.file_count} files under {root_path}. Press Ctrl+C to stop.\n")
+    stream.flush()
+
+    event_queue = None
+    if is_available():
+        event_queue = _EventQueue()
+        observer = observers.Observer()
+        observer.schedule(event_queue, root_path, recursive=True)
+        observer.start()
+
+    try:
+        while True:
+            if event_queue is None:
+                time.sleep(interval)
+                changed_files, removed_files = watcher.poll()
+            else:
+                paths = event_queue.get(interval)
+                if not paths:
+                    continue
+                # Directories and archives that have been added or removed can only be listed by polling the tree.
+                if all(_is_file_path(x) for x in paths):
+                    csv_files = validation.get_listed_csv_files(root_path, paths, ignore_patterns)
+                    changed_files, removed_files = watcher.check(csv_files)
+                else:
+                    changed_files, removed_files = watcher.poll()
+
+            for csv_file in removed_files:
+                stream.write(f"{validation.get_short_path_and_year(csv_file, root_path)[0]}: removed\n")
+            for csv_file in changed_files:
+                start_time = time.perf_counter()
+                result = next(validation.validate_files([csv_file], root_path, options))
+                print_result(result, time.perf_counter() - start_time, stream)
+            stream.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if event_queue is not None:
+            observer.stop()
+            observer.join()
+
+
+def _get_stat(csv_file: str) -> tuple[int, int]:
+    try:
+        stat = os.stat(compressed.get_file_path(csv_file))
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _is_file_path(path: str) -> bool:
+    # Whether the path is that of a file that isn't an archive, or of a CSV file that has been removed.
+    if path.lower().endswith(compressed.archive_suffix):
+        return False
+    return os.path.isfile(path) or (not os.path.exists(path) and compressed.is_csv_name(path))
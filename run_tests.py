@@ -1,30 +1,233 @@
 import argparse
+import os
+import sys
 import unittest
 
+from format_tests import columnar, failure_log, profiling, registry, reports, validation
 from format_tests.test_format import FileFormatTests, TestCase, TestResult
+from format_tests.validation import ValidationOptions
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    try:
+        index, count = (int(x) for x in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid shard: '{value}' (expected K/N)")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"invalid shard: '{value}' (K must be between 1 and N)")
+    return index, count
+
+
+def read_roots_file(path: str) -> list[str]:
+    with open(path, "r") as roots_file:
+        lines = [x.strip() for x in roots_file]
+    return [x for x in lines if x and not x.startswith("#")]
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("root_path", type=str, help="the absolute path to the repository containing files to test")
+    parser.add_argument("root_paths", type=str, nargs="*", metavar="root_path",
+                        help="the absolute path to the repository containing files to test. Several repositories can "
+                             "be tested together, in which case the path of each file starts with the name of its "
+                             "repository.")
+    parser.add_argument("--cache-dir", type=str, metavar="DIR",
+                        help="the path to a directory where results are cached between runs. Files that haven't "
+                             "changed since they were last tested will not be tested again.")
+    parser.add_argument("--changed-since", type=str, metavar="REF",
+                        help="only test the files that have been added or modified since HEAD branched off the given "
+                             "git reference, e.g. the base branch of a pull request, including those that haven't been "
+                             "committed yet")
+    parser.add_argument("--engine", choices=ValidationOptions.engines, default="python",
+                        help="the engine used to run the row tests. The columnar engine runs them on large chunks of "
+                             "rows at once, and requires NumPy.")
     parser.add_argument("--group-failures", action="store_true",
-                        help="group the failures by year in the console output using the GitHub Actions group and "
-                             "endgroup workflow commands")
-    parser.add_argument("--log-file", type=str, help="the absolute path to a file that the full failure messages will "
-                                                     "be written to")
+                        help="group the failures by year, and by repository if there is more than one, in the console "
+                             "output using the GitHub Actions group and endgroup workflow commands")
+    parser.add_argument("--ignore", action="append", default=[], metavar="PATTERN",
+                        help="skip the directories and files whose names or paths relative to root_path match the "
+                             "given shell-style pattern. This option can be given more than once.")
+    parser.add_argument("--jobs", type=int, default=1, metavar="N",
+                        help="the number of processes used to validate files in parallel. If 0 is provided, one "
+                             "process per CPU will be used.")
+    parser.add_argument("--log-file", type=str,
+                        help="the absolute path to a file that the full failure messages will be written to. The log "
+                             "is compressed with gzip if the path ends with .gz, or with Zstandard if it ends with "
+                             ".zst, which requires the zstandard package.")
+    parser.add_argument("--manifest", type=str, metavar="FILE",
+                        help="the path to a file that records the contents of each directory. On the next run, only "
+                             "the directories that have changed since will be listed again.")
+    parser.add_argument("--merge", type=str, nargs="+", metavar="FILE",
+                        help="report the results written by each shard with --results as a single run, instead of "
+                             "testing any files. Every shard of the run must be provided, and --max-examples must "
+                             "be the same as for the shards.")
     parser.add_argument("--max-examples", type=int, default=10, metavar="N",
                         help="the maximum number of failing rows to print to the console. If a negative value is "
                              "provided, all failures will be printed.")
+    parser.add_argument("--max-failures", type=int, metavar="N",
+                        help="stop reading a file right after the row that brings the number of failing rows found in "
+                             "it to N. The number of failing rows in the messages will then be a lower bound. Implies "
+                             "--stop-early, so it can't be used with DuplicateRows either.")
+    parser.add_argument("--max-memory", type=int, metavar="MB",
+                        help="the memory that the run should stay under, shared by the processes of --jobs. When a "
+                             "process nears its share, it keeps only the counts of the failing rows in memory, and "
+                             "writes the rows and the messages to temporary files, until its memory drops again. "
+                             "--prefetch-memory is also limited to a quarter of it.")
+    parser.add_argument("--no-cache", action="store_true", help="ignore the --cache-dir option")
+    parser.add_argument("--no-prefilter", action="store_true",
+                        help="parse and test every row of every file. By default, the raw bytes of each file are "
+                             "scanned first, and the rows of files that can't fail any row test are skipped.")
+    parser.add_argument("--only", action="append", metavar="TEST",
+                        help="only run the given test, or the tests in the given scope: header, row or value. If only "
+                             "header tests are run, only the first line of each file is read. NonAlphanumericEntries "
+                             "and DuplicateRows are only run if they are named. This option can be given more than "
+                             "once.")
+    parser.add_argument("--prefetch", type=int, default=0, metavar="N",
+                        help="the number of files to read ahead on other threads while a file is being validated, "
+                             "when --jobs is 1")
+    parser.add_argument("--prefetch-memory", type=int, default=256, metavar="MB",
+                        help="the maximum size of the files that have been read ahead and are waiting to be validated. "
+                             "Larger files are read when they are validated.")
+    parser.add_argument("--profile", action="store_true",
+                        help="time each step and test for every file, and print a summary of the slowest ones. If "
+                             "--log-file is provided, the full profile will be written next to it as JSON.")
+    parser.add_argument("--report", choices=reports.formats,
+                        help="write a record for each file, with the outcome of each test, as soon as it has been "
+                             "tested. The records are written to the standard output, unless --report-file is "
+                             "provided.")
+    parser.add_argument("--report-file", type=str, metavar="FILE", help="the path to a file that --report writes to")
+    parser.add_argument("--roots-file", type=str, metavar="FILE",
+                        help="the path to a file that lists the repositories to test, one per line, in addition to "
+                             "any root_path. Blank lines and lines starting with # are skipped.")
+    parser.add_argument("--results", type=str, metavar="FILE",
+                        help="the path to a file that the result of each file will be written to, for --merge")
+    parser.add_argument("--shard", type=parse_shard, metavar="K/N",
+                        help="split the files into N shards with about the same number of bytes each, and only test "
+                             "the files of the K-th one. Every machine must list the same files.")
+    parser.add_argument("--skip", action="append", default=[], metavar="TEST",
+                        help="don't run the given test, or the tests in the given scope. This option can be given more "
+                             "than once.")
+    parser.add_argument("--split-size", type=int, metavar="MB",
+                        help="with --jobs, split uncompressed files larger than MB megabytes into chunks of about that "
+                             "size, which are validated in parallel. The failures are reported as if each file had "
+                             "been validated whole.")
+    parser.add_argument("--stop-early", action="store_true",
+                        help="stop reading a file once every row test has failed with enough rows to fill the console "
+                             "output. The number of failing rows in the messages will then be a lower bound. It can't "
+                             "be used with DuplicateRows, which must read every row.")
+    parser.add_argument("--track-memory", action="store_true",
+                        help="measure the peak memory allocated while testing each file, and include it in the "
+                             "--report records. This slows the tests down several times.")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running, and test each file again as soon as it is added or modified. If the "
+                             "watchdog package is installed, the changes are reported by the file system, otherwise "
+                             "root_path is polled every --watch-interval seconds. The options that only apply to a "
+                             "full run, such as --jobs, --cache-dir or --report, can't be used with it.")
+    parser.add_argument("--watch-interval", type=float, default=1.0, metavar="SECONDS",
+                        help="with --watch, the number of seconds between two polls of root_path")
     args = parser.parse_args()
 
-    TestCase.root_path = args.root_path
+    root_paths = list(args.root_paths)
+    if args.roots_file is not None:
+        try:
+            root_paths.extend(read_roots_file(args.roots_file))
+        except OSError as error:
+            parser.error(f"can't read --roots-file: {error}")
+
+    if not root_paths and args.merge is None:
+        parser.error("the following arguments are required: root_path")
+    if args.merge is not None and args.shard is not None:
+        parser.error("--merge can't be used with --shard")
+    if args.watch and len(root_paths) != 1:
+        parser.error("--watch requires a single root_path")
+    if args.watch:
+        # Each file is validated in this process as soon as it changes, and only its outcome is printed.
+        watch_conflicts = {"--cache-dir": args.cache_dir, "--changed-since": args.changed_since,
+                           "--group-failures": args.group_failures, "--jobs": args.jobs != 1,
+                           "--log-file": args.log_file, "--manifest": args.manifest, "--merge": args.merge,
+                           "--prefetch": args.prefetch, "--profile": args.profile, "--report": args.report,
+                           "--report-file": args.report_file, "--results": args.results, "--shard": args.shard,
+                           "--split-size": args.split_size, "--track-memory": args.track_memory}
+        conflicts = [x for x, y in watch_conflicts.items() if y]
+        if conflicts:
+            parser.error(f"--watch can't be used with {', '.join(conflicts)}")
+    if len({validation.get_repository_name(x) for x in root_paths}) < len(root_paths):
+        parser.error("the repositories must be directories with different names")
+
+    if args.engine == "columnar" and not columnar.is_available():
+        parser.error("the columnar engine requires NumPy")
+    if args.log_file is not None and not failure_log.is_available(args.log_file):
+        parser.error("compressing the log with Zstandard requires the zstandard package")
+
+    try:
+        tests = registry.select(args.only, args.skip)
+    except ValueError as error:
+        parser.error(str(error))
+    if not tests:
+        parser.error("no tests are selected")
+    if args.max_failures is not None and args.max_failures < 1:
+        parser.error("--max-failures must be at least 1")
+    if "DuplicateRows" in tests and (args.stop_early or args.max_failures is not None):
+        # DuplicateRows only finds its failures once every row of every file of a year has been read, so it would keep
+        # every file from stopping early.
+        parser.error(f"{'--stop-early' if args.stop_early else '--max-failures'} can't be used with DuplicateRows")
+
+    # Each repository is compared with the commit where its HEAD branched off the reference.
+    changed_since = None
+    if args.changed_since is not None:
+        try:
+            changed_since = {x: validation.get_merge_base(x, args.changed_since) for x in root_paths}
+        except ValueError as error:
+            parser.error(f"--changed-since: {error}")
+
+    if args.watch:
+        # The watch loop, and watchdog if it is installed, are only imported when they are used.
+        from format_tests import watch
+
+        options = ValidationOptions(max_examples=args.max_examples, full_messages=False, engine=args.engine,
+                                    stop_early=args.stop_early, max_failures=args.max_failures,
+                                    prefilter=not args.no_prefilter, tests=tests,
+                                    max_memory=None if args.max_memory is None else args.max_memory << 20)
+        watch.watch(root_paths[0], options, args.ignore, args.watch_interval, sys.stdout)
+        exit(0)
+
+    TestCase.cache_dir = None if args.no_cache else args.cache_dir
+    TestCase.changed_since = changed_since
+    TestCase.engine = args.engine
+    TestCase.ignore_patterns = args.ignore
+    TestCase.jobs = args.jobs
+    if root_paths:
+        TestCase.root_paths = root_paths
     TestCase.log_file = args.log_file
+    TestCase.manifest_file = args.manifest
     TestCase.max_examples = args.max_examples
+    TestCase.max_failures = args.max_failures
+    TestCase.max_memory = None if args.max_memory is None else args.max_memory << 20
+    TestCase.merge_files = args.merge
+    TestCase.prefetch_depth = args.prefetch
+    TestCase.prefetch_memory = args.prefetch_memory << 20
+    if args.max_memory is not None:
+        TestCase.prefetch_memory = min(TestCase.prefetch_memory, args.max_memory << 18)
+    TestCase.prefilter = not args.no_prefilter
+    TestCase.profiler = profiling.Profiler() if args.profile else None
+    TestCase.report_file = args.report_file
+    TestCase.report_format = args.report
+    TestCase.results_file = args.results
+    TestCase.shard = args.shard
+    TestCase.split_size = None if args.split_size is None else args.split_size << 20
+    TestCase.stop_early = args.stop_early
+    TestCase.tests = tests
+    TestCase.track_memory = args.track_memory
 
     result_class = TestResult if args.group_failures else None
     test_runner = unittest.TextTestRunner(resultclass=result_class)
     test_suite = unittest.defaultTestLoader.loadTestsFromTestCase(FileFormatTests)
     result = test_runner.run(test_suite)
 
+    if TestCase.profiler is not None:
+        TestCase.profiler.print_summary(sys.stderr)
+        if args.log_file is not None:
+            TestCase.profiler.write(f"{os.path.splitext(args.log_file)[0]}.profile.json")
+
     if result.wasSuccessful():
         exit(0)
     else:
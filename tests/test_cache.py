@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from format_tests import cache, validation
+
+
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.root_dir = tempfile.TemporaryDirectory()
+        os.mkdir(os.path.join(self.root_dir.name, "2020"))
+        self.csv_file = os.path.join(self.root_dir.name, "2020", "a.csv")
+        with open(self.csv_file, "w") as csv_file:
+            csv_file.write("county,votes\na,1\n")
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+        self.root_dir.cleanup()
+
+    def get_cache(self, fingerprint="a"):
+        return cache.ResultCache(self.cache_dir.name, self.root_dir.name, fingerprint)
+
+    def put(self, result_cache, passed=False):
+        result, digest = result_cache.get(self.csv_file)
+        self.assertIsNone(result)
+        tests = [{"name": "EmptyRows", "passed": passed, "failures": 1 - passed, "partial": False, "examples": [],
+                  "message": None if passed else "Has 1 empty rows."}]
+        result = validation.FileResult("2020/a.csv", "2020", passed, "short", "full", tests=tests)
+        result_cache.put(self.csv_file, digest, result)
+
+    def test_get(self):
+        result_cache = self.get_cache()
+        self.put(result_cache)
+        result_cache.close()
+
+        result_cache = self.get_cache()
+        result, _ = result_cache.get(self.csv_file)
+        self.assertEqual(("2020/a.csv", "2020", False, "short", "full"),
+                         (result.short_path, result.year, result.passed, result.short_message, result.full_message))
+        self.assertEqual("Has 1 empty rows.", result.tests[0]["message"])
+
+        # A new modification time with the same contents is still a hit.
+        os.utime(self.csv_file, ns=(0, 0))
+        self.assertIsNotNone(result_cache.get(self.csv_file)[0])
+
+        with open(self.csv_file, "w") as csv_file:
+            csv_file.write("county,votes\nb,2\n")
+        self.assertIsNone(result_cache.get(self.csv_file)[0])
+
+    def test_message_file(self):
+        result_cache = self.get_cache()
+        _, digest = result_cache.get(self.csv_file)
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as message_file:
+            message_file.write("full")
+        result = validation.FileResult("2020/a.csv", "2020", False, "short", full_message_path=message_file.name)
+        result_cache.put(self.csv_file, digest, result)
+        result.discard_full_message()
+
+        # Each result that is read back has its own copy of the message, which it removes once it has been reported.
+        for _ in range(2):
+            result, _ = result_cache.get(self.csv_file)
+            self.assertIsNotNone(result.full_message_path)
+            self.assertEqual("full", result.full_message)
+            result.discard_full_message()
+
+        # The file is removed once the result has a short message instead.
+        result_cache.put(self.csv_file, digest, validation.FileResult("2020/a.csv", "2020", False, "short", "full"))
+        result, _ = result_cache.get(self.csv_file)
+        self.assertEqual((None, "full"), (result.full_message_path, result.full_message))
+        message_dir = next(x for x in os.listdir(self.cache_dir.name) if x.endswith(".messages"))
+        self.assertEqual([], os.listdir(os.path.join(self.cache_dir.name, message_dir)))
+
+    def test_errors(self):
+        result_cache = self.get_cache()
+        _, digest = result_cache.get(self.csv_file)
+        result = validation.FileResult("2020/a.csv", "2020", False, error=ValueError())
+        result_cache.put(self.csv_file, digest, result)
+        self.assertIsNone(result_cache.get(self.csv_file)[0])
+
+        # A file that has been removed since it was validated isn't cached.
+        result = validation.FileResult("2020/b.csv", "2020", True)
+        result_cache.put(os.path.join(self.root_dir.name, "2020", "b.csv"), digest, result)
+
+        # Files that can't be read are cache misses, so that validating them reports the error.
+        directory = os.path.join(self.root_dir.name, "2020", "b.csv")
+        os.mkdir(directory)
+        self.assertEqual((None, None), result_cache.get(directory))
+        os.remove(self.csv_file)
+        self.assertEqual((None, None), result_cache.get(self.csv_file))
+
+    def test_evict(self):
+        result_cache = self.get_cache()
+        self.put(result_cache)
+        os.remove(self.csv_file)
+        result_cache.evict()
+
+        with open(self.csv_file, "w") as csv_file:
+            csv_file.write("county,votes\na,1\n")
+        self.assertIsNone(result_cache.get(self.csv_file)[0])
+
+    def test_fingerprint(self):
+        result_cache = self.get_cache("a")
+        self.put(result_cache)
+        result_cache.close()
+
+        self.assertIsNone(self.get_cache("b").get(self.csv_file)[0])
+        self.assertNotEqual(cache.get_fingerprint(1), cache.get_fingerprint(2))
+
+        # A change to any module of the package, such as the one that decodes the files, changes the fingerprint.
+        with mock.patch("builtins.open", wraps=open) as mock_open:
+            cache.get_fingerprint(1)
+        paths = {os.path.basename(x.args[0]) for x in mock_open.call_args_list}
+        self.assertLessEqual({"decoding.py", "format_tests.py", "row_plans.py", "validation.py"}, paths)
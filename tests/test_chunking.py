@@ -0,0 +1,92 @@
+import csv
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from format_tests import chunking, columnar, validation
+
+
+class ChunkingTest(unittest.TestCase):
+    rows = [
+        ["county", "precinct", "office", "votes"],
+        ["a", "b", "c", "1"],
+        ["a ", "b\nc", "c", "1.5"],
+        ["a", 'b "c"', '"d', "2"],
+        [],
+        ["a", "b", "c"],
+        ["a\r\nb", "", "c\n\nd", "3"],
+        ["a\t", "b  c", "c", "4.0"],
+        ['"', '""\n', "c,d", "5"],
+    ]
+
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.data_dir.name, "2020", "a.csv")
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(self.rows[0])
+            # Chunks of clean rows are skipped by the prefilter, and failures past the first 100 are spilled to disk.
+            writer.writerows([self.rows[1]] * 200)
+            for index in range(150):
+                writer.writerows(self.rows[1:])
+            # Quotes in the middle of an entry are taken literally, and don't start a quoted entry.
+            csv_file.write('a,b"\n,c",d"e,6\n' * 20)
+            csv_file.write('a,b"\n,"c\nd",7\n' * 20)
+
+    def tearDown(self):
+        self.data_dir.cleanup()
+
+    def test_get_chunks(self):
+        with open(self.path, "r", newline="") as csv_file:
+            expected_rows = list(csv.reader(csv_file))
+
+        with open(self.path, "rb") as csv_file:
+            data = csv_file.read()
+        for chunk_size, block_size in [(1, 1), (7, 16), (64, 1 << 18), (1000, 1), (1000, 1 << 18), (len(data), 1)]:
+            with mock.patch.object(chunking, "block_size", block_size):
+                chunks = chunking.get_chunks(self.path, chunk_size)
+            self.assertEqual(0, chunks[0][0])
+            self.assertEqual(len(data), chunks[-1][1])
+            self.assertEqual([x[1] for x in chunks[:-1]], [x[0] for x in chunks[1:]])
+            self.assertTrue(all(x[0] < x[1] and data[x[1] - 1:x[1]] == b"\n" for x in chunks[:-1]))
+
+            rows = []
+            for start, end in chunks:
+                rows.extend(csv.reader(data[start:end].decode().splitlines(keepends=True)))
+            self.assertEqual(expected_rows, rows)
+
+        self.assertGreater(len(chunking.get_chunks(self.path, 64)), 10)
+
+    def test_quoted_entries(self):
+        # When every quote opens or closes an entry, or is doubled inside one, the quotes are only counted.
+        with open(self.path, "w", newline="") as csv_file:
+            csv.writer(csv_file, quoting=csv.QUOTE_ALL).writerows(self.rows * 100)
+        with open(self.path, "r", newline="") as csv_file:
+            expected_rows = list(csv.reader(csv_file))
+
+        with open(self.path, "rb") as csv_file:
+            data = csv_file.read()
+        with mock.patch.object(chunking, "_scan_quotes", side_effect=AssertionError):
+            chunks = chunking.get_chunks(self.path, 100)
+        self.assertGreater(len(chunks), 10)
+
+        rows = []
+        for start, end in chunks:
+            rows.extend(csv.reader(data[start:end].decode().splitlines(keepends=True)))
+        self.assertEqual(expected_rows, rows)
+
+    def test_validate_files(self):
+        for engine in ["python", "columnar"] if columnar.is_available() else ["python"]:
+            options = validation.ValidationOptions(max_examples=3, engine=engine)
+            expected_result = validation.validate_file(self.path, self.data_dir.name, options)
+            self.assertFalse(expected_result.passed)
+            self.assertRegex(expected_result.full_message, r"There are 150 rows that have entries with tab")
+
+            for split_size in [64, 500, 1 << 20]:
+                result = next(validation.validate_files([self.path], self.data_dir.name, options, 2, None,
+                                                        split_size=split_size))
+                self.assertEqual(expected_result.full_message, result.full_message)
+                self.assertEqual(expected_result.short_message, result.short_message)
+                self.assertEqual(expected_result.tests, result.tests)
@@ -0,0 +1,84 @@
+import csv
+import os
+import random
+import tempfile
+import unittest
+
+from format_tests import columnar, format_tests, validation
+
+
+class UppercaseEntries(format_tests.ValueTest):
+    @property
+    def description(self):
+        return "uppercase characters"
+
+    def is_bad_value(self, value):
+        return value != value.lower()
+
+
+@unittest.skipUnless(columnar.is_available(), "NumPy isn't installed")
+class ColumnarEngineTest(unittest.TestCase):
+    headers = ["county", "precinct", "office", "district", "party", "candidate", "votes", "absentee", "election_day"]
+    values = ["", " ", "a", "a b", "a  b", " a", "a ", "a\tb", "a\nb", "　", "a ", "-", "%", "\x00", "a\x00 ",
+              "1", "-1", "+2", "1.0", "1.5", "-0.01", "1e3", "1e-3", "*", "x", "1_000", " 3 ", "٣", "²",
+              "9" * 400, "inf", "nan", "Turnout %", "PCT", "Percent", "Smith"]
+
+    def setUp(self):
+        self.chunk_size = columnar.chunk_size
+        columnar.chunk_size = 7
+        self.data_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        columnar.chunk_size = self.chunk_size
+        self.data_dir.cleanup()
+
+    def create_file(self, name, rows):
+        path = os.path.join(self.data_dir.name, "2020", name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", newline="") as csv_file:
+            csv.writer(csv_file).writerows(rows)
+        return path
+
+    def get_random_rows(self, seed, count):
+        generator = random.Random(seed)
+        rows = []
+        for _ in range(count):
+            row_length = generator.choice([len(self.headers)] * 8 + [0, 1, len(self.headers) + 1])
+            rows.append([generator.choice(self.values) for _ in range(row_length)])
+        return rows
+
+    def assertSameResult(self, csv_file):
+        results = []
+        for engine in validation.ValidationOptions.engines:
+            options = validation.ValidationOptions(max_examples=3, engine=engine)
+            result = validation.validate_file(csv_file, self.data_dir.name, options)
+            results.append((result.passed, result.short_message, result.full_message))
+        self.assertEqual(results[0], results[1])
+
+    def test_good_file(self):
+        rows = [self.headers, ["a", "b", "c", "1", "d", "e", "1", "2", "3"]]
+        self.assertSameResult(self.create_file("good.csv", rows))
+
+    def test_header_only(self):
+        self.assertSameResult(self.create_file("header.csv", [self.headers]))
+
+    def test_random_files(self):
+        for seed in range(20):
+            rows = [self.headers] + self.get_random_rows(seed, 50)
+            self.assertSameResult(self.create_file(f"random_{seed}.csv", rows))
+
+    def test_other_tests(self):
+        rows = [self.headers] + self.get_random_rows(0, 100)
+
+        results = []
+        for scan in [self.scan_rows, columnar.scan]:
+            tests = [format_tests.NonAlphanumericEntries(), UppercaseEntries()]
+            scan(rows, tests, self.headers)
+            results.append([x.get_failure_message() for x in tests])
+        self.assertEqual(results[0], results[1])
+
+    @staticmethod
+    def scan_rows(rows, tests, _):
+        for row in rows:
+            for test in tests:
+                test.test(row)
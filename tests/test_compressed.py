@@ -0,0 +1,67 @@
+import bz2
+import gzip
+import lzma
+import os
+import tempfile
+import unittest
+import zipfile
+
+from format_tests import compressed, discovery, validation
+
+
+class CompressedTest(unittest.TestCase):
+    contents = "county,votes\na ,1\nb,2.5\n"
+
+    def setUp(self):
+        self.root_dir = tempfile.TemporaryDirectory()
+        self.root_path = self.root_dir.name
+        self.year_path = os.path.join(self.root_path, "2020")
+        os.mkdir(self.year_path)
+
+        self.write("a.csv", self.contents.encode())
+        self.write("b.csv.gz", gzip.compress(self.contents.encode()))
+        self.write("c.csv.bz2", bz2.compress(self.contents.encode()))
+        self.write("d.CSV.XZ", lzma.compress(self.contents.encode()))
+        self.write("e.csv.zst", b"")
+        self.write("g.zip", b"not an archive")
+        with zipfile.ZipFile(os.path.join(self.year_path, "f.zip"), "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("counties/x.csv", self.contents)
+            archive.writestr("y.csv", "county,votes\na,1\n")
+            archive.writestr("z.txt", "")
+            archive.writestr(".hidden/w.csv", "")
+
+    def tearDown(self):
+        self.root_dir.cleanup()
+
+    def write(self, name, data):
+        with open(os.path.join(self.year_path, name), "wb") as csv_file:
+            csv_file.write(data)
+
+    def get_short_paths(self, csv_files):
+        return [os.path.relpath(x, self.root_path).replace(os.sep, "/") for x in csv_files]
+
+    def test_discovery(self):
+        csv_files = list(discovery.iter_csv_files(self.root_path))
+        self.assertEqual(["2020/a.csv", "2020/b.csv.gz", "2020/c.csv.bz2", "2020/d.CSV.XZ", "2020/f.zip/counties/x.csv",
+                          "2020/f.zip/y.csv", "2020/g.zip"], self.get_short_paths(csv_files))
+        ignore_patterns = ["counties", "*.gz", "*.bz2", "*.XZ", "g.zip"]
+        self.assertEqual(["2020/a.csv", "2020/f.zip/y.csv"],
+                         self.get_short_paths(discovery.iter_csv_files(self.root_path, ignore_patterns)))
+
+        member = os.path.join(self.year_path, "f.zip", "counties", "x.csv")
+        self.assertEqual((os.path.join(self.year_path, "f.zip"), "counties/x.csv"), compressed.split_member(member))
+        self.assertEqual((csv_files[1], None), compressed.split_member(csv_files[1]))
+        self.assertEqual([False, True, True, True, True, True, True], [compressed.is_compressed(x) for x in csv_files])
+
+    def test_validate_files(self):
+        csv_files = list(discovery.iter_csv_files(self.root_path))
+        for prefetch_depth in [0, 2]:
+            results = list(validation.validate_files(csv_files, self.root_path, validation.ValidationOptions(), 1,
+                                                     None, prefetch_depth))
+            self.assertEqual(self.get_short_paths(csv_files), [x.short_path.replace(os.sep, "/") for x in results])
+
+            expected_message = results[0].full_message
+            self.assertRegex(expected_message, "leading or trailing whitespace")
+            self.assertEqual([expected_message] * 5, [x.full_message for x in results[:5]])
+            self.assertTrue(results[5].passed)
+            self.assertIsInstance(results[6].error, zipfile.BadZipFile)
@@ -0,0 +1,71 @@
+import codecs
+import os
+import tempfile
+import unittest
+
+from format_tests import decoding, validation
+
+
+class SniffTest(unittest.TestCase):
+    text = "county,votes\nSão Tomé,1\n"
+
+    def test_boms(self):
+        self.assertEqual("utf-8-sig", decoding.sniff(codecs.BOM_UTF8 + self.text.encode()))
+        self.assertEqual("utf-16", decoding.sniff(self.text.encode("utf-16")))
+        self.assertEqual("utf-32", decoding.sniff(self.text.encode("utf-32")))
+
+    def test_text(self):
+        self.assertEqual("utf-8", decoding.sniff(self.text.encode()))
+        self.assertEqual("utf-8", decoding.sniff(self.text.encode("latin-1")))
+        self.assertEqual("utf-8", decoding.sniff(b""))
+        self.assertEqual("utf-8", decoding.sniff(b"votes\r\nx\x0b"))
+        self.assertEqual("utf-16-le", decoding.sniff(self.text.encode("utf-16-le")))
+        self.assertEqual("utf-16-be", decoding.sniff(self.text.encode("utf-16-be")))
+
+    def test_binary(self):
+        blocks = {
+            "ZIP archive": b"PK\x03\x04\x14\x00\x06\x00",
+            "PDF document": b"%PDF-1.7\n",
+            "HTML page": b"<!DOCTYPE html>\n<html>",
+            "binary data": bytes(range(256)),
+        }
+        for description, block in blocks.items():
+            with self.assertRaisesRegex(decoding.BinaryFileError, description):
+                decoding.sniff(block)
+
+
+class ValidateFileTest(unittest.TestCase):
+    def setUp(self):
+        self.root_dir = tempfile.TemporaryDirectory()
+        os.mkdir(os.path.join(self.root_dir.name, "2020"))
+
+    def tearDown(self):
+        self.root_dir.cleanup()
+
+    def validate(self, data):
+        path = os.path.join(self.root_dir.name, "2020", "a.csv")
+        with open(path, "wb") as csv_file:
+            csv_file.write(data)
+
+        results = list(validation.validate_files([path, path], self.root_dir.name, validation.ValidationOptions()))
+        self.assertEqual(results[0].error is None, results[1].error is None)
+        return results[0]
+
+    def test_encodings(self):
+        text = "county,votes\nSão Tomé,1\n"
+        for data in [text.encode(), codecs.BOM_UTF8 + text.encode(), text.encode("utf-16")]:
+            result = self.validate(data)
+            self.assertTrue(result.passed, result.full_message)
+
+    def test_encoding_errors(self):
+        result = self.validate("county,votes\nSão Tomé,1\nLisboa,2\nBragança,3\n".encode("latin-1"))
+        self.assertIsNone(result.error)
+        self.assertFalse(result.passed)
+        self.assertEqual(["EncodingErrors"], [x["name"] for x in result.tests if not x["passed"]])
+        self.assertRegex(result.full_message, r"There are 2 rows.*encoding of the file")
+        self.assertNotRegex(result.full_message, "Row 3")
+
+    def test_binary_file(self):
+        result = self.validate(b"PK\x03\x04" + bytes(range(256)))
+        self.assertIsInstance(result.error, decoding.BinaryFileError)
+        self.assertEqual("2020/a.csv is a ZIP archive, such as an XLSX workbook, not a CSV file.", str(result.error))
@@ -0,0 +1,85 @@
+import glob
+import os
+import tempfile
+import unittest
+
+from format_tests import discovery
+
+
+class IterCsvFilesTest(unittest.TestCase):
+    paths = ["2018/a.csv", "2018/a-b.csv", "2018/a/c.csv", "2018/a/d.CSV", "2018/a/e.txt", "2018/archive/f.csv",
+             "2018/.hidden/g.csv", "2018/.h.csv", "2019/counties/archive/h.csv", "2019/counties/i.csv", "201/j.csv",
+             "20190/k.csv", "notes/l.csv", "m.csv"]
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.root_dir = tempfile.TemporaryDirectory()
+        self.root_path = self.root_dir.name
+        for path in self.paths:
+            self.write(path)
+
+        self.scandir = os.scandir
+        self.listed_directories = []
+
+    def tearDown(self):
+        os.scandir = self.scandir
+        self.cache_dir.cleanup()
+        self.root_dir.cleanup()
+
+    def write(self, path):
+        path = os.path.join(self.root_path, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write("county,votes\n")
+
+    def record_listings(self):
+        def scandir(path):
+            self.listed_directories.append(os.path.relpath(path, self.root_path))
+            return self.scandir(path)
+
+        os.scandir = scandir
+
+    def get_files(self, *args, **kwargs):
+        files = discovery.iter_csv_files(self.root_path, *args, **kwargs)
+        return [os.path.relpath(x, self.root_path).replace(os.sep, "/") for x in files]
+
+    def test_same_as_glob(self):
+        files = []
+        for file in glob.glob(os.path.join(self.root_path, "[0-9]" * 4, "**", "*"), recursive=True):
+            if file.lower().endswith(".csv"):
+                files.append(file)
+        expected_files = [x.replace(os.sep, "/") for x in sorted(os.path.relpath(x, self.root_path) for x in files)]
+
+        self.assertEqual(expected_files, self.get_files())
+
+    def test_ignore_patterns(self):
+        self.assertEqual(["2018/a-b.csv", "2018/a.csv", "2018/a/c.csv", "2018/a/d.CSV", "2019/counties/i.csv"],
+                         self.get_files(["archive"]))
+        self.assertEqual(["2018/a-b.csv", "2018/a.csv", "2018/archive/f.csv"], self.get_files(["2018/a", "2019"]))
+        self.assertEqual(["2018/a/c.csv", "2018/a/d.CSV", "2018/archive/f.csv", "2019/counties/archive/h.csv",
+                          "2019/counties/i.csv"], self.get_files(["a*.csv"]))
+
+        self.assertTrue(discovery.is_ignored("2019/counties/archive/h.csv", ["archive"]))
+        self.assertTrue(discovery.is_ignored("2019/counties/i.csv", ["2019/c*"]))
+        self.assertFalse(discovery.is_ignored("2019/counties/i.csv", ["counties/i.csv"]))
+
+    def test_manifest(self):
+        manifest_path = os.path.join(self.cache_dir.name, "manifest.json")
+        expected_files = self.get_files()
+        self.assertEqual(expected_files, self.get_files(manifest_path=manifest_path))
+
+        self.record_listings()
+        self.assertEqual(expected_files, self.get_files(manifest_path=manifest_path))
+        self.assertEqual([], self.listed_directories)
+
+        self.write("2019/counties/n.csv")
+        os.remove(os.path.join(self.root_path, "2018/a/c.csv"))
+        expected_files = self.get_files()
+        self.listed_directories.clear()
+        self.assertEqual(expected_files, self.get_files(manifest_path=manifest_path))
+        self.assertEqual(["2018/a", "2019/counties"], sorted(self.listed_directories))
+
+        # The manifest isn't reused with other ignore patterns.
+        self.listed_directories.clear()
+        self.assertEqual(self.get_files(["archive"]), self.get_files(["archive"], manifest_path))
+        self.assertIn(".", self.listed_directories)
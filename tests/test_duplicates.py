@@ -0,0 +1,133 @@
+import csv
+import os
+import random
+import tempfile
+import unittest
+
+from format_tests import duplicates, format_tests, validation
+
+
+class BloomFilterTest(unittest.TestCase):
+    def test_add(self):
+        bloom_filter = duplicates.BloomFilter(1 << 16)
+        digests = [random.getrandbits(64) - (1 << 63) for _ in range(10000)]
+        self.assertLess(sum(bloom_filter.add(x) for x in digests), 100)
+        self.assertTrue(all(bloom_filter.add(x) for x in digests))
+
+        bloom_filter.clear()
+        self.assertFalse(bloom_filter.add(digests[0]))
+
+
+class DuplicateIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.duplicate_index = duplicates.DuplicateIndex(size=1 << 10)
+
+    def tearDown(self):
+        self.duplicate_index.close()
+
+    def test_add(self):
+        rows = [(2, (10, 1)), (3, (11, 1)), (4, (10, 1))]
+        self.assertEqual([(4, "2020/a.csv", 2)], list(self.duplicate_index.add("2020", "2020/a.csv", rows)))
+        rows = [(2, (11, 1)), (3, (-12, 1)), (5, (-12, 1))]
+        self.assertEqual([(2, "2020/a.csv", 3), (5, "2020/b.csv", 3)],
+                         list(self.duplicate_index.add("2020", "2020/b.csv", rows)))
+
+        # Digests that only share their first half are different.
+        self.assertEqual([], list(self.duplicate_index.add("2020", "2020/c.csv", [(2, (10, 2)), (3, (-12, -1))])))
+
+        # Only the files of the same year are compared.
+        self.assertEqual([], list(self.duplicate_index.add("2021", "2021/d.csv", [(2, (10, 1)), (3, (11, 1))])))
+
+    def test_batches(self):
+        # Most of the digests have been written to the database by the time they are seen again.
+        batch_size = duplicates.DuplicateIndex.batch_size
+        duplicates.DuplicateIndex.batch_size = 100
+        try:
+            digests = [(random.getrandbits(64) - (1 << 63), random.getrandbits(64) - (1 << 63)) for _ in range(1000)]
+            rows = list(enumerate(digests + digests[::-1], start=1))
+            found = list(self.duplicate_index.add("2020", "2020/a.csv", rows))
+        finally:
+            duplicates.DuplicateIndex.batch_size = batch_size
+        self.assertEqual([(len(rows) + 1 - x, "2020/a.csv", x) for x in range(len(digests), 0, -1)], found)
+
+
+class DuplicateRowsTest(unittest.TestCase):
+    def get_digests(self, headers, rows):
+        test = format_tests.DuplicateRows(headers)
+        for row in [headers] + rows:
+            test.test(row)
+        digests = list(test.iter_digests())
+        test.discard_digests()
+        return digests
+
+    def test_digests(self):
+        digests = self.get_digests(["county", "votes"], [["a", "1"], [" a ", "1"], ["", " "], ["county", "votes"],
+                                                         ["a", "1", "2"]])
+        self.assertEqual([2, 3, 6], [x for x, _ in digests])
+        self.assertEqual(digests[0][1], digests[1][1])
+        self.assertNotEqual(digests[0][1], digests[2][1])
+
+        # The columns are matched up by header.
+        self.assertEqual(digests[0][1], self.get_digests(["Votes", "County"], [["1", "a"]])[0][1])
+        self.assertNotEqual(digests[0][1], self.get_digests(["county", "precinct"], [["a", "1"]])[0][1])
+
+    def test_spill(self):
+        max_digests_in_memory = format_tests.DuplicateRows.max_digests_in_memory
+        format_tests.DuplicateRows.max_digests_in_memory = 10
+        try:
+            rows = [[str(x), "1"] for x in range(25)]
+            digests = self.get_digests(["county", "votes"], rows)
+
+            first_test = format_tests.DuplicateRows(["county", "votes"])
+            second_test = format_tests.DuplicateRows(["county", "votes"])
+            for row in [["county", "votes"]] + rows[:12]:
+                first_test.test(row)
+            for row in rows[12:]:
+                second_test.test(row)
+            first_test.merge(second_test, 13)
+            self.assertEqual(digests, list(first_test.iter_digests()))
+            first_test.discard_digests()
+        finally:
+            format_tests.DuplicateRows.max_digests_in_memory = max_digests_in_memory
+        self.assertEqual(25, len(digests))
+
+    def test_failure_message(self):
+        test = format_tests.DuplicateRows(["county", "votes"])
+        test.add_duplicate(5, "2020/a.csv", 2)
+        test.add_duplicate(7, "2020/b.csv", 3)
+        self.assertFalse(test.passed)
+        self.assertEqual("There are 2 rows that duplicate an earlier row:\n\n\tRow 5: duplicates row 2 of 2020/a.csv"
+                         "\n\t[Truncated to 1 examples]", test.get_failure_message(max_examples=1))
+
+
+class ValidateFilesTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.csv_files = []
+        for short_path, rows in [("2020/a.csv", [["county", "votes"], ["a", "1"], ["b", "2"], ["a", "1"]]),
+                                 ("2020/b.csv", [["Votes", "County"], ["2", "b"], ["3", "c"]]),
+                                 ("2021/c.csv", [["county", "votes"], ["a", "1"]])]:
+            csv_file = os.path.join(self.data_dir.name, short_path)
+            os.makedirs(os.path.dirname(csv_file), exist_ok=True)
+            with open(csv_file, "w", newline="") as csv_data:
+                csv.writer(csv_data).writerows(rows)
+            self.csv_files.append(csv_file)
+
+    def tearDown(self):
+        self.data_dir.cleanup()
+
+    def test_validate_files(self):
+        options = validation.ValidationOptions(tests=["DuplicateRows", "LowercaseHeaders"])
+        results = list(validation.validate_files(self.csv_files, self.data_dir.name, options))
+        self.assertEqual([False, False, True], [x.passed for x in results])
+        self.assertEqual([[4, ["2020/a.csv", 2]]], results[0].tests[0]["examples"])
+        self.assertEqual([[2, ["2020/a.csv", 3]]], results[1].tests[0]["examples"])
+
+        # The messages stay in the order of the tests.
+        self.assertEqual(["DuplicateRows", "LowercaseHeaders"], [x["name"] for x in results[1].tests])
+        self.assertEqual("\n\n* There are 1 rows that duplicate an earlier row:\n\n\tRow 2: duplicates row 3 of "
+                         "2020/a.csv\n\n* Header ['Votes', 'County'] should only contain lowercase characters.",
+                         results[1].short_message)
+        self.assertTrue(results[1].full_message.startswith("* Header"))
+        self.assertTrue(results[1].full_message.endswith("\n\n* There are 1 rows that duplicate an earlier row:\n\n"
+                                                         "\tRow 2: duplicates row 3 of 2020/a.csv"))
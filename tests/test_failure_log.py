@@ -0,0 +1,49 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from format_tests import failure_log
+
+
+class FailureLogTest(unittest.TestCase):
+    expected_contents = "======================================================================\n" \
+                        "FAIL: a\n" \
+                        "----------------------------------------------------------------------\n" \
+                        "* b\n\n" \
+                        "======================================================================\n" \
+                        "FAIL: c\n" \
+                        "----------------------------------------------------------------------\n" \
+                        "* d\n\tRow 2: ['é']\n\n"
+
+    def setUp(self):
+        self.log_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.log_dir.cleanup()
+
+    def write(self, name):
+        path = os.path.join(self.log_dir.name, name)
+        log = failure_log.FailureLog(path)
+        log.write_failure("a", "* b")
+        log.close()
+
+        # The log is appended to.
+        log = failure_log.FailureLog(path)
+        log.write_failure("c", iter(["* d", "\n\tRow 2: ['é']"]))
+        log.close()
+        return path
+
+    def test_plain(self):
+        with open(self.write("log.txt"), "r", encoding="utf-8") as log_file:
+            self.assertEqual(self.expected_contents, log_file.read())
+
+    def test_gzip(self):
+        with gzip.open(self.write("log.txt.gz"), "rt", encoding="utf-8") as log_file:
+            self.assertEqual(self.expected_contents, log_file.read())
+
+    @unittest.skipUnless(failure_log.zstandard is not None, "zstandard isn't installed")
+    def test_zstandard(self):
+        with open(self.write("log.txt.zst"), "rb") as log_file:
+            data = failure_log.zstandard.ZstdDecompressor().stream_reader(log_file, read_across_frames=True).read()
+        self.assertEqual(self.expected_contents, data.decode("utf-8"))
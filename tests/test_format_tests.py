@@ -1,11 +1,13 @@
 import csv
+import json
 import os
+import pickle
 import re
 import subprocess
 import tempfile
 import unittest
 
-from format_tests import format_tests
+from format_tests import columnar, format_tests
 
 
 class ConsecutiveSpacesTest(unittest.TestCase):
@@ -86,6 +88,76 @@ class EmptyRowsTest(unittest.TestCase):
         self.assertRegex(failure_message, "2 empty rows")
 
 
+class FailureStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.max_examples_in_memory = format_tests.FailureStore.max_examples_in_memory
+        format_tests.FailureStore.max_examples_in_memory = 2
+
+    def tearDown(self):
+        format_tests.FailureStore.max_examples_in_memory = self.max_examples_in_memory
+
+    def test_empty(self):
+        failure_store = format_tests.FailureStore()
+        self.assertEqual(0, len(failure_store))
+        self.assertEqual([], list(failure_store))
+
+    def test_add(self):
+        failures = [(1, ["a", "b"]), (3, ["c", 1]), (4, ["d\n", "\udcff"]), (7, [])]
+
+        failure_store = format_tests.FailureStore()
+        for row_number, row in failures:
+            failure_store.add(row_number, row)
+            failure_store.add(row_number, row)
+        self.assertEqual(4, len(failure_store))
+        self.assertEqual(failures, list(failure_store))
+
+        # Stopping part of the way through the failures shouldn't affect the failures that are added later.
+        next(iter(failure_store))
+        for _ in zip(range(3), failure_store):
+            pass
+        failure_store.add(8, ["e"])
+        self.assertEqual(failures + [(8, ["e"])], list(failure_store))
+
+    def test_pickle(self):
+        failures = [(x, [f"row {x}"]) for x in range(10)]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            tempfile.tempdir = temp_dir
+            try:
+                failure_store = format_tests.FailureStore()
+                for row_number, row in failures:
+                    failure_store.add(row_number, row)
+            finally:
+                tempfile.tempdir = None
+            self.assertEqual(1, len(os.listdir(temp_dir)))
+
+            # The failures that were written to the file aren't read back, but the file is handed over to the copy.
+            state = pickle.dumps(failure_store)
+            self.assertIn(b"row 1", state)
+            self.assertNotIn(b"row 2", state)
+            del failure_store
+            copy = pickle.loads(state)
+            self.assertEqual(10, len(copy))
+            self.assertEqual(failures, list(copy))
+            copy.add(10, ["row 10"])
+            self.assertEqual(failures + [(10, ["row 10"])], list(copy))
+
+            del copy
+            self.assertEqual([], os.listdir(temp_dir))
+
+    def test_failure_message(self):
+        rows = [["a", f"b{'  ' * (i % 2)}", "c"] for i in range(10)]
+
+        format_test = format_tests.ConsecutiveSpaces()
+        for row in rows:
+            format_test.test(row)
+
+        failure_message = format_test.get_failure_message()
+        self.assertRegex(failure_message, "5 rows.*consecutive whitespace")
+        for i in range(1, 10, 2):
+            self.assertRegex(failure_message, f"Row {i + 1}: " + re.escape(f"{rows[i]}"))
+        self.assertRegex(format_test.get_failure_message(3), "Row 6:.*\n.*Truncated to 3 examples")
+
+
 class InconsistentNumberOfColumnsTest(unittest.TestCase):
     def test_empty(self):
         format_test = format_tests.InconsistentNumberOfColumns(["a", "b", "c"])
@@ -273,6 +345,43 @@ class UnknownHeadersTest(unittest.TestCase):
         self.assertRegex(failure_message, f"Header.*" + re.escape(f"{bad_header}") + ".*unknown entries")
 
 
+class CompileRowRegexTest(unittest.TestCase):
+    value_test_classes = [
+        format_tests.ConsecutiveSpaces,
+        format_tests.LeadingAndTrailingSpaces,
+        format_tests.NonAlphanumericEntries,
+        format_tests.PrematureLineBreaks,
+        format_tests.TabCharacters,
+    ]
+
+    def test_missing_pattern(self):
+        self.assertIsNone(format_tests.compile_row_regex(self.value_test_classes + [format_tests.ValueTest]))
+
+    def test_row(self):
+        rows = [
+            ["a", "b", "c"],
+            ["a", "b  c", "d"],
+            [" a", "b", "c"],
+            ["a", "b", "c\n"],
+            ["a", "b\tc", "d"],
+            ["a", "-", "c"],
+            ["a", "", "c"],
+            ["a ", " b", "c"],
+            [],
+            [""],
+            ["%"],
+        ]
+
+        regex = format_tests.compile_row_regex(self.value_test_classes)
+        separator = format_tests.row_separator
+        for row in rows:
+            tests = [x() for x in self.value_test_classes]
+            for test in tests:
+                test.test(row)
+            joined_row = f"{separator}{separator.join(row)}{separator}"
+            self.assertEqual(not all(x.passed for x in tests), regex.search(joined_row) is not None, row)
+
+
 class WhitespaceInHeadersTest(unittest.TestCase):
     def test_empty(self):
         format_test = format_tests.WhitespaceInHeaders()
@@ -354,6 +463,18 @@ class RunTestsTest(unittest.TestCase):
         completed_process = subprocess.run(command, capture_output=True)
         return completed_process
 
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            def get_output(*args):
+                output = self.run_test(self.bad_data_dir.name, f"--cache-dir={cache_dir}", *args).stderr.decode()
+                return re.sub(r"Ran 1 test in .*s", "", output)
+
+            uncached_output = get_output("--no-cache")
+            self.assertEqual([], os.listdir(cache_dir))
+            self.assertEqual(uncached_output, get_output())
+            self.assertNotEqual([], os.listdir(cache_dir))
+            self.assertEqual(uncached_output, get_output())
+
     def test_group_failures(self):
         completed_process = self.run_test(self.bad_data_dir.name)
         ungrouped_output = completed_process.stderr.decode()
@@ -387,5 +508,178 @@ class RunTestsTest(unittest.TestCase):
         self.assertRegex(log_file_contents, "1 rows.*tab characters")
         self.assertNotRegex(log_file_contents, re.escape(f"{self.bad_rows[-1]}"))
 
+    def test_jobs(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            for year in ["2018", "2019", "2020"]:
+                RunTestsTest.create_data(data_dir, year, self.bad_rows)
+                RunTestsTest.create_data(os.path.join(data_dir, year), "counties", self.good_rows)
+                RunTestsTest.create_data(os.path.join(data_dir, year), "precincts", self.bad_rows)
+            # A file that can't be validated is reported with the same traceback by the workers.
+            with open(os.path.join(data_dir, "2019", "workbook.csv"), "wb") as workbook:
+                workbook.write(b"PK\x03\x04" + bytes(range(256)))
+
+            def get_output(*args):
+                output = self.run_test(data_dir, "--group-failures", *args).stderr.decode()
+                return re.sub(r"Ran 1 test in .*s", "", output)
+
+            serial_output = get_output()
+            self.assertIn("BinaryFileError: 2019/workbook.csv is a ZIP archive", serial_output)
+            self.assertIn("in validate_file", serial_output)
+            self.assertEqual(serial_output, get_output("--jobs=2"))
+            self.assertEqual(serial_output, get_output("--jobs=0"))
+
+    def test_changed_since(self):
+        # The data directory isn't a git checkout, which is reported as a usage error.
+        completed_process = self.run_test(self.good_data_dir.name, "--changed-since=main")
+        self.assertEqual(2, completed_process.returncode)
+        self.assertRegex(completed_process.stderr.decode(), "--changed-since: can't compare .* with main: ")
+
+    def test_only(self):
+        output = self.run_test(self.bad_data_dir.name, "--only=header").stderr.decode()
+        self.assertIn("should only contain lowercase characters", output)
+        self.assertNotIn("tab characters", output)
+
+        self.assertEqual(1, self.run_test(self.bad_data_dir.name, "--only=TabCharacters").returncode)
+        self.assertEqual(0, self.run_test(self.good_data_dir.name, "--only=NonAlphanumericEntries").returncode)
+        self.assertEqual(2, self.run_test(self.good_data_dir.name, "--only=MissingHeaders").returncode)
+        self.assertEqual(2, self.run_test(self.good_data_dir.name, "--only=row", "--skip=row").returncode)
+
+        # DuplicateRows reads every row, so it can't stop early.
+        completed_process = self.run_test(self.good_data_dir.name, "--only=DuplicateRows", "--max-failures=1")
+        self.assertEqual(2, completed_process.returncode)
+        self.assertRegex(completed_process.stderr.decode(), "--max-failures can't be used with DuplicateRows")
+
+    def test_profile(self):
+        for engine in ["python", "columnar"] if columnar.is_available() else ["python"]:
+            output = self.run_test(self.bad_data_dir.name, "--profile", f"--engine={engine}").stderr.decode()
+            self.assertRegex(output, r"1 files \(0 cached\), 10 rows")
+            self.assertRegex(output, r"Slowest steps and tests:(\n\t.*s  \w+)+")
+            self.assertRegex(output, rf"Slowest files:\n\t.*s  {self.year}/.*\.csv \(10 rows\)")
+
+            profile_path = f"{self.log_file.name}.profile.json"
+            with open(profile_path, "r") as profile_file:
+                profile = json.load(profile_file)
+            os.remove(profile_path)
+
+            self.assertEqual(10, profile["rows"])
+            self.assertIn("NonIntegerVotes", profile["timings"])
+            self.assertIn("LowercaseHeaders", profile["timings"])
+            self.assertIn("TabCharacters", profile["file_profiles"][0]["timings"])
+            self.assertIn("UnknownHeaders", profile["file_profiles"][0]["timings"])
+
+    def test_roots(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            roots_file = os.path.join(data_dir, "roots.txt")
+            with open(roots_file, "w") as roots:
+                roots.write(f"# Good and bad data\n{self.good_data_dir.name}\n\n")
+
+            completed_process = self.run_test(self.bad_data_dir.name, "--group-failures", f"--roots-file={roots_file}")
+            output = completed_process.stderr.decode()
+            bad_name = os.path.basename(self.bad_data_dir.name)
+            self.assertEqual(1, completed_process.returncode)
+            self.assertRegex(output, rf"::group::{bad_name}/{self.year}\n(.|\n)*\[{bad_name}/{self.year}/.*\.csv\]")
+            self.assertEqual(1, output.count("::group::"))
+
+            self.assertEqual(2, self.run_test(self.bad_data_dir.name, self.bad_data_dir.name).returncode)
+            completed_process = self.run_test(self.bad_data_dir.name, "--watch", self.good_data_dir.name)
+            self.assertEqual(2, completed_process.returncode)
+            self.assertRegex(completed_process.stderr.decode(), "--watch requires a single root_path")
+
+    def test_watch_options(self):
+        # The options that only apply to a full run are rejected, rather than ignored.
+        completed_process = self.run_test(self.bad_data_dir.name, "--watch", "--jobs=2", "--split-size=1")
+        self.assertEqual(2, completed_process.returncode)
+        self.assertRegex(completed_process.stderr.decode(), "--watch can't be used with --jobs, .*--split-size")
+
+        # The root path can follow --watch.
+        completed_process = self.run_test(self.bad_data_dir.name, "--jobs=2", "--watch-interval=0.5", "--watch")
+        self.assertEqual(2, completed_process.returncode)
+        self.assertRegex(completed_process.stderr.decode(), "--watch can't be used with --jobs, --log-file\n")
+
+    def test_shards(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            for year in ["2018", "2019", "2020"]:
+                RunTestsTest.create_data(data_dir, year, self.bad_rows)
+                RunTestsTest.create_data(os.path.join(data_dir, year), "counties", self.good_rows)
+            with open(os.path.join(data_dir, "2019", "workbook.csv"), "wb") as workbook:
+                workbook.write(b"PK\x03\x04" + bytes(range(256)))
+
+            def get_output(*args):
+                completed_process = self.run_test(data_dir, "--group-failures", "--max-examples=1", *args)
+                return completed_process.returncode, re.sub(r"Ran 1 test in .*s", "", completed_process.stderr.decode())
+
+            results_files = [os.path.join(data_dir, f"{x}.jsonl") for x in range(1, 4)]
+            for index, results_file in enumerate(results_files):
+                get_output(f"--shard={index + 1}/3", f"--results={results_file}")
+
+            serial_output = get_output()
+            self.assertIn("Truncated to 1 examples", serial_output[1])
+            self.assertIn("BinaryFileError", serial_output[1])
+            self.assertEqual(serial_output, get_output("--merge", *results_files, "--"))
+            self.assertRegex(get_output("--max-examples=2", "--merge", *results_files, "--")[1],
+                             "written with --max-examples=1, not 2")
+            self.assertEqual(1, get_output("--merge", *results_files[:2], "--")[0])
+            self.assertEqual(2, get_output("--shard=4/3")[0])
+
     def test_success(self):
         self.assertEqual(0, self.run_test(self.good_data_dir.name).returncode)
+
+
+class CheckFilesTest(unittest.TestCase):
+    root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+    def run_check(self, data_dir, *args):
+        command = ["python", os.path.join(CheckFilesTest.root_path, "check_files.py"), f"--root={data_dir}"]
+        command.extend(args)
+        return subprocess.run(command, capture_output=True)
+
+    def test_check_files(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            RunTestsTest.create_data(data_dir, "2019", RunTestsTest.bad_rows)
+            RunTestsTest.create_data(data_dir, "2020", RunTestsTest.good_rows)
+            bad_file = os.path.join(data_dir, "2019", os.listdir(os.path.join(data_dir, "2019"))[0])
+            good_file = os.path.join(data_dir, "2020", os.listdir(os.path.join(data_dir, "2020"))[0])
+            other_file = os.path.join(data_dir, "README.md")
+            with open(other_file, "w") as readme:
+                readme.write("Not a CSV file")
+
+            self.assertEqual(0, self.run_check(data_dir).returncode)
+            self.assertEqual(0, self.run_check(data_dir, good_file, other_file).returncode)
+
+            completed_process = self.run_check(data_dir, good_file, bad_file)
+            output = completed_process.stdout.decode()
+            self.assertEqual(1, completed_process.returncode)
+            self.assertIn(f"{os.path.relpath(bad_file, data_dir)}: failed", output)
+            self.assertNotIn(os.path.relpath(good_file, data_dir), output)
+            self.assertIn("1 of 2 files failed", output)
+
+            self.assertEqual(0, self.run_check(data_dir, "--ignore=2019", bad_file).returncode)
+
+    def test_imports(self):
+        # The entry point is run on each commit, so it mustn't import the modules that are slow to import and only
+        # needed by run_tests.py.
+        slow_modules = ["format_tests.cache", "format_tests.chunking", "format_tests.columnar",
+                        "format_tests.profiling", "format_tests.reports", "format_tests.sharding", "hashlib", "json",
+                        "multiprocessing", "numpy", "sqlite3", "subprocess", "tempfile", "unittest", "zipfile"]
+        code = "import check_files, sys; print(' '.join(sys.modules))"
+        output = subprocess.run(["python", "-c", code], capture_output=True, cwd=CheckFilesTest.root_path).stdout
+        modules = output.decode().split()
+        self.assertIn("format_tests.validation", modules)
+        for module in slow_modules + ["shutil"]:
+            self.assertNotIn(module, modules)
+
+        # Nor does validating a clean file import them.  argparse imports shutil to find the width of the terminal.
+        with tempfile.TemporaryDirectory() as data_dir:
+            RunTestsTest.create_data(data_dir, "2020", RunTestsTest.good_rows)
+            good_file = os.path.join(data_dir, "2020", os.listdir(os.path.join(data_dir, "2020"))[0])
+            code = ("import runpy, sys\n"
+                    f"sys.argv = ['check_files.py', '--root={data_dir}', '{good_file}']\n"
+                    "runpy.run_path('check_files.py', run_name='__main__')\n"
+                    "print(' '.join(sys.modules))")
+            completed_process = subprocess.run(["python", "-c", code], capture_output=True,
+                                               cwd=CheckFilesTest.root_path)
+        self.assertEqual(b"", completed_process.stderr)
+        modules = completed_process.stdout.decode().split()
+        self.assertIn("format_tests.row_plans", modules)
+        for module in slow_modules:
+            self.assertNotIn(module, modules)
@@ -0,0 +1,90 @@
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+from format_tests import columnar, format_tests, memory, reports, validation
+
+
+class MemoryTest(unittest.TestCase):
+    def tearDown(self):
+        memory.check(None)
+
+    def test_check(self):
+        self.assertGreater(memory.get_rss(), 0)
+        self.assertFalse(memory.check(None))
+        self.assertTrue(memory.check(1))
+        self.assertTrue(memory.is_low())
+        self.assertFalse(memory.check(1 << 50))
+        self.assertFalse(memory.is_low())
+
+    def test_process_limit(self):
+        self.assertIsNone(memory.get_process_limit(None, 4))
+        self.assertEqual(1000, memory.get_process_limit(1000, 1))
+        self.assertEqual(200, memory.get_process_limit(1000, 4))
+
+    def test_failure_store(self):
+        failure_store = format_tests.FailureStore()
+        failure_store.add(1, ["a"])
+        memory.check(1)
+        failure_store.add(2, ["b"])
+        memory.check(None)
+        failure_store.add(3, ["c"])
+        self.assertEqual(3, len(failure_store))
+        self.assertEqual([(1, ["a"]), (2, ["b"]), (3, ["c"])], list(failure_store))
+
+    def test_message_buffer(self):
+        memory.check(1)
+        message = validation.MessageBuffer()
+        message.write("a")
+        memory.check(None)
+        message.write("b")
+        text, path = message.get()
+        self.assertEqual("", text)
+        with open(path, "r", encoding="utf-8") as message_file:
+            self.assertEqual("ab", message_file.read())
+        os.remove(path)
+
+
+class ValidateFileTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.data_dir.name, "2020", "a.csv")
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "w") as csv_file:
+            csv_file.write("county,votes\n" + "a ,1.5\n" * 1000)
+
+    def tearDown(self):
+        memory.check(None)
+        tracemalloc.stop()
+        self.data_dir.cleanup()
+
+    def validate(self, **kwargs):
+        options = validation.ValidationOptions(max_examples=10, **kwargs)
+        return validation.validate_file(self.path, self.data_dir.name, options)
+
+    def test_low_memory(self):
+        expected_result = self.validate()
+        self.assertFalse(expected_result.low_memory)
+        self.assertIsNone(expected_result.peak_memory)
+
+        for engine in ["python", "columnar"] if columnar.is_available() else ["python"]:
+            result = self.validate(engine=engine, max_memory=1)
+            self.assertTrue(result.low_memory)
+            self.assertEqual(expected_result.tests, result.tests)
+            self.assertEqual(expected_result.full_message, result.full_message)
+            result.discard_full_message()
+
+    def test_track_memory(self):
+        result = self.validate(track_memory=True)
+        self.assertGreater(result.peak_memory, 0)
+
+        report_path = os.path.join(self.data_dir.name, "report.jsonl")
+        report = reports.get_report("jsonl", report_path)
+        report.write(result)
+        report.close()
+        with open(report_path, "r") as report_file:
+            record = json.load(report_file)
+        self.assertEqual(result.peak_memory, record["peak_memory"])
+        self.assertFalse(record["low_memory"])
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from format_tests import prefetch, validation
+
+
+class ReadAheadTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.files = []
+        for index in range(10):
+            path = os.path.join(self.data_dir.name, "2020", f"{index}.csv")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as csv_file:
+                csv_file.write("county,votes\n" + f"a,{index}\n" * (index + 1))
+            self.files.append(path)
+
+        self.read = prefetch._read
+        self.lock = threading.Lock()
+        self.read_files = []
+
+    def tearDown(self):
+        prefetch._read = self.read
+        self.data_dir.cleanup()
+
+    def record_reads(self):
+        def read(file):
+            with self.lock:
+                self.read_files.append(file)
+            return self.read(file)
+
+        prefetch._read = read
+
+    def test_order(self):
+        for depth in [1, 3, 20]:
+            contents = [(x, y) for x, y in prefetch.ReadAhead(self.files, depth, 1 << 20)]
+            self.assertEqual([(x, self.read(x)) for x in self.files], contents)
+
+    def test_limits(self):
+        self.record_reads()
+        sizes = [os.path.getsize(x) for x in self.files]
+        max_bytes = sizes[-1] + sizes[-2]
+
+        for index, (file, data) in enumerate(prefetch.ReadAhead(self.files, 3, max_bytes)):
+            self.assertEqual(self.files[index], file)
+            with self.lock:
+                read_ahead = self.read_files[index + 1:]
+            self.assertLessEqual(len(read_ahead), 3)
+            self.assertLessEqual(sum(sizes[index:index + 1 + len(read_ahead)]), max_bytes)
+
+    def test_large_and_missing_files(self):
+        self.record_reads()
+        files = self.files[:2] + [os.path.join(self.data_dir.name, "2020", "missing.csv")]
+        contents = list(prefetch.ReadAhead(files, 2, os.path.getsize(self.files[1]) - 1))
+        self.assertEqual([(files[0], self.read(files[0])), (files[1], None), (files[2], None)], contents)
+        self.assertEqual([files[0], files[2]], sorted(self.read_files))
+
+    def test_validate_files(self):
+        with open(self.files[3], "a") as csv_file:
+            csv_file.write("b ,1.5\n")
+        os.makedirs(os.path.join(self.data_dir.name, "2020", "directory.csv"))
+        files = self.files + [os.path.join(self.data_dir.name, "2020", "directory.csv")]
+
+        results = []
+        for depth in [0, 4]:
+            options = validation.ValidationOptions(max_examples=3)
+            results.append([(x.short_path, x.passed, x.full_message, type(x.error))
+                            for x in validation.validate_files(files, self.data_dir.name, options, 1, None, depth)])
+        self.assertEqual(results[0], results[1])
+        self.assertFalse(results[1][3][1])
+        self.assertIs(IsADirectoryError, results[1][-1][3])
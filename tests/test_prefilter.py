@@ -0,0 +1,94 @@
+import csv
+import os
+import random
+import tempfile
+import unittest
+
+from format_tests import format_tests, prefilter, validation
+
+
+class PrefilterTest(unittest.TestCase):
+    headers = ["county", "precinct", "candidate", "votes", "absentee"]
+    values = ["", " ", "a", "a b", "a  b", " a", "a ", "a\tb", "a\nb", "a\rb", "a\r\nb", "　", "a\xa0b", "é", "-",
+              "%", "a,b", 'a"b', "1", "-1", "+2", "1.0", "1.5", ".5", "5.", "1e3", "1_000", "٣", "9" * 400, "inf",
+              "-nan", "Infante", "Turnout %", "\x00", "\x1f"]
+
+    def setUp(self):
+        self.buffer_size = prefilter.buffer_size
+        prefilter.buffer_size = 64
+        self.data_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        prefilter.buffer_size = self.buffer_size
+        self.data_dir.cleanup()
+
+    def create_file(self, rows, line_terminator="\r\n"):
+        path = os.path.join(self.data_dir.name, "2020", "a.csv")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", newline="", encoding="utf-8") as csv_file:
+            csv.writer(csv_file, lineterminator=line_terminator).writerows(rows)
+        return path
+
+    def is_clean(self, path):
+        with open(path, "r") as csv_data:
+            headers = next(csv.reader(csv_data))
+        tests = [format_tests.ConsecutiveSpaces(), format_tests.EmptyRows(),
+                 format_tests.InconsistentNumberOfColumns(headers), format_tests.LeadingAndTrailingSpaces(),
+                 format_tests.NonIntegerVotes(headers), format_tests.PrematureLineBreaks(),
+                 format_tests.TabCharacters()]
+        return prefilter.is_clean(path, headers, tests)
+
+    def assertSameResult(self, path):
+        results = []
+        for use_prefilter in [False, True]:
+            options = validation.ValidationOptions(max_examples=3, profile=True, prefilter=use_prefilter)
+            result = validation.validate_file(path, self.data_dir.name, options)
+            results.append((result.passed, result.full_message, result.profile.rows))
+        self.assertEqual(results[0], results[1])
+
+    def test_clean_files(self):
+        rows = [self.headers] + [["Adams", f"Adams {x:03}", "Joseph R. Biden", str(x * 7), "+3"] for x in range(50)]
+        rows.append(["Dade", "Précinct 1", "-", "*", ""])
+        for line_terminator in ["\n", "\r\n"]:
+            path = self.create_file(rows, line_terminator)
+            self.assertTrue(self.is_clean(path))
+            self.assertSameResult(path)
+
+            with open(path, "rb+") as csv_file:
+                csv_file.truncate(os.path.getsize(path) - len(line_terminator))
+            self.assertTrue(self.is_clean(path))
+            self.assertSameResult(path)
+
+    def test_header_only(self):
+        path = self.create_file([self.headers])
+        self.assertTrue(self.is_clean(path))
+        self.assertSameResult(path)
+
+    def test_single_defect(self):
+        for value in self.values:
+            for index in range(len(self.headers)):
+                rows = [self.headers] + [["a", "b", "c", "1", "2"]] * 20
+                rows[15] = list(rows[15])
+                rows[15][index] = value
+                path = self.create_file(rows)
+                self.assertSameResult(path)
+                if self.is_clean(path):
+                    self.assertTrue(validation.validate_file(path, self.data_dir.name,
+                                                             validation.ValidationOptions(prefilter=False)).passed)
+
+    def test_random_files(self):
+        generator = random.Random(0)
+        for _ in range(50):
+            rows = [self.headers]
+            for _ in range(20):
+                row_length = generator.choice([len(self.headers)] * 20 + [0, 1, len(self.headers) + 1])
+                rows.append([generator.choice(["a", "b c", "1"] * 40 + self.values) for _ in range(row_length)])
+            path = self.create_file(rows, generator.choice(["\n", "\r\n"]))
+            self.assertSameResult(path)
+
+    def test_other_tests(self):
+        path = self.create_file([self.headers, ["a", "b", "c", "1", "2"]])
+        with open(path, "r") as csv_data:
+            headers = next(csv.reader(csv_data))
+        self.assertTrue(prefilter.is_clean(path, headers, [format_tests.TabCharacters()]))
+        self.assertFalse(prefilter.is_clean(path, headers, [format_tests.NonAlphanumericEntries()]))
@@ -0,0 +1,98 @@
+import csv
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from format_tests import decoding, format_tests, registry, validation
+
+
+class SelectTest(unittest.TestCase):
+    header_tests = ["EmptyHeaders", "LowercaseHeaders", "UnknownHeaders", "WhitespaceInHeaders"]
+
+    def test_default(self):
+        names = registry.select()
+        self.assertEqual(registry.get_default_names(), names)
+        self.assertNotIn("NonAlphanumericEntries", names)
+        self.assertIn("NonAlphanumericEntries", registry.get_names())
+
+    def test_only(self):
+        self.assertEqual(self.header_tests, registry.select(["header"]))
+        self.assertEqual(["NonAlphanumericEntries", "EmptyRows"],
+                         registry.select(["EmptyRows", "NonAlphanumericEntries"]))
+        self.assertNotIn("NonAlphanumericEntries", registry.select(["value"]))
+
+    def test_skip(self):
+        self.assertEqual(["EmptyRows", "InconsistentNumberOfColumns", "NonIntegerVotes"],
+                         registry.select(skip=["header", "value"]))
+        self.assertEqual(self.header_tests[1:], registry.select(["header"], ["EmptyHeaders"]))
+        self.assertEqual([], registry.select(["EmptyRows"], ["row"]))
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, registry.select, ["EmptyRow"])
+        self.assertRaises(ValueError, registry.select, None, ["values"])
+
+    def test_create_tests(self):
+        tests = registry.create_tests(registry.get_names(), ["row", "value"], ["county", "votes"])
+        self.assertEqual(["ConsecutiveSpaces", "EncodingErrors", "LeadingAndTrailingSpaces", "NonAlphanumericEntries",
+                          "PrematureLineBreaks", "TabCharacters", "EmptyRows", "InconsistentNumberOfColumns",
+                          "NonIntegerVotes", "DuplicateRows"], [type(x).__name__ for x in tests])
+        self.assertTrue(all(isinstance(x, format_tests.RowTest) for x in tests))
+
+
+class CountingFile(io.FileIO):
+    bytes_read = 0
+
+    def readinto(self, buffer):
+        count = super().readinto(buffer)
+        self.bytes_read += count or 0
+        return count
+
+
+class SelectedTestsTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.csv_file = os.path.join(self.data_dir.name, "2020", "file.csv")
+        os.mkdir(os.path.dirname(self.csv_file))
+        with open(self.csv_file, "w", newline="") as csv_data:
+            writer = csv.writer(csv_data)
+            writer.writerows([["County", "votes"], ["a", "1"], ["-", "2.5"], ["b", "3", "4"]])
+
+    def tearDown(self):
+        self.data_dir.cleanup()
+
+    def validate(self, tests):
+        options = validation.ValidationOptions(tests=tests)
+        result = validation.validate_file(self.csv_file, self.data_dir.name, options)
+        return {x["name"]: x["passed"] for x in result.tests}
+
+    def test_header_only(self):
+        self.assertFalse(validation.ValidationOptions(tests=registry.select(["header"])).reads_rows)
+        self.assertEqual({"EmptyHeaders": True, "LowercaseHeaders": False, "UnknownHeaders": True,
+                          "WhitespaceInHeaders": True}, self.validate(registry.select(["header"])))
+
+    def test_header_only_skips_rows(self):
+        # Only the first block of the file is read, so bytes that can't be decoded further on don't matter.
+        with open(self.csv_file, "ab") as csv_data:
+            csv_data.write(b"a,1\n" * 10000 + b"\xff\xfe\x00\n" * 10000)
+        self.assertEqual({"LowercaseHeaders": False}, self.validate(["LowercaseHeaders"]))
+
+        raw_files = []
+
+        def open_file(path, mode, buffering):
+            raw_files.append(CountingFile(path, mode))
+            return io.BufferedReader(raw_files[-1], buffering)
+
+        with mock.patch("format_tests.validation.open", side_effect=open_file, create=True):
+            self.validate(["LowercaseHeaders"])
+        self.assertLessEqual(raw_files[0].bytes_read, 2 * decoding.sniff_size)
+
+    def test_non_alphanumeric_entries(self):
+        self.assertNotIn("NonAlphanumericEntries", self.validate(None))
+        self.assertEqual({"NonAlphanumericEntries": False, "NonIntegerVotes": False},
+                         self.validate(["NonAlphanumericEntries", "NonIntegerVotes"]))
+
+    def test_settings(self):
+        self.assertNotEqual(validation.ValidationOptions().get_settings(),
+                            validation.ValidationOptions(tests=registry.select(["header"])).get_settings())
@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ElementTree
+
+from format_tests import reports, validation
+
+
+class ReportTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        os.mkdir(os.path.join(self.data_dir.name, "2020"))
+        self.files = []
+        for name, contents in [("a.csv", "county,votes\na,1\n"), ("b.csv", "county,votes\nb\x01 ,1.5\n,\nc,2.5\n")]:
+            path = os.path.join(self.data_dir.name, "2020", name)
+            with open(path, "w") as csv_file:
+                csv_file.write(contents)
+            self.files.append(path)
+        self.files.append(os.path.join(self.data_dir.name, "2020", "missing.csv"))
+
+        options = validation.ValidationOptions(max_examples=1)
+        self.results = list(validation.validate_files(self.files, self.data_dir.name, options))
+
+    def tearDown(self):
+        self.data_dir.cleanup()
+
+    def write_report(self, report_format):
+        path = os.path.join(self.data_dir.name, f"report.{report_format}")
+        report = reports.get_report(report_format, path)
+        for result in self.results:
+            report.write(result)
+        report.close()
+        return path
+
+    def test_jsonl(self):
+        with open(self.write_report("jsonl"), "r") as report_file:
+            records = [json.loads(x) for x in report_file]
+
+        self.assertEqual(["2020/a.csv", "2020/b.csv", "2020/missing.csv"], [x["path"] for x in records])
+        self.assertEqual([True, False, False], [x["passed"] for x in records])
+        self.assertRegex(records[2]["error"], "^FileNotFoundError: ")
+        self.assertEqual([], records[2]["tests"])
+
+        tests = {x["name"]: x for x in records[1]["tests"]}
+        self.assertEqual(12, len(tests))
+        self.assertTrue(tests["TabCharacters"]["passed"])
+        self.assertEqual((False, 2, [[2, ["b\x01 ", "1.5"]]]),
+                         (tests["NonIntegerVotes"]["passed"], tests["NonIntegerVotes"]["failures"],
+                          tests["NonIntegerVotes"]["examples"]))
+        self.assertRegex(tests["NonIntegerVotes"]["message"], r"Truncated to 1 examples")
+        self.assertEqual((1, []), (tests["EmptyRows"]["failures"], tests["EmptyRows"]["examples"]))
+        self.assertIsNone(tests["EmptyHeaders"]["failures"])
+
+    def test_junit(self):
+        root = ElementTree.parse(self.write_report("junit")).getroot()
+        test_suites = root.findall("testsuite")
+        self.assertEqual(["2020/a.csv", "2020/b.csv", "2020/missing.csv"], [x.get("name") for x in test_suites])
+        self.assertEqual([("12", "0", "0"), ("12", "3", "0"), ("1", "0", "1")],
+                         [(x.get("tests"), x.get("failures"), x.get("errors")) for x in test_suites])
+
+        failures = {x.get("name"): x.find("failure") for x in test_suites[1].findall("testcase")}
+        self.assertIsNone(failures["TabCharacters"])
+        self.assertEqual("2 failing rows", failures["NonIntegerVotes"].get("message"))
+        self.assertIn("Row 2: ['b\\x01 ', '1.5']", failures["NonIntegerVotes"].text)
+        self.assertIsNotNone(test_suites[2].find("testcase/error"))
+
+        # Characters that XML can't represent are replaced.
+        self.assertEqual("a\ufffd&lt;", reports._escape("a\x01<"))
@@ -0,0 +1,71 @@
+import pickle
+import random
+import unittest
+
+from format_tests import format_tests, row_plans
+
+
+class UppercaseEntries(format_tests.ValueTest):
+    @property
+    def description(self):
+        return "uppercase characters"
+
+    def is_bad_value(self, value):
+        return value != value.lower()
+
+
+class RowPlanTest(unittest.TestCase):
+    headers = ["county", "precinct", "candidate", "votes", "absentee"]
+    values = ["", " ", "a", "A", "a b", "a  b", " a", "a ", "a\tb", "a\nb", "　", "-", "%", "\x00", "a\x00 ", "1",
+              "-1", "+2", "1.0", "1.5", "-0.01", "1e-3", "*", "9" * 400, "²", "nan", "Turnout %", "PCT"]
+
+    @staticmethod
+    def create_tests(headers):
+        return [
+            format_tests.ConsecutiveSpaces(),
+            format_tests.EmptyRows(),
+            format_tests.InconsistentNumberOfColumns(headers),
+            format_tests.LeadingAndTrailingSpaces(),
+            format_tests.NonAlphanumericEntries(),
+            format_tests.NonIntegerVotes(headers),
+            format_tests.PrematureLineBreaks(),
+            format_tests.TabCharacters(),
+            UppercaseEntries(),
+        ]
+
+    def get_rows(self, headers, seed):
+        generator = random.Random(seed)
+        rows = [headers]
+        for _ in range(200):
+            row_length = generator.choice([len(headers)] * 8 + [0, 1, len(headers) + 1])
+            rows.append([generator.choice(self.values) for _ in range(row_length)])
+        return rows
+
+    def test_run(self):
+        for headers in [self.headers, ["county", "votes"], ["a", "b"], []]:
+            for seed in range(5):
+                rows = self.get_rows(headers, seed)
+
+                expected_tests = self.create_tests(headers)
+                for row in rows:
+                    for test in expected_tests:
+                        test.test(row)
+
+                tests = self.create_tests(headers)
+                row_plans.get_row_plan(headers, tests).run(iter(rows), tests)
+
+                for expected_test, test in zip(expected_tests, tests):
+                    self.assertEqual(expected_test.passed, test.passed)
+                    self.assertEqual(expected_test.get_failure_message(), test.get_failure_message())
+
+    def test_cache(self):
+        tests = self.create_tests(self.headers)
+        row_plan = row_plans.get_row_plan(self.headers, tests)
+        self.assertIs(row_plan, row_plans.get_row_plan(list(self.headers), self.create_tests(self.headers)))
+        self.assertIsNot(row_plan, row_plans.get_row_plan(self.headers[:-1], tests))
+        self.assertIsNot(row_plan, row_plans.get_row_plan(self.headers, tests[1:]))
+
+        row_plan.run([self.headers, ["a", "b ", "c", "1.5", "2"]], tests)
+        tests = self.create_tests(self.headers)
+        pickle.loads(pickle.dumps(row_plan)).run([self.headers, ["a", "b ", "c", "1.5", "2"]], tests)
+        self.assertEqual([True, True, True, False, True, False, True, True, True], [x.passed for x in tests])
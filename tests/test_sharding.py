@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from format_tests import sharding, validation
+
+
+class ShardingTest(unittest.TestCase):
+    sizes = [50, 10, 40, 30, 30, 20, 5, 5, 60, 1]
+
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.files = []
+        for index, size in enumerate(self.sizes):
+            path = os.path.join(self.data_dir.name, "2020", f"{index}.csv")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as csv_file:
+                csv_file.write("a" * size)
+            self.files.append(path)
+
+    def tearDown(self):
+        self.data_dir.cleanup()
+
+    def write_results(self, path, shard, results, max_examples=-1):
+        result_writer = sharding.ResultWriter(path, shard, max_examples)
+        for result in results:
+            result_writer.write(result)
+        result_writer.close()
+
+    def test_get_shard(self):
+        shards = [sharding.get_shard(self.files, x, 3) for x in range(1, 4)]
+        self.assertEqual(sorted(self.files), sorted(x for shard in shards for x in shard))
+        for shard in shards:
+            self.assertEqual([x for x in self.files if x in shard], shard)
+
+        # The largest files are spread over the shards first, and each of the others goes to the smallest shard.
+        self.assertEqual([[5, 6, 8], [0, 4, 7], [1, 2, 3, 9]], [[self.files.index(x) for x in y] for y in shards])
+        self.assertEqual([85, 85, 81], [sum(self.sizes[self.files.index(x)] for x in y) for y in shards])
+
+        self.assertEqual(shards, [sharding.get_shard(list(self.files), x, 3) for x in range(1, 4)])
+        self.assertEqual(self.files, sharding.get_shard(self.files, 1, 1))
+        self.assertEqual([], sharding.get_shard(self.files[:2], 3, 3))
+
+        # A file that can't be read is counted as empty, and is reported as an error by the shard that gets it.
+        missing_file = os.path.join(self.data_dir.name, "2020", "missing.zip", "a.csv")
+        shards = [sharding.get_shard(self.files + [missing_file], x, 3) for x in range(1, 4)]
+        self.assertEqual([missing_file], [x for shard in shards for x in shard if x not in self.files])
+
+    def test_read_results(self):
+        results = [validation.FileResult("2020/b.csv", "2020", False, "short", "full"),
+                   validation.FileResult("2020/a.csv", "2020", True),
+                   validation.FileResult("2020/c.csv", "2020", False, error=ValueError("bad"), traceback="trace")]
+        paths = [os.path.join(self.data_dir.name, f"{x}.jsonl") for x in range(3)]
+        self.write_results(paths[0], (1, 2), results[:2])
+        self.write_results(paths[1], (2, 2), results[2:])
+
+        merged_results = sharding.read_results(paths[:2])
+        self.assertEqual(["2020/a.csv", "2020/b.csv", "2020/c.csv"], [x.short_path for x in merged_results])
+        self.assertEqual(results[0].to_dict(), merged_results[1].to_dict())
+        self.assertEqual("full", merged_results[1].full_message)
+        self.assertIsInstance(merged_results[2].error, validation.RecordedError)
+        self.assertEqual("ValueError: bad", str(merged_results[2].error))
+        self.assertEqual("trace", merged_results[2].traceback)
+
+        # A long full message is written to a temporary file as it is read back, as it was when it was written.
+        with mock.patch.object(validation.MessageBuffer, "max_size", 2):
+            merged_result = sharding.read_results(paths[:2])[1]
+        self.assertIsNotNone(merged_result.full_message_path)
+        self.assertEqual("full", merged_result.full_message)
+        merged_result.discard_full_message()
+
+        self.write_results(paths[2], (1, 2), results[:2], 10)
+        with self.assertRaisesRegex(sharding.ShardError, "written with --max-examples=10, not -1"):
+            sharding.read_results(paths[1:])
+
+        with self.assertRaisesRegex(sharding.ShardError, "shards 2/2 are missing"):
+            sharding.read_results(paths[:1])
+
+        self.write_results(paths[2], (1, 2), [])
+        with self.assertRaisesRegex(sharding.ShardError, "doesn't fit"):
+            sharding.read_results(paths)
+
+        self.write_results(paths[2], None, results[2:])
+        with self.assertRaisesRegex(sharding.ShardError, "more than one file"):
+            sharding.read_results(paths)
+
+        with open(paths[2], "w") as results_file:
+            results_file.write("county,votes\n")
+        with self.assertRaisesRegex(sharding.ShardError, "isn't a results file"):
+            sharding.read_results(paths[2:])
@@ -0,0 +1,232 @@
+import csv
+import itertools
+import os
+import subprocess
+import tempfile
+import unittest
+
+from format_tests import columnar, validation
+
+
+class GetChangedCsvFilesTest(unittest.TestCase):
+    def setUp(self):
+        self.repo_dir = tempfile.TemporaryDirectory()
+        self.git("init", "-q")
+        self.git("config", "user.email", "test@example.com")
+        self.git("config", "user.name", "test")
+
+        for path in ["2018/a.csv", "2018/b.csv", "2019/counties/c.csv", "2019/d.csv", "notes/e.csv"]:
+            self.write(path, "county,votes\na,1\n")
+        self.git("add", "-A")
+        self.git("commit", "-q", "-m", "base")
+
+    def tearDown(self):
+        self.repo_dir.cleanup()
+
+    def git(self, *args):
+        subprocess.run(["git", "-C", self.repo_dir.name, *args], check=True, capture_output=True)
+
+    def write(self, path, contents):
+        path = os.path.join(self.repo_dir.name, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(contents)
+
+    def get_changed_files(self, root_path, ref="HEAD"):
+        commit = validation.get_merge_base(root_path, ref)
+        return [os.path.relpath(x, root_path) for x in validation.get_changed_csv_files(root_path, commit)]
+
+    def test_unchanged(self):
+        self.assertEqual([], self.get_changed_files(self.repo_dir.name))
+
+    def test_changed(self):
+        self.write("2018/b.csv", "county,votes\nb,2\n")
+        self.write("2019/counties/c.csv", "county,votes\nc,3\n")
+        self.write("2020/f.csv", "county,votes\nf,1\n")
+        self.write("2020/notes.txt", "")
+        self.write("notes/e.csv", "county,votes\ne,5\n")
+        self.git("add", "2020/f.csv")
+        self.git("commit", "-q", "-m", "change")
+        self.write("2021/g.CSV", "county,votes\ng,1\n")
+        self.git("rm", "-q", "2018/a.csv")
+        self.git("mv", "2019/d.csv", "2019/h.csv")
+
+        expected_files = ["2018/b.csv", "2019/counties/c.csv", "2019/h.csv", "2020/f.csv", "2021/g.CSV"]
+        self.assertEqual(expected_files, self.get_changed_files(self.repo_dir.name, "HEAD~1"))
+        self.assertEqual(expected_files[:3] + expected_files[4:], self.get_changed_files(self.repo_dir.name))
+
+    def test_subdirectory(self):
+        self.write("2018/b.csv", "county,votes\nb,2\n")
+        self.write("state/2018/a.csv", "county,votes\na,2\n")
+        self.assertEqual(["2018/a.csv"], self.get_changed_files(os.path.join(self.repo_dir.name, "state")))
+
+
+    def test_merge_base(self):
+        # The changes made to the reference after the current branch was created aren't included.
+        self.git("branch", "base")
+        self.git("checkout", "-q", "-b", "feature")
+        self.write("2018/a.csv", "county,votes\na,2\n")
+        self.git("commit", "-q", "-am", "feature")
+        self.git("checkout", "-q", "base")
+        self.write("2018/b.csv", "county,votes\nb,2\n")
+        self.git("commit", "-q", "-am", "base")
+        self.git("checkout", "-q", "feature")
+        self.assertEqual(["2018/a.csv"], self.get_changed_files(self.repo_dir.name, "base"))
+
+    def test_invalid(self):
+        self.assertRaisesRegex(ValueError, "can't compare .* with bogus", validation.get_merge_base, self.repo_dir.name,
+                               "bogus")
+        with tempfile.TemporaryDirectory() as data_dir:
+            self.assertRaisesRegex(ValueError, "not a git repository", validation.get_merge_base, data_dir, "HEAD")
+
+
+class StopEarlyTest(unittest.TestCase):
+    def setUp(self):
+        self.chunk_size = columnar.chunk_size
+        columnar.chunk_size = 4
+        self.data_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        columnar.chunk_size = self.chunk_size
+        self.data_dir.cleanup()
+
+    def validate(self, rows, **kwargs):
+        path = os.path.join(self.data_dir.name, "2020", "a.csv")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", newline="") as csv_file:
+            csv.writer(csv_file).writerows(rows)
+
+        engines = ["python", "columnar"] if columnar.is_available() else ["python"]
+        messages = []
+        for engine, profile in itertools.product(engines, [False, True]):
+            options = validation.ValidationOptions(max_examples=1, engine=engine, profile=profile, **kwargs)
+            messages.append(validation.validate_file(path, self.data_dir.name, options).full_message)
+
+        for message in messages[1:]:
+            self.assertEqual(messages[0], message)
+        return messages[0]
+
+    def test_all_failed(self):
+        rows = [["a", "votes"]] + [["  \t\n\ufffd", "1.5"], ["", "", ""]] * 10
+
+        message = self.validate(rows)
+        self.assertRegex(message, "Has 10 empty rows")
+        self.assertRegex(message, "There are 10 rows.*consecutive whitespace")
+
+        message = self.validate(rows, stop_early=True)
+        self.assertRegex(message, "at least 1 empty rows")
+        self.assertRegex(message, "at least 2 rows.*consecutive whitespace")
+        self.assertRegex(message, "at least 2 rows.*integers")
+        self.assertNotRegex(message, "Row 6")
+
+    def test_max_failures(self):
+        rows = [["a", "votes"]] + [["a ", "1"]] * 10 + [["a", "1.5"]]
+
+        message = self.validate(rows, stop_early=True)
+        self.assertRegex(message, "^\\* There are 10 rows.*leading or trailing whitespace")
+        self.assertRegex(message, "1 rows.*integers")
+
+        message = self.validate(rows, stop_early=True, max_failures=5)
+        self.assertRegex(message, "^\\* There are at least 5 rows.*leading or trailing whitespace")
+        self.assertNotRegex(message, "integers")
+
+        message = self.validate(rows, max_failures=5)
+        self.assertRegex(message, "^\\* There are at least 5 rows.*leading or trailing whitespace")
+
+        message = self.validate(rows, max_failures=11)
+        self.assertRegex(message, "^\\* There are 10 rows.*leading or trailing whitespace")
+        self.assertRegex(message, "1 rows.*integers")
+
+    def test_end_of_file(self):
+        message = self.validate([["a", "votes"], ["a ", "1.5"], ["", ""]], stop_early=True)
+        self.assertNotRegex(message, "at least")
+
+
+class FullMessageTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.max_size = validation.MessageBuffer.max_size
+        self.temp_dir = os.path.join(self.data_dir.name, "temp")
+        os.mkdir(self.temp_dir)
+        self.path = os.path.join(self.data_dir.name, "2020", "a.csv")
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "w") as csv_file:
+            csv_file.write("county,votes\n" + "a ,1.5\n" * 100)
+
+    def tearDown(self):
+        validation.MessageBuffer.max_size = self.max_size
+        tempfile.tempdir = None
+        self.data_dir.cleanup()
+
+    def test_spilled(self):
+        options = validation.ValidationOptions()
+        expected_message = validation.validate_file(self.path, self.data_dir.name, options).full_message
+        self.assertRegex(expected_message, r"^\* There are 100 rows.*whitespace(.|\n)*Row 101: \['a ', '1.5'\]$")
+
+        validation.MessageBuffer.max_size = 100
+        tempfile.tempdir = self.temp_dir
+        result = validation.validate_file(self.path, self.data_dir.name, options)
+        self.assertEqual(expected_message, result.full_message)
+        self.assertEqual(expected_message, "".join(result.iter_full_message()))
+
+        self.assertEqual(1, len(os.listdir(self.temp_dir)))
+        result.discard_full_message()
+        self.assertEqual([], os.listdir(self.temp_dir))
+        self.assertEqual("", result.full_message)
+
+
+class ValidateRepositoriesTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.repositories = []
+        for name in ["openelections-data-ga", "openelections-data-nc"]:
+            root_path = os.path.join(self.data_dir.name, name)
+            for path, rows in [("2018/b.csv", 2), ("2020/a.csv", 50), ("2020/c.csv", 1)]:
+                path = os.path.join(root_path, path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w") as csv_file:
+                    csv_file.write("county,votes\n" + "".join(f"a{x},1\n" for x in range(rows)) + "b ,2\n")
+            self.repositories.append((root_path, list(validation.get_csv_files(root_path))))
+
+    def tearDown(self):
+        self.data_dir.cleanup()
+
+    def test_order(self):
+        options = validation.ValidationOptions(tests=["LeadingAndTrailingSpaces", "DuplicateRows"])
+        expected_paths = [f"openelections-data-{x}/{y}" for x in ["ga", "nc"] for y in ["2018/b.csv", "2020/a.csv",
+                                                                                     "2020/c.csv"]]
+        for jobs in [1, 2]:
+            results = list(validation.validate_repositories(self.repositories, options, jobs))
+            self.assertEqual(expected_paths, [x.short_path for x in results])
+            self.assertEqual(["openelections-data-ga/2018", "openelections-data-ga/2020"],
+                             sorted({x.group for x in results[:3]}))
+
+            # The rows of each file repeat those of the other files of the same year, but only in the same repository.
+            messages = [x.short_message for x in results]
+            self.assertTrue(all("leading or trailing" in x for x in messages))
+            self.assertNotIn("duplicate an earlier row", messages[0] + messages[1] + messages[3] + messages[4])
+            self.assertIn("duplicates row 2 of openelections-data-ga/2020/a.csv", results[2].full_message)
+            self.assertIn("duplicates row 2 of openelections-data-nc/2020/a.csv", results[5].full_message)
+
+    def test_validated_as_found(self):
+        # Files validated in this process are validated as they are found, reading ahead at most as many as requested.
+        root_path = os.path.join(self.data_dir.name, "openelections-data-ga")
+        for prefetch_depth in [0, 1]:
+            found_files = []
+
+            def find_files():
+                for csv_file in validation.get_csv_files(root_path):
+                    found_files.append(csv_file)
+                    yield csv_file
+
+            results = validation.validate_files(find_files(), root_path, validation.ValidationOptions(),
+                                                prefetch_depth=prefetch_depth)
+            self.assertEqual("2018/b.csv", next(results).short_path)
+            self.assertEqual(1 + prefetch_depth, len(found_files))
+            self.assertEqual(["2020/a.csv", "2020/c.csv"], [x.short_path for x in results])
+
+    def test_single_repository(self):
+        root_path, csv_files = self.repositories[0]
+        results = list(validation.validate_files(csv_files, root_path, validation.ValidationOptions(), 2))
+        self.assertEqual(["2018/b.csv", "2020/a.csv", "2020/c.csv"], [x.short_path for x in results])
+        self.assertEqual(["2018", "2020", "2020"], [x.group for x in results])
@@ -0,0 +1,70 @@
+import io
+import os
+import tempfile
+import unittest
+
+from format_tests import validation, watch
+
+
+class WatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.root_dir = tempfile.TemporaryDirectory()
+        self.root_path = self.root_dir.name
+        for path in ["2020/a.csv", "2020/b.csv", "2020/archive/c.csv", "notes/d.csv"]:
+            self.write(path, "county,votes\na,1\n")
+        self.watcher = watch.Watcher(self.root_path, ["archive"])
+
+    def tearDown(self):
+        self.root_dir.cleanup()
+
+    def get_path(self, short_path):
+        return os.path.join(self.root_path, *short_path.split("/"))
+
+    def write(self, short_path, contents, mtime_ns=None):
+        path = self.get_path(short_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as csv_file:
+            csv_file.write(contents)
+        if mtime_ns is not None:
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    def get_short_paths(self, changes):
+        return tuple([os.path.relpath(x, self.root_path).replace(os.sep, "/") for x in y] for y in changes)
+
+    def test_poll(self):
+        self.assertEqual(2, self.watcher.file_count)
+        self.assertEqual(([], []), self.watcher.poll())
+
+        self.write("2020/a.csv", "county,votes\nb,2\n", 0)
+        self.write("2021/counties/e.csv", "county,votes\n")
+        self.write("2020/archive/c.csv", "county,votes\n")
+        os.remove(self.get_path("2020/b.csv"))
+        self.assertEqual((["2020/a.csv", "2021/counties/e.csv"], ["2020/b.csv"]),
+                         self.get_short_paths(self.watcher.poll()))
+        self.assertEqual(([], []), self.watcher.poll())
+
+    def test_check(self):
+        self.write("2020/a.csv", "county,votes\nb,2\n", 0)
+        self.write("2020/b.csv", "county,votes\nb,2\n", 0)
+        os.remove(self.get_path("2020/b.csv"))
+        self.write("2020/f.csv", "county,votes\n")
+
+        paths = {self.get_path(x) for x in ["2020/a.csv", "2020/b.csv", "2020/f.csv", "2020/archive/c.csv",
+                                             "2020/.a.csv", "notes/d.csv", "2020/g.txt"]}
+        csv_files = validation.get_listed_csv_files(self.root_path, paths, ["archive"])
+        self.assertEqual((["2020/a.csv", "2020/f.csv"], ["2020/b.csv"]),
+                         self.get_short_paths(self.watcher.check(csv_files)))
+        self.assertEqual(([], []), self.watcher.check(csv_files))
+        self.assertEqual(([], []), self.watcher.poll())
+
+    def test_print_result(self):
+        stream = io.StringIO()
+        self.write("2020/a.csv", "county,votes\na ,1\n")
+        options = validation.ValidationOptions(max_examples=1, full_messages=False)
+        for short_path in ["2020/a.csv", "2020/b.csv", "2020/missing.csv"]:
+            result = next(validation.validate_files([self.get_path(short_path)], self.root_path, options))
+            watch.print_result(result, 0.0012, stream)
+
+        self.assertRegex(stream.getvalue(), r"^2020/a.csv: failed \(1 ms\)\n\n\* There are 1 rows.*whitespace")
+        self.assertRegex(stream.getvalue(), r"\n2020/b.csv: passed \(1 ms\)\n")
+        self.assertRegex(stream.getvalue(), r"\n2020/missing.csv: error \(1 ms\)\n\tFileNotFoundError: ")